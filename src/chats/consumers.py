@@ -1,48 +1,43 @@
 import asyncio
-import atexit
-import json
 import logging
+from datetime import timedelta
+from urllib.parse import parse_qs
 
-import pytz
 import redis
-from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
-from dateutil import parser
 from django.conf import settings
 from django.utils import timezone
 
-from users.exceptions import (
-    InvalidAuthorizationHeader,
-    MissingAuthorizationHeader,
-    TokenMissing,
-    UserNotFound,
-)
-from users.models.user_model import User
-from users.services.user_service import UserService
+from config.redis_pools import get_async_redis
 
-from .models import ChatRoom, ChatRoomUser, Message
-from .services import ChatService
+from .models import ChatRoom, ChatRoomUser
+from .services import (
+    ACTIVE_CHAT_ROOMS_KEY,
+    UNREAD_COUNTS_LOADED_FIELD,
+    ChatService,
+    MessageBufferService,
+)
+from .utils import generate_message_id
 
 logger = logging.getLogger("channels")
 
-redis_client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, db=3)
-
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    메시지마다 채팅방 순번(seq)을 붙여서 보내고, 보낸 사람에게는 {"type": "ack", "seq", "client_message_id"} 로 응답
+    ws/chat/<room_id>/?resume_from=<seq> 로 다시 연결하면 그 뒤의 메시지만 다시 보내고 {"type": "resumed", "seq", "truncated"} 를 보냄
+    truncated 가 true 면 CHAT_RESUME_MAX_MESSAGES 보다 많이 놓친 것이므로 메시지 목록 API 로 다시 불러와야 함
+    {"messages": [{"message", "client_message_id"}, ...], "sender_nickname"} 로 여러 메시지를 한 프레임에 보낼 수 있고,
+    이때 ack 와 다른 참여자가 받는 메시지도 {"type": "ack", "messages": [...]}, {"messages": [...]} 한 프레임으로 보냄
+    """
 
     async def connect(self):
         logger.debug("WebSocket connection attempt")
-        access_token = self.scope["query_string"].decode("utf-8").split("token=")[-1]
-
-        try:
-            self.user = await self.get_user_from_access_token(access_token)
-
-            if not self.user.is_authenticated:
-                await self.close()
-
-        except (MissingAuthorizationHeader, InvalidAuthorizationHeader, TokenMissing, UserNotFound):
-            await self.close()
+        # 토큰 검증은 JWTAuthMiddleware 에서 하고, 실패하면 consumer 까지 오지 않음
+        self.user = self.scope["user"]
+        # 재연결 시 다시 보낸 마지막 순번, 그 이하의 chat_message 는 중복이므로 보내지 않음
+        self.resumed_seq = 0
 
         logger.debug(f"WebSocket connection attempt for room_id: {self.scope['url_route']['kwargs'].get('room_id')}")
         try:
@@ -53,12 +48,16 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
 
             self.group_name = self.get_group_name(self.room_id)  # 방 ID를 사용하여 그룹 이름 가져옴
             self.receiver_id = await self.get_receiver_id(self.room_id, self.user.id)
+            resume_from = self.get_resume_from()
+            await self.load_seq(self.room_id)
 
             await self.add_user_to_room()  # 사용자를 채팅방 접속자 목록에 추가
             await self.channel_layer.group_add(self.group_name, self.channel_name)  # 현재 채널을 그룹에 추가
             await self.accept()  # WebSocket 연결 수락
             await self.reset_unread_count(self.room_id, self.user.id)  # 채팅방 입장 시 안 읽은 메시지 수 초기화
             await self.update_chat_list()
+            if resume_from is not None:
+                await self.resume(resume_from)
             logger.debug(f"WebSocket connection accepted for room_id: {self.room_id}")
 
         except Exception as e:
@@ -69,7 +68,6 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         try:
             await self.remove_user_from_room()  # 사용자를 채팅방 접속자 목록에서 제거
             await self.channel_layer.group_discard(self.group_name, self.channel_name)  # 현재 채널을 그룹에서 제거
-            await self.sync_messages_to_db(self.room_id)  # Redis의 메시지를 데이터베이스에 동기화
             logger.debug(f"WebSocket disconnected with code: {close_code}")
 
         except Exception as e:
@@ -79,164 +77,219 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         logger.debug(f"Received content: {content}")
         try:
             # 수신된 JSON에서 필요한 정보를 추출
-            message = content.get("message")
             sender_nickname = content.get("sender_nickname")
+            is_batch = "messages" in content
+            items = content["messages"] if is_batch else [content]
 
-            if not all([message, sender_nickname]):
-                raise ValueError("필수 정보가 누락되었습니다.")
+            if is_batch and (not isinstance(items, list) or not 0 < len(items) <= settings.CHAT_MAX_BATCH_MESSAGES):
+                raise ValueError(f"messages 는 {settings.CHAT_MAX_BATCH_MESSAGES}개 이하의 메시지 목록이어야 합니다.")
 
-            message_data = await self.save_message_to_redis(self.room_id, self.user.id, message)
+            messages = [self.get_message_fields(item) for item in items]
 
-            # 수신자가 채팅방에 접속 중인지 확인
-            receiver_is_online = await self.is_user_in_room(self.receiver_id)
+            if not sender_nickname:
+                raise ValueError("필수 정보가 누락되었습니다.")
 
-            if not receiver_is_online:
-                # 수신자가 접속 중이 아닐 때만 안 읽은 메시지 수 증가
-                await self.increment_unread_count(self.room_id, self.receiver_id)
+            # 메시지 저장, 수신자 접속 확인, 안 읽은 메시지 수 증가를 메시지 수와 상관없이 Redis 왕복 한 번으로 처리
+            messages_data, unread_counts = await self.save_messages_to_redis(self.room_id, self.user.id, messages)
+            payloads = [self.get_message_payload(message_data, sender_nickname) for message_data in messages_data]
+            acks = [{"seq": payload["seq"], "client_message_id": payload["client_message_id"]} for payload in payloads]
+            latest = messages_data[-1]
 
-            # 메시지를 전체 그룹에 전송
-            await self.channel_layer.group_send(
-                self.group_name,
-                {
-                    "type": "chat_message",
-                    "message": message,
-                    "sender_nickname": sender_nickname,
-                    "timestamp": message_data["created_at"],
-                },
+            if is_batch:
+                await self.send_json({"type": "ack", "messages": acks})
+                event = {"type": "chat_message", "messages": payloads}
+            else:
+                await self.send_json({"type": "ack", **acks[0]})
+                event = {"type": "chat_message", **payloads[0]}
+
+            # 메시지를 전체 그룹에 전송하고 채팅 리스트 업데이트 (안 읽은 수를 같이 보내서 ChatListConsumer 가 다시 읽지 않도록 함)
+            await asyncio.gather(
+                self.channel_layer.group_send(self.group_name, event),
+                *(
+                    self.channel_layer.group_send(
+                        f"chat_list_{user_id}",
+                        {
+                            "type": "chat_list_update",
+                            "id": self.room_id,
+                            "latest_message": latest["message"],
+                            "sender_nickname": sender_nickname,
+                            "latest_message_time": latest["created_at"],
+                            "updated_user_id": user_id,
+                            "unread_count": unread_counts[user_id],
+                        },
+                    )
+                    # 상대방이 나간 채팅방은 보내는 사람 목록만 갱신
+                    for user_id in [self.user.id, self.receiver_id]
+                    if user_id is not None
+                ),
             )
 
-            # 채팅 리스트 업데이트
-            for user_id in [self.user.id, self.receiver_id]:
-                await self.channel_layer.group_send(
-                    f"chat_list_{user_id}",
-                    {
-                        "type": "chat_list_update",
-                        "id": self.room_id,
-                        "latest_message": message,
-                        "sender_nickname": sender_nickname,
-                        "latest_message_time": message_data["created_at"],
-                        "updated_user_id": user_id,
-                    },
-                )
-
         except Exception as e:
             logger.debug(f"Error in receive_json: {str(e)}", exc_info=True)
             await self.send_json({"error": str(e)})
 
+    @staticmethod
+    def get_message_fields(item):
+        if not isinstance(item, dict):
+            raise ValueError("필수 정보가 누락되었습니다.")
+
+        message = item.get("message")
+        client_message_id = item.get("client_message_id")
+
+        if not message:
+            raise ValueError("필수 정보가 누락되었습니다.")
+
+        if client_message_id is not None and (not isinstance(client_message_id, str) or not 0 < len(client_message_id) <= 64):
+            raise ValueError("client_message_id 는 64자 이하의 문자열이어야 합니다.")
+
+        return message, client_message_id
+
+    @staticmethod
+    def get_message_payload(message_data, sender_nickname):
+        return {
+            "message": message_data["message"],
+            "sender_nickname": sender_nickname,
+            "timestamp": message_data["created_at"],
+            "client_message_id": message_data["client_message_id"],
+            "seq": message_data["seq"],
+        }
+
     async def chat_message(self, event):
         try:
+            # 여러 메시지를 한 번에 보낸 경우 {"messages": [...]} 한 프레임으로 전송
+            if "messages" in event:
+                payloads = [payload for payload in event["messages"] if not self.is_resumed(payload)]
+                if payloads:
+                    await self.send_json({"messages": payloads})
+                return
+
+            # 재연결하면서 이미 다시 보낸 메시지는 건너뜀
+            if self.is_resumed(event):
+                return
+
             # 이벤트에서 메시지와 발신자 닉네임을 추출
             message = event["message"]
             sender_nickname = event["sender_nickname"]
             timestamp = event["timestamp"]
+            client_message_id = event.get("client_message_id")
 
             # 추출된 메시지와 발신자 닉네임을 JSON으로 전송
-            await self.send_json({"message": message, "sender_nickname": sender_nickname, "timestamp": timestamp})
+            await self.send_json(
+                {
+                    "message": message,
+                    "sender_nickname": sender_nickname,
+                    "timestamp": timestamp,
+                    "client_message_id": client_message_id,
+                    "seq": event.get("seq"),
+                }
+            )
         except Exception as e:
             await self.send_json({"error": "메시지 전송 실패"})
 
+    def is_resumed(self, payload):
+        return payload.get("seq") is not None and payload["seq"] <= self.resumed_seq
+
+    def get_resume_from(self):
+        values = parse_qs(self.scope.get("query_string", b"").decode("utf-8")).get("resume_from")
+        if not values:
+            return None
+
+        if not values[-1].isdigit():
+            raise ValueError("resume_from 은 0 이상의 정수여야 합니다.")
+
+        return int(values[-1])
+
+    async def resume(self, resume_from):
+        # 그룹에 들어간 뒤에 읽으므로 그 사이에 들어온 메시지는 여기서 보내고 chat_message 에서는 건너뜀
+        messages, truncated = await self.get_messages_after(self.room_id, resume_from)
+
+        for message in messages:
+            await self.send_json(
+                {
+                    "message": message.message,
+                    "sender_nickname": message.sender.nickname,
+                    "timestamp": message.created_at.isoformat(),
+                    "client_message_id": message.client_message_id,
+                    "seq": message.seq,
+                }
+            )
+
+        self.resumed_seq = messages[-1].seq if messages else resume_from
+        await self.send_json({"type": "resumed", "seq": self.resumed_seq, "truncated": truncated})
+
     @staticmethod
     def get_group_name(room_id):
         # 방 ID를 사용하여 고유한 그룹 이름을 구성
         return f"chat_room_{room_id}"
 
-    @database_sync_to_async
-    def save_message_to_redis(self, room_id, sender_id, message_text):
-        redis_key = f"chat_room_{room_id}_messages"
+    async def save_messages_to_redis(self, room_id, sender_id, messages):
+        """
+        [(메시지, client_message_id)] 를 버퍼에 저장하고 (순번이 붙은 message_data 목록, {user_id: 안 읽은 수}) 반환
+        """
         created_at = timezone.now()
-        message_data = {"room_id": room_id, "sender_id": sender_id, "message": message_text, "created_at": created_at.isoformat()}
-        score = created_at.timestamp()
-        redis_client.zadd(redis_key, {json.dumps(message_data): score})
-        return message_data
+        messages_data = []
+
+        for i, (message_text, client_message_id) in enumerate(messages):
+            # 한 번에 보낸 메시지들도 보낸 순서대로 정렬되도록 시각을 1 마이크로초씩 늘림
+            message_created_at = created_at + timedelta(microseconds=i)
+            message_data = {
+                "room_id": room_id,
+                "sender_id": sender_id,
+                "message": message_text,
+                "created_at": message_created_at.isoformat(),
+                # flush 를 다시 해도 중복 저장되지 않도록 메시지마다 고유 id 를 붙임
+                "client_message_id": client_message_id or generate_message_id(),
+            }
+            messages_data.append((message_data, message_created_at.timestamp()))
 
-    @classmethod
-    async def sync_messages_to_db(cls, specific_room_id=None):
-        try:
-            if specific_room_id:
-                keys = [f"chat_room_{specific_room_id}_messages"]
-            else:
-                active_rooms = redis_client.smembers("active_chat_rooms")
-                keys = [f"chat_room_{room_id.decode()}_messages" for room_id in active_rooms]
-
-            for key in keys:
-                room_id = key.split("_")[2]
-                last_sync_score = float(redis_client.get(f"last_sync_score_{room_id}") or 0)
-                messages = redis_client.zrangebyscore(key, f"({last_sync_score}", "+inf", withscores=True)
-                messages_to_create = []
-                last_processed_score = last_sync_score
-                for message_json, score in messages:
-                    message_data = json.loads(message_json)
-                    messages_to_create.append(
-                        Message(
-                            room_id=room_id,
-                            sender_id=message_data["sender_id"],
-                            message=message_data["message"],
-                            created_at=timezone.datetime.fromtimestamp(score, tz=pytz.UTC),
-                        )
-                    )
-                    last_processed_score = score
-
-                if messages_to_create:
-                    created_messages = await database_sync_to_async(Message.objects.bulk_create)(messages_to_create)
-                    # 마지막 메시지로 latest_message 업데이트
-                    latest_message = created_messages[-1]
-                    room = await database_sync_to_async(ChatRoom.objects.get)(id=room_id)
-                    await database_sync_to_async(room.update_latest_message)(latest_message)
-                    redis_client.set(f"last_sync_score_{room_id}", str(last_processed_score))
-
-                # 동기화된 메시지만 삭제
-                redis_client.zremrangebyscore(key, "-inf", f"({last_processed_score}")
-            logger.info("All messages synced from Redis to database.")
-        except Exception as e:
-            logger.error(f"Error syncing messages: {str(e)}")
+        _, unread_counts, seqs = await ChatService.buffer_messages(room_id, messages_data, self.receiver_id)
+
+        for (message_data, _), seq in zip(messages_data, seqs):
+            message_data["seq"] = seq
+
+        return [message_data for message_data, _ in messages_data], unread_counts
 
     @database_sync_to_async
     def get_chat_room(self, room_id):
         return ChatRoom.objects.select_related("latest_message__sender").get(id=room_id)
 
-    @sync_to_async
-    def get_user_from_access_token(self, access_token):
-        return UserService.get_user_from_access_token(access_token)
-
     @database_sync_to_async
     def get_receiver_id(self, room_id, sender_id):
         # 1대1 채팅방에서 sender를 제외한 다른 사용자(수신자)의 ID를 반환
         return ChatRoomUser.objects.filter(chatroom_id=room_id).exclude(user_id=sender_id).values_list("user_id", flat=True).first()
 
     @database_sync_to_async
-    def increment_unread_count(self, room_id, user_id):
-        ChatService.increment_unread_count(room_id, user_id)
+    def load_seq(self, room_id):
+        MessageBufferService.load_seq(room_id)
+
+    @database_sync_to_async
+    def get_messages_after(self, room_id, seq):
+        return MessageBufferService.get_messages_after(room_id, seq, settings.CHAT_RESUME_MAX_MESSAGES)
 
     @database_sync_to_async
     def reset_unread_count(self, room_id, user_id):
         ChatService.reset_unread_count(room_id, user_id)
 
-    @database_sync_to_async
-    def add_user_to_room(self):
+    async def add_user_to_room(self):
+        buffer_client = get_async_redis("chat")
+
         try:
-            redis_client.sadd(f"chat_room_{self.room_id}_users", self.user.id)
-            redis_client.sadd("active_chat_rooms", self.room_id)
+            await buffer_client.sadd(f"chat_room_{self.room_id}_users", self.user.id)
+            await buffer_client.sadd(ACTIVE_CHAT_ROOMS_KEY, self.room_id)
         except redis.RedisError as e:
             logger.error(f"Redis error in add_user_to_room: {str(e)}")
 
-    @database_sync_to_async
-    def remove_user_from_room(self):
+    async def remove_user_from_room(self):
+        buffer_client = get_async_redis("chat")
+
         try:
-            redis_client.srem(f"chat_room_{self.room_id}_users", self.user.id)
+            await buffer_client.srem(f"chat_room_{self.room_id}_users", self.user.id)
             # 해당 채팅방에 남은 사용자가 없으면 활성 채팅방에서 제거
-            if redis_client.scard(f"chat_room_{self.room_id}_users") == 0:
-                redis_client.srem("active_chat_rooms", self.room_id)
+            if await buffer_client.scard(f"chat_room_{self.room_id}_users") == 0:
+                await buffer_client.srem(ACTIVE_CHAT_ROOMS_KEY, self.room_id)
         except redis.RedisError as e:
             logger.error(f"Redis error in remove_user_from_room: {str(e)}")
 
-    @database_sync_to_async
-    def is_user_in_room(self, user_id):
-        try:
-            return redis_client.sismember(f"chat_room_{self.room_id}_users", user_id)
-        except redis.RedisError as e:
-            logger.error(f"Redis error in is_user_in_room: {str(e)}")
-            return False  # Redis 오류 시 기본적으로 사용자가 방에 없다고 가정
-
     async def update_chat_list(self):
         try:
             if self.chatroom.latest_message:
@@ -256,58 +309,28 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error updating chat list: {str(e)}")
 
-    @classmethod
-    def sync_remaining_messages(cls):
-        try:
-            for key in redis_client.keys("chat_room_*_messages"):
-                room_id = key.decode().split("_")[2]
-                last_sync_score = float(redis_client.get(f"last_sync_score_{room_id}") or 0)
-                messages = redis_client.zrangebyscore(key, f"({last_sync_score}", "+inf", withscores=True)
-                messages_to_create = []
-                last_processed_score = last_sync_score
-                for message_json, score in messages:
-                    message_data = json.loads(message_json)
-                    messages_to_create.append(
-                        Message(
-                            room_id=room_id,
-                            sender_id=message_data["sender_id"],
-                            message=message_data["message"],
-                            created_at=timezone.datetime.fromtimestamp(score, tz=pytz.UTC),
-                        )
-                    )
-                    last_processed_score = score
-
-                if messages_to_create:
-                    Message.objects.bulk_create(messages_to_create)
-                    redis_client.set(f"last_sync_score_{room_id}", str(last_processed_score))
-
-                # 동기화된 메시지만 삭제
-                redis_client.zremrangebyscore(key, "-inf", f"({last_processed_score}")
-            logger.info("All remaining messages synced from Redis to database.")
-        except Exception as e:
-            logger.error(f"Error syncing remaining messages: {str(e)}")
-
 
 class ChatListConsumer(AsyncJsonWebsocketConsumer):
-    async def connect(self):
-        access_token = self.scope["query_string"].decode("utf-8").split("token=")[-1]
+    """
+    채팅방 목록의 최신 메시지 / 안 읽은 수 변경을 보냄
+    같은 채팅방의 변경은 CHAT_LIST_UPDATE_INTERVAL 동안 모아서 마지막 상태만 보내고, 웹소켓마다 초당 CHAT_LIST_MAX_PUSH_RATE 개까지만 보냄
+    """
 
-        try:
-            self.user = await self.get_user_from_access_token(access_token)
-
-            if not self.user.is_authenticated:
-                await self.close()
-
-            else:
-                self.user_group = f"chat_list_{self.user.id}"
-                await self.channel_layer.group_add(self.user_group, self.channel_name)
-                await self.accept()
-                logger.debug(f"WebSocket connection accepted for chat list of user {self.user.id}")
-
-        except (MissingAuthorizationHeader, InvalidAuthorizationHeader, TokenMissing, UserNotFound):
-            await self.close()
+    async def connect(self):
+        self.user = self.scope["user"]
+        self.user_group = f"chat_list_{self.user.id}"
+        self.flush_task = None
+        # 아직 보내지 않은 채팅방별 마지막 변경 (room_id -> 이벤트), 오래된 변경부터 보냄
+        self.pending_updates = {}
+        self.next_push_at = 0
+        await self.channel_layer.group_add(self.user_group, self.channel_name)
+        await self.accept()
+        logger.debug(f"WebSocket connection accepted for chat list of user {self.user.id}")
 
     async def disconnect(self, close_code):
+        if getattr(self, "flush_task", None):
+            self.flush_task.cancel()
+
         await self.channel_layer.group_discard(self.user_group, self.channel_name)
         logger.debug(f"WebSocket disconnected from chat list with code: {close_code}")
 
@@ -315,13 +338,40 @@ class ChatListConsumer(AsyncJsonWebsocketConsumer):
         logger.debug(f"Received content in chat list: {content}")
 
     async def chat_list_update(self, event):
+        # 같은 채팅방의 이전 변경은 버리고 맨 뒤로 보냄
+        self.pending_updates.pop(event["id"], None)
+        self.pending_updates[event["id"]] = event
+
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush_updates())
+
+    async def flush_updates(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.sleep(settings.CHAT_LIST_UPDATE_INTERVAL)
+
+        while self.pending_updates:
+            # 보낼 때마다 1 / CHAT_LIST_MAX_PUSH_RATE 초 간격을 두고, 기다리는 동안 들어온 변경도 합쳐짐
+            await asyncio.sleep(self.next_push_at - loop.time())
+
+            event = self.pending_updates.pop(next(iter(self.pending_updates)))
+            self.next_push_at = loop.time() + 1 / settings.CHAT_LIST_MAX_PUSH_RATE
+            try:
+                await self.send_update(event)
+            except Exception as e:
+                # 아무도 이 task 를 기다리지 않으므로 여기서 남기고, 한 채팅방이 실패해도 나머지 변경은 계속 보냄
+                logger.error(f"Error sending chat list update for room {event['id']}: {str(e)}", exc_info=True)
+
+    async def send_update(self, event):
         room_id = event["id"]
         updated_user_id = event.get("updated_user_id")
         is_read_update = event.get("is_read_update", False)
 
-        # 현재 사용자가 업데이트된 사용자인 경우에만 unread_count를 가져옴
+        # 현재 사용자가 업데이트된 사용자인 경우에만 unread_count를 보냄
         if self.user.id == updated_user_id:
-            unread_count = event.get("unread_count") if is_read_update else await self.get_unread_count(room_id, self.user.id)
+            unread_count = event.get("unread_count")
+            # DB 값이 합쳐지지 않은 hash 라서 이벤트에 개수가 없을 때만 다시 읽음
+            if unread_count is None:
+                unread_count = await self.get_unread_count(room_id, self.user.id)
         else:
             unread_count = None
 
@@ -337,19 +387,15 @@ class ChatListConsumer(AsyncJsonWebsocketConsumer):
             }
         )
 
-    @database_sync_to_async
-    def get_unread_count(self, room_id, user_id):
-        return ChatService.get_unread_count(room_id, user_id)
-
-    @sync_to_async
-    def get_user_from_access_token(self, access_token):
-        return UserService.get_user_from_access_token(access_token)
-
-
-async def start_periodic_sync():
-    while True:
-        await asyncio.sleep(30)
-        await ChatConsumer.sync_messages_to_db()
-
+    async def get_unread_count(self, room_id, user_id):
+        # DB 값까지 합쳐진 hash 면 DB 스레드 풀을 거치지 않고 바로 반환
+        try:
+            loaded, count = await get_async_redis("chat").hmget(
+                ChatService.get_unread_counts_key(user_id), [UNREAD_COUNTS_LOADED_FIELD, room_id]
+            )
+            if loaded is not None:
+                return int(count or 0)
+        except redis.RedisError as e:
+            logger.error(f"Redis error in get_unread_count: {str(e)}")
 
-atexit.register(ChatConsumer.sync_remaining_messages)
+        return await database_sync_to_async(ChatService.get_unread_count)(room_id, user_id)
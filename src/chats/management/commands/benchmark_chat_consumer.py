@@ -0,0 +1,132 @@
+import asyncio
+import time
+from unittest import mock
+
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db.backends.utils import CursorWrapper
+from django.test import override_settings
+from redis.asyncio import Redis
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chats.models import ChatRoom, ChatRoomUser
+from chats.routing import websocket_urlpatterns
+from config.redis_pools import get_async_redis
+from users.middleware import JWTAuthMiddleware
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "ChatConsumer 한 프로세스가 처리하는 초당 메시지 수(msgs/sec)와 메시지당 Redis 호출 / DB 쓰기 횟수를 "
+        "한 프레임에 담는 메시지 수(batch size)별로 측정합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=10)
+        parser.add_argument("--messages", type=int, default=200, help="방마다 보낼 메시지 수")
+        parser.add_argument("--in-memory", action="store_true", help="Redis 대신 InMemoryChannelLayer 사용")
+        parser.add_argument(
+            "--batch-sizes",
+            type=int,
+            nargs="+",
+            default=[1, 10, 100],
+            help='{"messages": [...]} 프레임 하나에 담는 메시지 수 (1 이면 메시지마다 한 프레임)',
+        )
+
+    def handle(self, *args, **options):
+        users, rooms = self.create_rooms(options["rooms"])
+
+        try:
+            for batch_size in options["batch_sizes"]:
+                if options["in_memory"]:
+                    with override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}):
+                        channel_layers.backends.clear()
+                        elapsed, counts = asyncio.run(self.run(users, rooms, options["messages"], batch_size))
+                    channel_layers.backends.clear()
+                else:
+                    elapsed, counts = asyncio.run(self.run(users, rooms, options["messages"], batch_size))
+
+                total = options["rooms"] * options["messages"]
+                self.stdout.write(
+                    f"batch_size={batch_size} rooms={options['rooms']} messages={total} elapsed={elapsed:.2f}s "
+                    f"throughput={total / elapsed:.1f} msgs/sec "
+                    f"redis_calls/msg={counts['redis'] / total:.2f} db_writes/msg={counts['db_writes'] / total:.2f}"
+                )
+        finally:
+            ChatRoom.objects.filter(id__in=[room.id for room, _ in rooms]).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    @staticmethod
+    def create_rooms(count):
+        users = []
+        rooms = []
+
+        for i in range(count):
+            sender = User.objects.create_user(nickname=f"bench_s{i}", email=f"bench_s{i}@example.com", social_provider="google")
+            receiver = User.objects.create_user(nickname=f"bench_r{i}", email=f"bench_r{i}@example.com", social_provider="google")
+            room = ChatRoom.objects.create()
+            ChatRoomUser.objects.bulk_create([ChatRoomUser(chatroom=room, user=sender), ChatRoomUser(chatroom=room, user=receiver)])
+            users += [sender, receiver]
+            rooms.append((room, sender))
+
+        return users, rooms
+
+    async def run(self, users, rooms, message_count, batch_size):
+        application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+        communicators = []
+
+        for room, sender in rooms:
+            communicator = WebsocketCommunicator(application, f"/ws/chat/{room.id}/?token={AccessToken.for_user(sender)}")
+            connected, _ = await communicator.connect()
+            if not connected:
+                raise RuntimeError(f"채팅방 {room.id} 연결 실패")
+            communicators.append((communicator, sender))
+
+        counts = {"redis": 0, "db_writes": 0}
+        execute_command = Redis.execute_command
+        execute = CursorWrapper.execute
+
+        # 채널 레이어를 제외한 채팅 Redis 연결의 명령만 셈 (Lua 스크립트 실행은 한 번으로 셈)
+        chat_redis = get_async_redis("chat")
+
+        async def counting_execute_command(client, *args, **kwargs):
+            if client is chat_redis:
+                counts["redis"] += 1
+            return await execute_command(client, *args, **kwargs)
+
+        def counting_execute(cursor, sql, params=None):
+            if sql.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+                counts["db_writes"] += 1
+            return execute(cursor, sql, params)
+
+        with mock.patch.object(Redis, "execute_command", counting_execute_command), mock.patch.object(
+            CursorWrapper, "execute", counting_execute
+        ):
+            started_at = time.perf_counter()
+            await asyncio.gather(
+                *(self.send_messages(communicator, sender, message_count, batch_size) for communicator, sender in communicators)
+            )
+            elapsed = time.perf_counter() - started_at
+
+        for communicator, _ in communicators:
+            await communicator.disconnect()
+
+        return elapsed, counts
+
+    @staticmethod
+    async def send_messages(communicator, sender, message_count, batch_size):
+        for start in range(0, message_count, batch_size):
+            texts = [f"message {i}" for i in range(start, min(start + batch_size, message_count))]
+            if batch_size == 1:
+                await communicator.send_json_to({"message": texts[0], "sender_nickname": sender.nickname})
+            else:
+                await communicator.send_json_to({"messages": [{"message": text} for text in texts], "sender_nickname": sender.nickname})
+
+            # ack 와 그룹으로 돌아온 메시지
+            for _ in range(2):
+                response = await communicator.receive_json_from(timeout=10)
+                if "error" in response:
+                    raise RuntimeError(response["error"])
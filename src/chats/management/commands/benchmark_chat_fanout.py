@@ -0,0 +1,92 @@
+import asyncio
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config.channel_layers import ShardedRedisChannelLayer
+
+
+def run_process(hosts, prefix, rooms, members, messages):
+    return asyncio.run(send_messages(hosts, prefix, rooms, members, messages))
+
+
+async def send_messages(hosts, prefix, rooms, members, messages):
+    """
+    채팅방마다 members 개의 채널을 그룹에 넣고 messages 개의 group_send 를 보낸 뒤, 모든 채널이 다 받을 때까지 걸린 시간 반환
+    """
+    # 한 프로세스의 채널들은 Redis 의 같은 목록을 같이 쓰므로 capacity 를 넘는 메시지는 버려지지 않도록 전부 담을 만큼 잡음
+    layer = ShardedRedisChannelLayer(hosts=hosts, prefix=prefix, capacity=len(rooms) * members * messages)
+    groups = {f"chat_room_{room_id}": [await layer.new_channel() for _ in range(members)] for room_id in rooms}
+
+    for group, channels in groups.items():
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+    async def send(group):
+        for i in range(messages):
+            await layer.group_send(group, {"type": "chat_message", "message": f"message {i}"})
+
+    async def receive(channel):
+        for _ in range(messages):
+            await layer.receive(channel)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *(send(group) for group in groups),
+        *(receive(channel) for channels in groups.values() for channel in channels),
+    )
+    elapsed = time.perf_counter() - started_at
+
+    await layer.close_pools()
+
+    return elapsed
+
+
+class Command(BaseCommand):
+    help = "채널 레이어 Redis 수(샤드)에 따라 채팅방 group_send fan-out 처리량(rooms x messages/sec)을 측정합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--urls",
+            nargs="+",
+            default=settings.REDIS_CHANNEL_LAYER_URLS or [settings.REDIS_CONNECTIONS["channels"]["url"]],
+            help="채널 레이어 Redis 주소 (앞에서부터 샤드 수만큼 사용)",
+        )
+        parser.add_argument("--shards", type=int, nargs="+", help="측정할 샤드 수 (기본: 1 부터 --urls 개수까지)")
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--members", type=int, default=2, help="채팅방마다 메시지를 받는 웹소켓 수")
+        parser.add_argument("--messages", type=int, default=50, help="채팅방마다 보낼 메시지 수")
+        parser.add_argument("--processes", type=int, default=1, help="Daphne 프로세스처럼 채팅방을 나눠 맡는 프로세스 수")
+
+    def handle(self, *args, **options):
+        for shards in options["shards"] or range(1, len(options["urls"]) + 1):
+            hosts = [{"address": url} for url in options["urls"][:shards]]
+            prefix = f"bench_fanout_{uuid.uuid4().hex[:8]}"
+            room_ids = list(range(options["rooms"]))
+            # 프로세스마다 채팅방을 나눠 맡음
+            chunks = [room_ids[i :: options["processes"]] for i in range(options["processes"])]
+
+            layer = ShardedRedisChannelLayer(hosts=hosts, prefix=prefix)
+
+            try:
+                with ProcessPoolExecutor(max_workers=options["processes"]) as executor:
+                    futures = [
+                        executor.submit(run_process, hosts, prefix, chunk, options["members"], options["messages"]) for chunk in chunks
+                    ]
+                    # 프로세스들이 동시에 보내므로 가장 오래 걸린 프로세스의 시간
+                    elapsed = max(future.result() for future in futures)
+            finally:
+                asyncio.run(layer.flush())
+
+            groups_per_shard = Counter(layer.consistent_hash(f"chat_room_{room_id}") for room_id in room_ids)
+            sent = options["rooms"] * options["messages"]
+
+            self.stdout.write(
+                f"shards={shards} rooms={options['rooms']} processes={options['processes']} "
+                f"group_send={sent / elapsed:.0f}/sec delivered={sent * options['members'] / elapsed:.0f} msgs/sec "
+                f"groups/shard={[groups_per_shard[i] for i in range(shards)]}"
+            )
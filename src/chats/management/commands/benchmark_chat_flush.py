@@ -0,0 +1,90 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.services import MessageBufferService, MessageFlushService, chat_redis_client
+from chats.utils import generate_message_id
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Redis 버퍼 -> Postgres flush 처리량(msgs/sec)을 측정합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=1000)
+        parser.add_argument("--messages", type=int, default=10, help="방마다 버퍼에 넣을 메시지 수")
+        parser.add_argument("--rounds", type=int, default=3)
+        parser.add_argument("--shards", type=int, default=1, help="샤드 수 (샤드마다 flush worker 하나를 스레드로 실행)")
+
+    def handle(self, *args, **options):
+        users, rooms = self.create_rooms(options["rooms"])
+
+        try:
+            for i in range(options["rounds"]):
+                total = self.fill_buffers(rooms, users, options["messages"], options["shards"])
+
+                started_at = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options["shards"]) as executor:
+                    results = list(executor.map(self.flush_shard, range(options["shards"])))
+                elapsed = time.perf_counter() - started_at
+
+                flushed_rooms = sum(metrics["flushed_rooms"] for metrics in results)
+                flushed_messages = sum(metrics["flushed_messages"] for metrics in results)
+                self.stdout.write(
+                    f"round={i + 1} shards={options['shards']} rooms={flushed_rooms} messages={flushed_messages}/{total} "
+                    f"elapsed={elapsed:.2f}s throughput={flushed_messages / elapsed:.0f} msgs/sec"
+                )
+        finally:
+            for room in rooms:
+                chat_redis_client.delete(MessageBufferService.get_messages_key(room.id))
+                chat_redis_client.zrem(MessageFlushService.get_room_dirty_rooms_key(room.id, options["shards"]), room.id)
+            ChatRoom.objects.filter(id__in=[room.id for room in rooms]).update(latest_message=None)
+            Message.objects.filter(room__in=rooms).delete()
+            ChatRoom.objects.filter(id__in=[room.id for room in rooms]).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    @staticmethod
+    def flush_shard(shard):
+        try:
+            return MessageFlushService.flush_shard(shard)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def create_rooms(count):
+        users = [
+            User.objects.create_user(nickname=f"bench_flush{i}", email=f"bench_flush{i}@example.com", social_provider="google")
+            for i in range(2)
+        ]
+        rooms = ChatRoom.objects.bulk_create([ChatRoom() for _ in range(count)])
+        ChatRoomUser.objects.bulk_create([ChatRoomUser(chatroom=room, user=user) for room in rooms for user in users])
+
+        return users, rooms
+
+    @staticmethod
+    def fill_buffers(rooms, users, message_count, shards):
+        pipeline = chat_redis_client.pipeline(transaction=False)
+        now = timezone.now()
+
+        for room in rooms:
+            for i in range(message_count):
+                sender = users[i % 2]
+                message_data = {
+                    "room_id": room.id,
+                    "sender_id": sender.id,
+                    "message": f"message {i}",
+                    "created_at": now.isoformat(),
+                    "client_message_id": generate_message_id(),
+                }
+                pipeline.zadd(MessageBufferService.get_messages_key(room.id), {json.dumps(message_data): now.timestamp() + i / 1000})
+            # 채팅 서버처럼 채팅방 샤드의 dirty key 에 등록
+            pipeline.zadd(MessageFlushService.get_room_dirty_rooms_key(room.id, shards), {room.id: now.timestamp()}, nx=True)
+
+        pipeline.execute()
+
+        return len(rooms) * message_count
@@ -0,0 +1,118 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.services import ChatRoomListCacheService
+from chats.views import ChatRoomListView
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "채팅방이 많은 사용자의 채팅방 목록 조회 시간을 서브쿼리 4개 방식과 join 한 번 방식으로 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        user, others, rooms = self.create_rooms(options["rooms"])
+
+        try:
+            subquery = self.measure(lambda: list(self.get_subquery_queryset(user)), options["repeat"])
+            joined = self.measure(lambda: list(self.get_view_queryset(user, {})[1]), options["repeat"])
+            database_page = self.measure(lambda: self.get_first_page(user, use_index=False), options["repeat"])
+            index_miss = self.measure(lambda: (ChatRoomListCacheService.invalidate(user.id), self.get_first_page(user)), options["repeat"])
+            index_hit = self.measure(lambda: self.get_first_page(user), options["repeat"])
+
+            self.stdout.write(f"rooms={options['rooms']}")
+            self.stdout.write(f"subqueries (before): {subquery['median_ms']:.2f} ms ({subquery['queries']} queries)")
+            self.stdout.write(f"join (full list):    {joined['median_ms']:.2f} ms ({joined['queries']} queries)")
+            self.stdout.write(f"join (cursor page):  {database_page['median_ms']:.2f} ms ({database_page['queries']} queries)")
+            self.stdout.write(f"index page (miss):   {index_miss['median_ms']:.2f} ms ({index_miss['queries']} queries)")
+            self.stdout.write(f"index page (hit):    {index_hit['median_ms']:.2f} ms ({index_hit['queries']} queries)")
+        finally:
+            ChatRoomListCacheService.invalidate(user.id)
+            ChatRoom.objects.filter(id__in=[room.id for room in rooms]).update(latest_message=None)
+            ChatRoom.objects.filter(id__in=[room.id for room in rooms]).delete()
+            User.objects.filter(id__in=[user.id] + [other.id for other in others]).delete()
+
+    @staticmethod
+    def create_rooms(count):
+        user = User.objects.create_user(nickname="bench_rooms", email="bench_rooms@example.com", social_provider="google")
+        others = User.objects.bulk_create(
+            [User(nickname=f"bench_rooms{i}", email=f"bench_rooms{i}@example.com", social_provider="google") for i in range(count)]
+        )
+        rooms = ChatRoom.objects.bulk_create([ChatRoom() for _ in range(count)])
+        ChatRoomUser.objects.bulk_create(
+            [ChatRoomUser(chatroom=room, user=member) for room, other in zip(rooms, others) for member in (user, other)]
+        )
+        messages = Message.objects.bulk_create(
+            [Message(room=room, sender=other, message=f"message {i}") for i, (room, other) in enumerate(zip(rooms, others))]
+        )
+        for room, message in zip(rooms, messages):
+            room.latest_message = message
+            room.latest_message_time = message.created_at
+        ChatRoom.objects.bulk_update(rooms, ["latest_message", "latest_message_time"])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {ChatRoom._meta.db_table}")
+            cursor.execute(f"ANALYZE {ChatRoomUser._meta.db_table}")
+
+        return user, others, rooms
+
+    @staticmethod
+    def get_subquery_queryset(user):
+        # 변경 전 ChatRoomListView.get_queryset
+        chatroom_users = ChatRoomUser.objects.filter(chatroom=OuterRef("pk")).values(
+            "user__id", "user__nickname", "user__profile_image", "unread_count"
+        )
+
+        return (
+            ChatRoom.objects.filter(chatroom_users__user=user)
+            .select_related("latest_message__sender")
+            .annotate(
+                other_user_nickname=Subquery(chatroom_users.exclude(user__id=user.id).values("user__nickname")[:1]),
+                other_user_id=Subquery(chatroom_users.exclude(user__id=user.id).values("user__id")[:1]),
+                other_user_profile_image=Subquery(chatroom_users.exclude(user__id=user.id).values("user__profile_image")[:1]),
+                unread_count=Subquery(chatroom_users.filter(user__id=user.id).values("unread_count")[:1]),
+            )
+            .order_by("-latest_message_time")
+        )
+
+    @staticmethod
+    def get_view_queryset(user, params):
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=user)
+        view = ChatRoomListView()
+        view.request = Request(request)
+        view.request.user = user
+        view.format_kwarg = None
+
+        return view, view.get_queryset()
+
+    def get_first_page(self, user, use_index=True):
+        view, queryset = self.get_view_queryset(user, {"cursor": ""})
+
+        if not use_index:
+            return view.paginator.paginate_database(queryset, None, view.paginator.page_size)
+
+        return view.paginator.paginate_queryset(queryset, view.request, view=view)
+
+    @staticmethod
+    def measure(run, repeat):
+        elapsed = []
+
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started_at = time.perf_counter()
+                run()
+                elapsed.append((time.perf_counter() - started_at) * 1000)
+
+        return {"median_ms": statistics.median(elapsed), "queries": len(queries)}
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from chats.models import ChatRoom, Message
+from chats.views import MessageCursorPagination, MessagePagination
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "대량의 메시지가 있는 채팅방에서 page 번호 페이지네이션과 cursor 페이지네이션의 1페이지 / 깊은 페이지 조회 시간을 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1_000_000)
+        parser.add_argument("--pages", type=int, nargs="+", default=[1, 500])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        sender = User.objects.create_user(nickname="bench_sender", email="bench_sender@example.com", social_provider="google")
+        room = ChatRoom.objects.create()
+
+        try:
+            self.stdout.write(f"메시지 {options['messages']}건 생성 중...")
+            self.create_messages(room, sender, options["messages"])
+
+            queryset = Message.objects.filter(room_id=room.id).select_related("sender").order_by("-created_at", "-id")
+            page_size = MessagePagination.page_size
+
+            for page in options["pages"]:
+                page_number = self.measure(MessagePagination(), queryset, {"page": page}, options["repeat"])
+
+                cursor = {"cursor": ""}
+                if page > 1:
+                    last_message = queryset[(page - 1) * page_size - 1]
+                    cursor = {"cursor": MessageCursorPagination.encode_cursor(last_message.created_at, last_message.id)}
+                keyset = self.measure(MessageCursorPagination(), queryset, cursor, options["repeat"])
+
+                self.stdout.write(
+                    f"page={page:<5} "
+                    f"page-number: {page_number['median_ms']:.2f} ms ({page_number['queries']} queries) | "
+                    f"cursor: {keyset['median_ms']:.2f} ms ({keyset['queries']} queries)"
+                )
+        finally:
+            room.delete()
+            sender.delete()
+
+    @staticmethod
+    def create_messages(room, sender, count):
+        # ORM bulk_create 는 auto_now_add 때문에 시간이 모두 같아지므로 generate_series 로 직접 생성
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Message._meta.db_table} (room_id, sender_id, message, created_at)
+                SELECT %s, %s, 'message ' || i, now() - (%s - i) * interval '1 second'
+                FROM generate_series(1, %s) AS i
+                """,
+                [room.id, sender.id, count, count],
+            )
+            cursor.execute(f"ANALYZE {Message._meta.db_table}")
+
+    @staticmethod
+    def measure(paginator, queryset, params, repeat):
+        request = Request(APIRequestFactory().get("/", params))
+        elapsed = []
+
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started_at = time.perf_counter()
+                page = paginator.paginate_queryset(queryset, request)
+                list(page)
+                elapsed.append((time.perf_counter() - started_at) * 1000)
+
+        return {"median_ms": statistics.median(elapsed), "queries": len(queries)}
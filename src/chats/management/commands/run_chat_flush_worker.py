@@ -0,0 +1,105 @@
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chats.services import ChatFlushLease, MessageFlushService
+from config.redis_pools import check_health
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Redis 에 쌓인 채팅 메시지를 DB 로 동기화하는 flush worker 를 실행합니다. "
+        "채팅방은 room_id % CHAT_FLUSH_SHARDS 로 나뉘고, 샤드마다 Redis lease 를 가진 worker 하나만 flush 합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shard", type=int, action="append", help="담당할 샤드 번호 (여러 번 지정 가능, 기본값: 전체)")
+        parser.add_argument("--interval", type=float, default=settings.CHAT_MESSAGE_SYNC_INTERVAL, help="flush 주기 (초)")
+        parser.add_argument("--lease-ttl", type=float, default=settings.CHAT_FLUSH_LEASE_TTL, help="lease 유효 시간 (초)")
+        parser.add_argument("--once", action="store_true", help="한 번만 flush 하고 종료")
+        parser.add_argument("--drain", action="store_true", help="모든 샤드의 lease 를 잡고 남은 버퍼를 전부 동기화한 뒤 종료")
+        parser.add_argument("--scan", action="store_true", help="시작할 때 SCAN 으로 버퍼 key 를 찾아 dirty 채팅방 목록을 보충")
+        parser.add_argument("--status", action="store_true", help="Redis 연결 상태와 샤드별 flush 지표만 출력")
+
+    def handle(self, *args, **options):
+        # 샤드는 메시지를 버퍼에 쌓을 때 정해지므로 채팅 서버와 같은 설정값을 씀
+        shards = settings.CHAT_FLUSH_SHARDS
+        shard_ids = options["shard"] or list(range(shards))
+
+        if any(shard < 0 or shard >= shards for shard in shard_ids):
+            raise CommandError(f"--shard 는 0 이상 {shards} 미만이어야 합니다.")
+        if options["lease_ttl"] <= options["interval"]:
+            raise CommandError("--lease-ttl 은 --interval 보다 길어야 합니다.")
+
+        if options["status"]:
+            for name, (healthy, result) in check_health().items():
+                self.stdout.write(f"redis={name} {'ok' if healthy else 'error'} {result}{'ms' if healthy else ''}")
+            for shard in range(shards):
+                self.stdout.write(f"shard={shard} {MessageFlushService.get_metrics(shard)}")
+            return
+
+        if options["scan"]:
+            self.stdout.write(f"registered {MessageFlushService.register_dirty_rooms_by_scan()} buffered rooms by SCAN")
+
+        if options["drain"]:
+            self.drain(shards, options["lease_ttl"])
+            return
+
+        leases = {shard: ChatFlushLease(shard, options["lease_ttl"]) for shard in shard_ids}
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        try:
+            while self.running:
+                started_at = time.monotonic()
+                self.flush(leases)
+
+                if options["once"]:
+                    break
+
+                # 종료 신호를 빨리 받을 수 있도록 짧게 나눠서 대기
+                while self.running and time.monotonic() - started_at < options["interval"]:
+                    time.sleep(min(1, options["interval"]))
+        finally:
+            # 종료 전에 가진 샤드를 마지막으로 한 번 더 flush 하고 lease 를 넘겨줌
+            if not options["once"]:
+                self.flush(leases)
+            for lease in leases.values():
+                lease.release()
+
+    def flush(self, leases):
+        shards = settings.CHAT_FLUSH_SHARDS
+
+        for shard, lease in leases.items():
+            if not lease.acquire():
+                continue
+
+            metrics = MessageFlushService.flush_shard(shard, lease=lease)
+            logger.info(f"Chat flush: {metrics}")
+            self.stdout.write(
+                f"shard={shard}/{shards} rooms={metrics['flushed_rooms']}/{metrics['dirty_rooms']} "
+                f"messages={metrics['flushed_messages']} rows/sec={metrics['rows_per_sec']} lag={metrics['lag_seconds']}s duration={metrics['duration_ms']}ms"
+            )
+
+    def drain(self, shards, lease_ttl):
+        leases = {shard: ChatFlushLease(shard, lease_ttl) for shard in range(shards)}
+        acquired = [lease for lease in leases.values() if lease.acquire()]
+
+        try:
+            if len(acquired) != shards:
+                raise CommandError("다른 flush worker 가 lease 를 가지고 있습니다. worker 를 멈춘 뒤 다시 실행해 주세요.")
+
+            # 모든 샤드의 lease 를 가진 상태에서만 flush 하므로 돌고 있는 worker 와 겹치지 않음
+            self.flush(leases)
+        finally:
+            for lease in acquired:
+                lease.release()
+
+    def stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0004_chatroom_latest_message_chatroom_latest_message_time"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["room", "created_at", "id"], name="message_room_created_id_idx"),
+        ),
+    ]
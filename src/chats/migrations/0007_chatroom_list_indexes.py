@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-18 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0006_message_client_message_id"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatroom",
+            index=models.Index(
+                models.OrderBy(models.F("latest_message_time"), descending=True, nulls_last=True),
+                models.OrderBy(models.F("id"), descending=True),
+                name="chatroom_latest_time_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatroomuser",
+            index=models.Index(fields=["user", "chatroom"], name="chatroomuser_user_room_idx"),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_user_pairs(apps, schema_editor):
+    ChatRoom = apps.get_model("chats", "ChatRoom")
+    ChatRoomUser = apps.get_model("chats", "ChatRoomUser")
+
+    members = {}
+    for chatroom_id, user_id in ChatRoomUser.objects.values_list("chatroom_id", "user_id").iterator():
+        members.setdefault(chatroom_id, []).append(user_id)
+
+    pairs = set()
+    chatrooms = []
+    for chatroom_id in sorted(members):
+        if len(members[chatroom_id]) != 2:
+            continue
+
+        # 같은 두 사용자의 채팅방이 이미 여러 개면 가장 먼저 만든 채팅방에만 채움
+        pair = tuple(sorted(members[chatroom_id]))
+        if pair in pairs:
+            continue
+        pairs.add(pair)
+        chatrooms.append(ChatRoom(id=chatroom_id, user_low_id=pair[0], user_high_id=pair[1]))
+
+    ChatRoom.objects.bulk_update(chatrooms, ["user_low", "user_high"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0007_chatroom_list_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatroom",
+            name="user_high",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatroom",
+            name="user_low",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(fill_user_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="chatroom",
+            constraint=models.UniqueConstraint(fields=("user_low", "user_high"), name="chatroom_user_pair_unique"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.2 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0008_chatroom_user_pair"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="seq",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(fields=["room", "seq"], name="message_room_seq_idx"),
+        ),
+    ]
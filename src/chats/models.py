@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -9,6 +11,18 @@ class ChatRoom(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     latest_message = models.ForeignKey("Message", null=True, blank=True, on_delete=models.SET_NULL, related_name="latest_in_room")
     latest_message_time = models.DateTimeField(null=True, blank=True)
+    # 1대1 채팅방의 두 사용자 (id 가 작은 쪽, 큰 쪽), 같은 두 사용자의 채팅방이 두 개 생기지 않도록 unique
+    user_low = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    user_high = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+
+    class Meta:
+        indexes = [
+            # 채팅방 목록 keyset 페이지네이션용 (latest_message_time DESC NULLS LAST, id DESC)
+            models.Index(F("latest_message_time").desc(nulls_last=True), F("id").desc(), name="chatroom_latest_time_id_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["user_low", "user_high"], name="chatroom_user_pair_unique"),
+        ]
 
     def update_latest_message(self, message):
         self.latest_message = message
@@ -23,14 +37,30 @@ class ChatRoomUser(models.Model):
 
     class Meta:
         unique_together = ("chatroom", "user")
+        indexes = [
+            # 사용자별 채팅방 목록 조회용, unique_together 인덱스는 chatroom 이 앞이라 user 로 찾을 때 쓰이지 않음
+            models.Index(fields=["user", "chatroom"], name="chatroomuser_user_room_idx"),
+        ]
 
 
 class Message(models.Model):
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name="message_sender")
     message = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # 버퍼에서 flush 할 때 보낸 시각을 그대로 저장해야 하므로 auto_now_add 대신 default 사용
+    created_at = models.DateTimeField(default=timezone.now)
+    # 클라이언트가 보낸 메시지 id (없으면 서버에서 uuid4 로 생성), 같은 메시지가 두 번 저장되지 않도록 함
+    client_message_id = models.CharField(max_length=64, null=True, blank=True)
+    # 채팅방마다 1 부터 늘어나는 순번 (버퍼에 넣을 때 Redis INCR 로 붙임), 이전 메시지는 없음
+    seq = models.BigIntegerField(null=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.room.update_latest_message(self)
+    class Meta:
+        indexes = [
+            # 채팅 내역 keyset 페이지네이션용
+            models.Index(fields=["room", "created_at", "id"], name="message_room_created_id_idx"),
+            # 재연결 시 놓친 메시지 조회용
+            models.Index(fields=["room", "seq"], name="message_room_seq_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["sender", "client_message_id"], name="message_sender_client_message_id_unique"),
+        ]
@@ -10,7 +10,7 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ("id", "sender_nickname", "message", "timestamp")
+        fields = ("id", "sender_nickname", "message", "timestamp", "seq")
 
     def get_sender_nickname(self, obj):
         return obj.sender.nickname
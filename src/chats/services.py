@@ -1,92 +1,933 @@
+import hashlib
+import json
 import logging
+import os
+import socket
+import time
+import uuid
 
+import pytz
 import redis
 from django.conf import settings
-from django.db.models import F
+from django.db import connection, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from config.redis_pools import get_async_redis, get_redis
+from users.models import User
 
 from .models import ChatRoom, ChatRoomUser, Message
 
 logger = logging.getLogger(__name__)
 
+# 메시지 저장 / 접속 확인 / 안 읽은 수 증가를 한 번의 Lua 스크립트로 처리하므로 채팅 관련 key 는 모두 "chat" 연결에 둠
+
+# 안 읽은 메시지 수는 사용자마다 Redis hash (unread_counts:{user_id}, 채팅방 id -> 개수) 가 기준이고 DB 에는 모아서 반영함
+# 이 field 가 있으면 DB 값까지 합쳐진 hash, 없으면 (Redis 를 새로 띄운 경우 등) DB 값에 더할 증가분만 들어 있음
+UNREAD_COUNTS_LOADED_FIELD = "_loaded"
+
+# ChatRoomUser.unread_count 에 아직 반영하지 않은 안 읽은 수 ("{user_id}:{room_id}" set)
+DIRTY_UNREAD_COUNTS_KEY = "dirty_unread_counts"
+
+# 이전 버전이 쌓아둔 안 읽은 수 증가분 ("{room_id}:{user_id}" -> 증가분), flush 할 때 사용자별 hash 로 옮김
+PENDING_UNREAD_COUNTS_KEY = "chat_pending_unread_counts"
+
+# 아직 DB 에 저장되지 않은 메시지가 있는 채팅방 (room_id -> 처음 버퍼에 쌓인 시각), flush worker 가 자기 샤드 key 만 보고 flush 함
+# 샤드는 메시지를 버퍼에 쌓을 때 room_id % settings.CHAT_FLUSH_SHARDS 로 정해짐
+DIRTY_CHAT_ROOMS_KEY = "chat:dirty:{shard}"
+
+# 샤드로 나누기 전에 쓰던 dirty 채팅방 zset, register_dirty_rooms_by_scan 에서 샤드 key 로 옮기고 지움
+LEGACY_DIRTY_CHAT_ROOMS_KEY = "dirty_chat_rooms"
+
+# KEYS: 메시지 버퍼, 채팅방 접속자 set, 수신자 안 읽은 수 hash, dirty 안 읽은 수 set, 채팅방 샤드의 dirty 채팅방 zset, 발신자 / 수신자 채팅방 목록 zset,
+#       발신자 안 읽은 수 hash, 채팅방 순번
+# ARGV: 수신자 id (상대방이 나갔으면 빈 값), dirty 안 읽은 수 member, 채팅방 id, 이후 메시지마다 score, 메시지 json
+# 메시지 수만큼 순번을 INCRBY 로 받아서 메시지 json 에 "seq" 로 붙이고 ZADD 한 번으로 저장, 수신자가 접속 중이 아니면 안 읽은 수를 올림
+# {수신자 접속 여부 (1 / 0), 수신자 안 읽은 수, 발신자 안 읽은 수, 마지막 순번} 반환, 안 읽은 수는 DB 값이 합쳐지지 않은 hash 면 -1
+BUFFER_MESSAGES_SCRIPT = """
+local count = (#ARGV - 3) / 2
+local last_seq = redis.call("INCRBY", KEYS[9], count)
+local members = {}
+-- score 는 숫자로 바꿔서 넘기면 정밀도가 줄어드므로 받은 문자열 그대로 씀
+local first_score, latest_score = ARGV[4], ARGV[4]
+for i = 1, count do
+    local score = ARGV[2 + i * 2]
+    if tonumber(score) < tonumber(first_score) then
+        first_score = score
+    end
+    if tonumber(score) > tonumber(latest_score) then
+        latest_score = score
+    end
+    table.insert(members, score)
+    table.insert(members, string.sub(ARGV[3 + i * 2], 1, -2) .. ', "seq": ' .. (last_seq - count + i) .. "}")
+end
+redis.call("ZADD", KEYS[1], unpack(members))
+redis.call("ZADD", KEYS[5], "NX", first_score, ARGV[3])
+-- 상대방이 나간 채팅방은 수신자 id 가 빈 값이므로 수신자 key 는 건드리지 않음
+local has_receiver = ARGV[1] ~= ""
+local list_keys = {KEYS[6]}
+if has_receiver then
+    table.insert(list_keys, KEYS[7])
+end
+for _, key in ipairs(list_keys) do
+    if redis.call("EXISTS", key) == 1 then
+        redis.call("ZADD", key, latest_score, ARGV[3])
+    end
+end
+local receiver_is_online = 0
+if has_receiver then
+    receiver_is_online = redis.call("SISMEMBER", KEYS[2], ARGV[1])
+    if receiver_is_online == 0 then
+        redis.call("HINCRBY", KEYS[3], ARGV[3], count)
+        redis.call("SADD", KEYS[4], ARGV[2])
+    end
+end
+local result = {receiver_is_online}
+for i, key in ipairs({KEYS[3], KEYS[8]}) do
+    if i == 1 and not has_receiver then
+        table.insert(result, -1)
+    elseif redis.call("HEXISTS", key, "_loaded") == 1 then
+        table.insert(result, tonumber(redis.call("HGET", key, ARGV[3]) or 0))
+    else
+        table.insert(result, -1)
+    end
+end
+table.insert(result, last_seq)
+return result
+"""
+
+# KEYS: 안 읽은 수 hash
+# ARGV: 채팅방 id, DB 의 unread_count 를 번갈아 나열
+# 아직 DB 값을 합치지 않은 hash 에만 더함 (그 사이 쌓인 증가분은 그대로 유지)
+LOAD_UNREAD_COUNTS_SCRIPT = """
+if redis.call("HEXISTS", KEYS[1], "_loaded") == 1 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call("HINCRBY", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("HSET", KEYS[1], "_loaded", 1)
+return 1
+"""
+
+# 접속자가 있는 채팅방 id set
+ACTIVE_CHAT_ROOMS_KEY = "active_chat_rooms"
+
+# 채팅방이 하나도 없는 사용자도 캐시 hit 이 되도록 채팅방 목록 zset 에 항상 넣어두는 member
+CHAT_ROOM_LIST_EMPTY_MEMBER = "-"
+
+# 메시지가 없는 채팅방의 score 기준값, room_id 를 더해도 0 (1970년) 보다 작고 float 으로 정확히 표현됨
+CHAT_ROOM_LIST_NO_MESSAGE_SCORE = -(2**52)
+
+# KEYS: 채팅방 목록 zset 들
+# ARGV: score, 채팅방 id
+# 캐시가 없는 사용자는 조회할 때 DB 에서 다시 만들므로 건너뜀
+TOUCH_CHAT_ROOM_LIST_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call("EXISTS", KEYS[i]) == 1 then
+        redis.call("ZADD", KEYS[i], ARGV[1], ARGV[2])
+    end
+end
+return 0
+"""
 
-def get_redis_client():
-    try:
-        client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD, db=2)
-        client.ping()  # 연결 테스트
-        return client
-    except Exception as e:
-        logger.error(f"Redis 연결 실패: {str(e)}")
-        return None
+# KEYS: dirty 채팅방 zset, 메시지 버퍼, last_sync_score(이전 버퍼용)
+# ARGV: 채팅방 id
+# flush 하는 동안 새 메시지가 들어오지 않았을 때만 dirty 목록에서 제거
+CLEAN_DIRTY_ROOM_SCRIPT = """
+if redis.call("ZCARD", KEYS[2]) > 0 then
+    return 0
+end
+redis.call("DEL", KEYS[3])
+return redis.call("ZREM", KEYS[1], ARGV[1])
+"""
 
+# 자신이 가진 lease 일 때만 연장 / 해제
+RENEW_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
 
-redis_client = get_redis_client()
+
+# 채팅 keyspace (settings.REDIS_CONNECTIONS["chat"]), 커넥션은 처음 명령을 보낼 때 맺음
+chat_redis_client = get_redis("chat")
 
 
 class ChatService:
     @staticmethod
-    def get_unread_count(room_id, user_id):
-        try:
-            cache_key = f"unread_count:{room_id}:{user_id}"
+    def get_unread_counts_key(user_id):
+        return f"unread_counts:{user_id}"
+
+    @staticmethod
+    def get_dirty_unread_count_member(room_id, user_id):
+        return f"{user_id}:{room_id}"
+
+    @staticmethod
+    async def buffer_message(room_id, message_data, score, receiver_id):
+        """
+        메시지 하나를 버퍼에 저장, (수신자 접속 여부, {user_id: 안 읽은 수}, 순번) 반환
+        """
+        receiver_is_online, unread_counts, seqs = await ChatService.buffer_messages(room_id, [(message_data, score)], receiver_id)
+
+        return receiver_is_online, unread_counts, seqs[0]
+
+    @staticmethod
+    async def buffer_messages(room_id, messages, receiver_id):
+        """
+        한 사람이 보낸 메시지들 [(message_data, score)] 의 버퍼 저장, 순번 발급, 수신자 접속 확인, 안 읽은 수 증가를 Redis 왕복 한 번으로 처리
+        DB 의 unread_count 는 flush_unread_counts 에서 모아서 반영
+        순번 key 가 없으면 1 부터 다시 붙으므로 먼저 MessageBufferService.load_seq 로 DB 의 마지막 순번을 채워 둬야 함
+        (수신자 접속 여부, {user_id: 안 읽은 수}, 메시지별 순번) 반환, 안 읽은 수는 DB 값이 아직 합쳐지지 않아 알 수 없으면 None
+        상대방이 나간 채팅방은 receiver_id 가 None 이고, 메시지만 저장하고 수신자 안 읽은 수는 반환하지 않음
+        """
+        client = get_async_redis("chat")
+        script = client.register_script(BUFFER_MESSAGES_SCRIPT)
+        sender_id = messages[0][0]["sender_id"]
+        # 수신자가 없으면 빈 값을 넘기고, 수신자 key 는 스크립트에서 쓰지 않음
+        receiver = "" if receiver_id is None else receiver_id
+        args = [receiver, ChatService.get_dirty_unread_count_member(room_id, receiver), room_id]
+        for message_data, score in messages:
+            args += [score, json.dumps(message_data)]
+
+        receiver_is_online, receiver_unread_count, sender_unread_count, last_seq = await script(
+            keys=[
+                MessageBufferService.get_messages_key(room_id),
+                f"chat_room_{room_id}_users",
+                ChatService.get_unread_counts_key(receiver),
+                DIRTY_UNREAD_COUNTS_KEY,
+                MessageFlushService.get_room_dirty_rooms_key(room_id),
+                ChatRoomListCacheService.get_key(sender_id),
+                ChatRoomListCacheService.get_key(receiver),
+                ChatService.get_unread_counts_key(sender_id),
+                MessageBufferService.get_seq_key(room_id),
+            ],
+            args=args,
+        )
+        unread_counts = {sender_id: sender_unread_count if sender_unread_count >= 0 else None}
+        if receiver_id is not None:
+            unread_counts[receiver_id] = receiver_unread_count if receiver_unread_count >= 0 else None
+
+        return bool(receiver_is_online), unread_counts, list(range(last_seq - len(messages) + 1, last_seq + 1))
 
-            if redis_client is not None:
-                cached_count = redis_client.get(cache_key)
-                if cached_count is not None:
-                    return int(cached_count)
+    @staticmethod
+    def load_unread_counts(user_id):
+        """
+        hash 에 아직 DB 값이 합쳐지지 않았으면 ChatRoomUser.unread_count 를 더함 (Redis 를 새로 띄운 뒤 처음 쓸 때)
+        """
+        key = ChatService.get_unread_counts_key(user_id)
+        if chat_redis_client.hexists(key, UNREAD_COUNTS_LOADED_FIELD):
+            return False
+
+        args = []
+        for room_id, unread_count in ChatRoomUser.objects.filter(user_id=user_id).values_list("chatroom_id", "unread_count"):
+            args += [room_id, unread_count]
+
+        return bool(chat_redis_client.register_script(LOAD_UNREAD_COUNTS_SCRIPT)(keys=[key], args=args))
+
+    @staticmethod
+    def get_unread_counts(user_id):
+        """
+        사용자의 채팅방별 안 읽은 메시지 수 {room_id: 개수}
+        """
+        ChatService.load_unread_counts(user_id)
+        counts = chat_redis_client.hgetall(ChatService.get_unread_counts_key(user_id))
+        counts.pop(UNREAD_COUNTS_LOADED_FIELD.encode(), None)
+
+        return {int(room_id): int(count) for room_id, count in counts.items()}
+
+    @staticmethod
+    def migrate_pending_unread_counts():
+        # 이전 버전이 남긴 증가분은 사용자별 hash 에 더함 (DB 값이 합쳐졌든 아니든 증가분이므로 그대로 더하면 됨)
+        pipeline = chat_redis_client.pipeline(transaction=True)
+        pipeline.hgetall(PENDING_UNREAD_COUNTS_KEY)
+        pipeline.delete(PENDING_UNREAD_COUNTS_KEY)
+        pending, _ = pipeline.execute()
+
+        if not pending:
+            return 0
+
+        pipeline = chat_redis_client.pipeline(transaction=True)
+        for field, delta in pending.items():
+            room_id, user_id = field.decode().split(":")
+            pipeline.hincrby(ChatService.get_unread_counts_key(user_id), room_id, int(delta))
+            pipeline.sadd(DIRTY_UNREAD_COUNTS_KEY, ChatService.get_dirty_unread_count_member(room_id, user_id))
+        pipeline.execute()
+
+        return len(pending)
 
-            chatroom_user = ChatRoomUser.objects.get(chatroom_id=room_id, user_id=user_id)
-            count = chatroom_user.unread_count
+    @staticmethod
+    def flush_unread_counts(batch_size=None):
+        """
+        바뀐 안 읽은 수를 Redis hash 에서 읽어 ChatRoomUser.unread_count 에 묶음마다 UPDATE ... FROM (VALUES ...) 한 번으로 반영
+        반영한 행 수 반환
+        """
+        batch_size = batch_size or settings.CHAT_FLUSH_BATCH_SIZE
+        ChatService.migrate_pending_unread_counts()
+        flushed = 0
+
+        while True:
+            # SPOP 으로 꺼내므로 여러 worker 가 동시에 flush 해도 같은 항목을 나눠 가짐
+            members = chat_redis_client.spop(DIRTY_UNREAD_COUNTS_KEY, batch_size)
+            if not members:
+                return flushed
+
+            try:
+                flushed += ChatService.write_unread_counts([member.decode().split(":") for member in members])
+            except Exception:
+                # 반영하지 못한 항목은 다음 flush 때 다시 반영
+                chat_redis_client.sadd(DIRTY_UNREAD_COUNTS_KEY, *members)
+                raise
+
+    @staticmethod
+    def write_unread_counts(user_room_ids):
+        for user_id in {user_id for user_id, _ in user_room_ids}:
+            ChatService.load_unread_counts(user_id)
+
+        pipeline = chat_redis_client.pipeline(transaction=False)
+        for user_id, room_id in user_room_ids:
+            pipeline.hget(ChatService.get_unread_counts_key(user_id), room_id)
 
-            if redis_client is not None:
-                redis_client.setex(cache_key, 300, count)
+        params = []
+        for (user_id, room_id), count in zip(user_room_ids, pipeline.execute()):
+            params += [int(room_id), int(user_id), int(count or 0)]
 
-            return count
+        quote_name = connection.ops.quote_name
+        sql = f"""
+            UPDATE {quote_name(ChatRoomUser._meta.db_table)} AS chatroom_user
+            SET unread_count = counts.unread_count
+            FROM (VALUES {", ".join(["(%s, %s, %s)"] * len(user_room_ids))}) AS counts (chatroom_id, user_id, unread_count)
+            WHERE chatroom_user.chatroom_id = counts.chatroom_id AND chatroom_user.user_id = counts.user_id
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    @staticmethod
+    def get_unread_count(room_id, user_id):
+        try:
+            ChatService.load_unread_counts(user_id)
+            return int(chat_redis_client.hget(ChatService.get_unread_counts_key(user_id), room_id) or 0)
         except redis.RedisError as e:
             logger.error(f"Redis error in get_unread_count: {str(e)}")
+
+        try:
+            # Redis 를 쓸 수 없으면 마지막으로 반영된 DB 값
+            return ChatRoomUser.objects.get(chatroom_id=room_id, user_id=user_id).unread_count
         except ChatRoomUser.DoesNotExist:
             logger.error(f"ChatRoomUser not found for room_id={room_id}, user_id={user_id}")
             return 0
-        except Exception as e:
-            logger.error(f"Unexpected error in get_unread_count: {str(e)}")
-            return 0
 
     @staticmethod
     def increment_unread_count(room_id, receiver_id):
         try:
-            updated = ChatRoomUser.objects.filter(chatroom_id=room_id, user_id=receiver_id).update(unread_count=F("unread_count") + 1)
-
-            if updated == 0:
-                logger.warning(f"No ChatRoomUser found for room_id={room_id}, receiver_id={receiver_id}")
-                return
-
-            if redis_client is not None:
-                try:
-                    cache_key = f"unread_count:{room_id}:{receiver_id}"
-                    redis_client.incr(cache_key)
-                except redis.RedisError as e:
-                    logger.error(f"Redis error in increment_unread_count: {str(e)}")
-            else:
-                logger.warning("Redis client is not available. Skipping cache update.")
-
+            # buffer_message 와 같은 방식으로 Redis hash 만 올리고 DB 반영은 flush 때 처리
+            pipeline = chat_redis_client.pipeline(transaction=True)
+            pipeline.hincrby(ChatService.get_unread_counts_key(receiver_id), room_id, 1)
+            pipeline.sadd(DIRTY_UNREAD_COUNTS_KEY, ChatService.get_dirty_unread_count_member(room_id, receiver_id))
+            pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Redis error in increment_unread_count: {str(e)}. Updating database directly.")
+            ChatRoomUser.objects.filter(chatroom_id=room_id, user_id=receiver_id).update(unread_count=F("unread_count") + 1)
         except Exception as e:
             logger.error(f"Unexpected error in increment_unread_count: {str(e)}")
 
     @staticmethod
     def reset_unread_count(room_id, user_id):
         try:
-            # 데이터베이스 업데이트
-            chatroom_user = ChatRoomUser.objects.get(chatroom_id=room_id, user_id=user_id)
-            chatroom_user.unread_count = 0
-            chatroom_user.save()
-
-            # Redis 캐시 업데이트
-            if redis_client is not None:
-                cache_key = f"unread_count:{room_id}:{user_id}"
-                redis_client.set(cache_key, 0)
-            else:
-                logger.warning("Redis client is not available. Skipping cache update.")
+            # DB 값을 먼저 합쳐 두어야 나중에 합칠 때 0 위에 예전 값이 더해지지 않음
+            ChatService.load_unread_counts(user_id)
+            pipeline = chat_redis_client.pipeline(transaction=True)
+            pipeline.hset(ChatService.get_unread_counts_key(user_id), room_id, 0)
+            pipeline.sadd(DIRTY_UNREAD_COUNTS_KEY, ChatService.get_dirty_unread_count_member(room_id, user_id))
+            pipeline.execute()
         except redis.RedisError as e:
-            logger.error(f"Redis error in reset_unread_count: {str(e)}")
-        except ChatRoomUser.DoesNotExist:
-            logger.error(f"ChatRoomUser not found for room_id={room_id}, user_id={user_id}")
+            logger.error(f"Redis error in reset_unread_count: {str(e)}. Updating database directly.")
+            ChatRoomUser.objects.filter(chatroom_id=room_id, user_id=user_id).update(unread_count=0)
         except Exception as e:
             logger.error(f"Unexpected error in reset_unread_count: {str(e)}")
+
+
+class MessageBufferService:
+    @staticmethod
+    def get_messages_key(room_id):
+        return f"chat_room_{room_id}_messages"
+
+    @staticmethod
+    def get_last_sync_score_key(room_id):
+        return f"last_sync_score_{room_id}"
+
+    @staticmethod
+    def get_seq_key(room_id):
+        return f"chat_room_{room_id}_seq"
+
+    @staticmethod
+    def load_seq(room_id, last_seq=None):
+        """
+        순번 key 가 없으면 (새 채팅방이거나 Redis 를 새로 띄운 경우) DB 에 저장된 마지막 순번으로 채움
+        마지막 순번을 이미 알면 (새로 만든 채팅방이면 0) DB 를 읽지 않음
+        """
+        key = MessageBufferService.get_seq_key(room_id)
+        if last_seq is None:
+            if chat_redis_client.exists(key):
+                return
+            last_seq = Message.objects.filter(room_id=room_id).aggregate(last_seq=Max("seq"))["last_seq"] or 0
+
+        chat_redis_client.set(key, last_seq, nx=True)
+
+    @staticmethod
+    def next_seq(room_id, last_seq=None):
+        # 버퍼를 거치지 않고 DB 에 바로 저장하는 메시지(인사 메시지 등)의 순번
+        MessageBufferService.load_seq(room_id, last_seq)
+        return chat_redis_client.incr(MessageBufferService.get_seq_key(room_id))
+
+    @staticmethod
+    def get_messages_after(room_id, seq, limit):
+        """
+        순번이 seq 보다 큰 메시지를 Redis 버퍼와 DB 에서 합쳐 순번 순으로 최대 limit 개 반환 (재연결 시 놓친 메시지)
+        (메시지 목록, limit 을 넘어서 잘렸는지) 반환
+        """
+        # 버퍼를 DB 보다 먼저 읽어야 그 사이에 동기화된 메시지가 양쪽에서 모두 빠지지 않음
+        buffered_messages = [message for message in MessageBufferService.get_unsynced_messages(room_id) if (message.seq or 0) > seq]
+        page = list(Message.objects.filter(room_id=room_id, seq__gt=seq).select_related("sender").order_by("seq")[: limit + 1])
+
+        messages = sorted(MessageBufferService.merge(buffered_messages, page), key=lambda message: message.seq)
+
+        return messages[:limit], len(messages) > limit
+
+    @staticmethod
+    def get_legacy_message_id(member):
+        # client_message_id 없이 버퍼에 들어간 메시지는 member 로 id 를 정해서 다시 flush 해도 같은 id 가 되게 함
+        return f"legacy:{hashlib.sha1(member).hexdigest()}"
+
+    @staticmethod
+    def get_latest_buffered_messages(room_ids):
+        """
+        채팅방마다 아직 DB 에 저장되지 않은 가장 최근 메시지를 {room_id: (message_data, score)} 로 반환 (Redis 왕복 한 번)
+        """
+        room_ids = list(room_ids)
+        pipeline = chat_redis_client.pipeline(transaction=False)
+        for room_id in room_ids:
+            pipeline.zrange(MessageBufferService.get_messages_key(room_id), -1, -1, withscores=True)
+
+        return {
+            room_id: (json.loads(buffered[0][0]), buffered[0][1]) for room_id, buffered in zip(room_ids, pipeline.execute()) if buffered
+        }
+
+    @staticmethod
+    def get_unsynced_messages(room_id, limit=None, before=None):
+        """
+        아직 DB 에 동기화되지 않은 Redis 버퍼의 메시지를 저장되지 않은 Message 객체로 최신순 반환
+        limit 이 있으면 최신 limit 개만, before(score) 가 있으면 그 이하의 메시지만 읽음
+        last_sync_score 와 버퍼를 한 트랜잭션으로 읽어서 동기화 도중에도 메시지가 누락되지 않음
+        """
+        try:
+            pipeline = chat_redis_client.pipeline(transaction=True)
+            pipeline.get(MessageBufferService.get_last_sync_score_key(room_id))
+            pipeline.zrevrangebyscore(
+                MessageBufferService.get_messages_key(room_id),
+                "+inf" if before is None else before,
+                "-inf",
+                start=None if limit is None else 0,
+                num=limit,
+                withscores=True,
+            )
+            last_sync_score, buffered = pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"Redis error in get_unsynced_messages: {str(e)}")
+            return []
+
+        last_sync_score = float(last_sync_score or 0)
+        unsynced = []
+        for member, score in buffered:
+            message_data = json.loads(member)
+            if "client_message_id" not in message_data:
+                if score <= last_sync_score:
+                    continue
+                message_data["client_message_id"] = MessageBufferService.get_legacy_message_id(member)
+            unsynced.append((message_data, score))
+
+        if not unsynced:
+            return []
+
+        senders = User.objects.in_bulk({message_data["sender_id"] for message_data, _ in unsynced})
+        messages = [
+            Message(
+                room_id=room_id,
+                sender=senders.get(message_data["sender_id"]),
+                message=message_data["message"],
+                created_at=timezone.datetime.fromtimestamp(score),
+                client_message_id=message_data["client_message_id"],
+                seq=message_data.get("seq"),
+            )
+            for message_data, score in unsynced
+            if message_data["sender_id"] in senders
+        ]
+
+        return sorted(messages, key=lambda message: message.created_at, reverse=True)
+
+    @staticmethod
+    def merge(buffered_messages, page):
+        # 버퍼를 읽은 뒤 동기화가 끝난 메시지는 DB 쪽(id 가 있는 객체)만 남김
+        synced_ids = {(message.sender_id, message.client_message_id) for message in page if message.client_message_id}
+        synced = {(message.sender_id, message.message, message.created_at) for message in page}
+        buffered_messages = [
+            message
+            for message in buffered_messages
+            if (message.sender_id, message.client_message_id) not in synced_ids
+            and (message.sender_id, message.message, message.created_at) not in synced
+        ]
+
+        return sorted(buffered_messages + list(page), key=lambda message: message.created_at, reverse=True)
+
+
+class ChatRoomService:
+    @staticmethod
+    def get_or_create_direct_room(user, other_user):
+        """
+        두 사용자의 1대1 채팅방을 (user_low, user_high) unique 키로 INSERT ... ON CONFLICT DO NOTHING 해서 가져오거나 만듦
+        새로 만들면 참여자 두 명도 같이 저장, 동시에 요청해도 채팅방은 하나만 생김 ((채팅방, 생성 여부) 반환)
+        호출하는 쪽에서 transaction.atomic 으로 감싸야 채팅방과 참여자가 함께 저장됨
+        """
+        user_low_id, user_high_id = sorted((user.id, other_user.id))
+        quote_name = connection.ops.quote_name
+        now = timezone.now()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {quote_name(ChatRoom._meta.db_table)} (created_at, updated_at, user_low_id, user_high_id)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_low_id, user_high_id) DO NOTHING
+                RETURNING id
+                """,
+                [now, now, user_low_id, user_high_id],
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            # 이미 있는 채팅방 (먼저 INSERT 한 트랜잭션이 커밋될 때까지 기다린 뒤 조회됨)
+            return ChatRoom.objects.get(user_low_id=user_low_id, user_high_id=user_high_id), False
+
+        chatroom = ChatRoom(id=row[0], created_at=now, updated_at=now, user_low_id=user_low_id, user_high_id=user_high_id)
+        chatroom._state.adding = False
+        chatroom._state.db = connection.alias
+        ChatRoomUser.objects.bulk_create(
+            [ChatRoomUser(chatroom=chatroom, user_id=user_low_id), ChatRoomUser(chatroom=chatroom, user_id=user_high_id)]
+        )
+
+        return chatroom, True
+
+
+class MessageService:
+    @staticmethod
+    def append_many(room, messages):
+        """
+        채팅방에 메시지를 저장하고 latest_message 갱신까지 SQL 문 하나(INSERT ... RETURNING 을 쓰는 CTE)로 처리
+        이미 더 최근 메시지가 latest_message 인 채팅방은 그대로 두고, 저장한 메시지에는 pk 를 채워서 반환
+        """
+        messages = list(messages)
+        if not messages:
+            return messages
+
+        fields = [field for field in Message._meta.concrete_fields if not field.primary_key]
+        quote_name = connection.ops.quote_name
+        params = []
+        for message in messages:
+            message.room = room
+            params += [field.get_db_prep_save(field.pre_save(message, True), connection) for field in fields]
+
+        row = f"({', '.join(['%s'] * len(fields))})"
+        sql = f"""
+            WITH inserted AS (
+                INSERT INTO {quote_name(Message._meta.db_table)} ({", ".join(quote_name(field.column) for field in fields)})
+                VALUES {", ".join([row] * len(messages))}
+                RETURNING id, created_at
+            ), latest AS (
+                SELECT id, created_at FROM inserted ORDER BY created_at DESC, id DESC LIMIT 1
+            ), updated AS (
+                UPDATE {quote_name(ChatRoom._meta.db_table)} AS room
+                SET latest_message_id = latest.id, latest_message_time = latest.created_at
+                FROM latest
+                WHERE room.id = %s AND (room.latest_message_time IS NULL OR room.latest_message_time <= latest.created_at)
+            )
+            SELECT id FROM inserted
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [room.id])
+            ids = [message_id for (message_id,) in cursor.fetchall()]
+
+        for message, message_id in zip(messages, ids):
+            message.pk = message_id
+            message._state.adding = False
+            message._state.db = connection.alias
+
+        latest_message = max(messages, key=lambda message: (message.created_at, message.pk))
+        if room.latest_message_time is None or room.latest_message_time <= latest_message.created_at:
+            room.latest_message = latest_message
+            room.latest_message_time = latest_message.created_at
+
+        return messages
+
+
+class ChatRoomListCacheService:
+    """
+    사용자별 채팅방 목록 인덱스 (user_chat_rooms:{user_id} zset, 채팅방 id -> 마지막 메시지 시각)
+    메시지를 버퍼에 넣는 Lua 스크립트에서 같이 갱신하고, 키가 없으면 조회할 때 DB 에서 다시 만듦
+    """
+
+    @staticmethod
+    def get_key(user_id):
+        return f"user_chat_rooms:{user_id}"
+
+    @staticmethod
+    def get_score(latest_message_time, room_id):
+        # 메시지가 없는 채팅방은 모든 시각보다 작고 room_id 가 클수록 커지는 음수로 두어
+        # 메시지가 있는 채팅방 뒤에 DB 와 같은 id 역순으로 오게 함
+        if latest_message_time is None:
+            return float(CHAT_ROOM_LIST_NO_MESSAGE_SCORE + int(room_id))
+        return latest_message_time.timestamp()
+
+    @staticmethod
+    def touch_room(room_id, latest_message_time, user_ids):
+        script = chat_redis_client.register_script(TOUCH_CHAT_ROOM_LIST_SCRIPT)
+        script(
+            keys=[ChatRoomListCacheService.get_key(user_id) for user_id in user_ids],
+            args=[ChatRoomListCacheService.get_score(latest_message_time, room_id), room_id],
+        )
+
+    @staticmethod
+    def invalidate(user_id):
+        chat_redis_client.delete(ChatRoomListCacheService.get_key(user_id))
+
+    @staticmethod
+    def rebuild(user_id):
+        """
+        DB 의 채팅방 목록과 아직 flush 되지 않은 버퍼의 마지막 메시지 시각으로 인덱스를 다시 만듦
+        """
+        scores = {
+            room_id: ChatRoomListCacheService.get_score(latest_message_time, room_id)
+            for room_id, latest_message_time in ChatRoomUser.objects.filter(user_id=user_id).values_list(
+                "chatroom_id", "chatroom__latest_message_time"
+            )
+        }
+        for room_id, (_, score) in MessageBufferService.get_latest_buffered_messages(scores).items():
+            scores[room_id] = max(scores[room_id], score)
+
+        key = ChatRoomListCacheService.get_key(user_id)
+        pipeline = chat_redis_client.pipeline(transaction=True)
+        pipeline.delete(key)
+        pipeline.zadd(key, {CHAT_ROOM_LIST_EMPTY_MEMBER: float("-inf"), **scores})
+        pipeline.expire(key, settings.CHAT_ROOM_LIST_CACHE_TTL)
+        pipeline.execute()
+
+        return len(scores)
+
+    @staticmethod
+    def get_page(user_id, position, count):
+        """
+        position(score, 채팅방 id) 다음부터 최신순으로 count 개의 [(채팅방 id, score)] 반환, 캐시가 없으면 다시 만든 뒤 조회
+        """
+        key = ChatRoomListCacheService.get_key(user_id)
+
+        for _ in range(2):
+            pipeline = chat_redis_client.pipeline(transaction=False)
+            pipeline.expire(key, settings.CHAT_ROOM_LIST_CACHE_TTL)
+            if position is None:
+                pipeline.zrevrangebyscore(key, "+inf", "(-inf", start=0, num=count, withscores=True)
+            else:
+                # score 가 같은 채팅방은 member 역순으로 정렬되므로 cursor 의 member 보다 작은 것부터 이어서 반환
+                score, room_id = position
+                pipeline.zrangebyscore(key, score, score, withscores=True)
+                pipeline.zrevrangebyscore(key, f"({score!r}", "(-inf", start=0, num=count, withscores=True)
+            exists, *results = pipeline.execute()
+
+            if exists:
+                break
+            ChatRoomListCacheService.rebuild(user_id)
+
+        if position is None:
+            entries = results[0]
+        else:
+            cursor_member = str(position[1]).encode()
+            ties = sorted((entry for entry in results[0] if entry[0] < cursor_member), reverse=True)
+            entries = ties + results[1]
+
+        return [(int(member), score) for member, score in entries[:count]]
+
+
+class MessageFlushService:
+    """
+    Redis 버퍼의 메시지를 DB 에 동기화하는 flush worker(run_chat_flush_worker)에서 사용
+    채팅방은 room_id % settings.CHAT_FLUSH_SHARDS 로 샤드에 나뉘고, 샤드마다 lease 를 가진 worker 하나만 flush 함
+    """
+
+    @staticmethod
+    def get_shard(room_id, shards=None):
+        return int(room_id) % (shards or settings.CHAT_FLUSH_SHARDS)
+
+    @staticmethod
+    def get_metrics_key(shard):
+        return f"chat_flush_metrics:{shard}"
+
+    @staticmethod
+    def get_dirty_rooms_key(shard):
+        return DIRTY_CHAT_ROOMS_KEY.format(shard=shard)
+
+    @staticmethod
+    def get_room_dirty_rooms_key(room_id, shards=None):
+        return MessageFlushService.get_dirty_rooms_key(MessageFlushService.get_shard(room_id, shards))
+
+    @staticmethod
+    def get_dirty_room_ids(shard=0):
+        # 자기 샤드 key 만 읽고, 오래 기다린 채팅방부터 flush 하도록 처음 버퍼에 쌓인 시각 순으로 반환
+        room_ids = chat_redis_client.zrangebyscore(MessageFlushService.get_dirty_rooms_key(shard), "-inf", "+inf")
+        return [int(room_id) for room_id in room_ids]
+
+    @staticmethod
+    def register_dirty_rooms_by_scan():
+        """
+        dirty 목록이 없던 때 쌓인 버퍼나 목록이 유실된 경우, CHAT_FLUSH_SHARDS 를 바꾼 경우를 위해
+        SCAN 으로 버퍼 key 를 찾아 지금 샤드의 dirty 목록에 다시 등록, KEYS 와 달리 Redis 를 막지 않음
+        """
+        pipeline = chat_redis_client.pipeline(transaction=False)
+        registered = 0
+
+        for key in chat_redis_client.scan_iter(match=MessageBufferService.get_messages_key("*"), count=1000):
+            room_id = key.decode().split("_")[2]
+            pipeline.zadd(MessageFlushService.get_room_dirty_rooms_key(room_id), {room_id: time.time()}, nx=True)
+            registered += 1
+
+        # 이전 목록의 채팅방은 버퍼가 남아 있으면 위에서 다시 등록됨
+        pipeline.delete(LEGACY_DIRTY_CHAT_ROOMS_KEY)
+        pipeline.execute()
+
+        return registered
+
+    @staticmethod
+    def read_buffers(room_ids, batch_size):
+        # 여러 채팅방의 last_sync_score(이전 버퍼용) 와 앞쪽 batch_size 개 메시지를 파이프라인 한 번으로 읽음
+        pipeline = chat_redis_client.pipeline(transaction=False)
+        for room_id in room_ids:
+            pipeline.get(MessageBufferService.get_last_sync_score_key(room_id))
+            pipeline.zrange(MessageBufferService.get_messages_key(room_id), 0, batch_size - 1, withscores=True)
+        results = pipeline.execute()
+
+        return {room_id: (float(results[i * 2] or 0), results[i * 2 + 1]) for i, room_id in enumerate(room_ids)}
+
+    @staticmethod
+    def update_latest_messages(latest_messages):
+        """
+        {room_id: 마지막으로 저장한 Message} 로 채팅방의 latest_message 를 UPDATE ... FROM (VALUES ...) 한 번에 갱신
+        ignore_conflicts 로 저장하면 pk 가 채워지지 않으므로 (sender, client_message_id) 로 저장된 메시지와 join 함
+        이미 더 최근 메시지가 latest_message 인 채팅방은 건너뜀, 갱신한 채팅방 수 반환
+        """
+        if not latest_messages:
+            return 0
+
+        quote_name = connection.ops.quote_name
+        params = []
+        for room_id, message in latest_messages.items():
+            params += [room_id, message.sender_id, message.client_message_id]
+
+        sql = f"""
+            UPDATE {quote_name(ChatRoom._meta.db_table)} AS room
+            SET latest_message_id = message.id, latest_message_time = message.created_at
+            FROM (VALUES {", ".join(["(%s, %s, %s)"] * len(latest_messages))}) AS latest (room_id, sender_id, client_message_id)
+            JOIN {quote_name(Message._meta.db_table)} AS message
+                ON message.sender_id = latest.sender_id AND message.client_message_id = latest.client_message_id
+            WHERE room.id = latest.room_id AND (room.latest_message_time IS NULL OR room.latest_message_time <= message.created_at)
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    @staticmethod
+    def flush_rooms(room_ids, now=None, batch_size=None):
+        """
+        여러 채팅방의 버퍼를 방마다 batch_size 씩 읽어서 한 트랜잭션으로 bulk_create 하고 latest_message 를 갱신
+        메시지마다 client_message_id 가 있어서 중간에 죽고 다시 flush 해도 중복 저장되지 않고,
+        DB 에 저장한 member 만 정확히 지우므로 flush 도중에 들어온 메시지도 남음
+        ({room_id: 처리한 메시지 수}, 가장 오래 기다린 메시지의 대기 시간(초)) 반환
+        """
+        batch_size = batch_size or settings.CHAT_FLUSH_BATCH_SIZE
+        now = now or time.time()
+        room_ids = [int(room_id) for room_id in room_ids]
+        flushed = dict.fromkeys(room_ids, 0)
+        max_lag = 0.0
+        pending_room_ids = room_ids
+
+        while pending_room_ids:
+            buffers = MessageFlushService.read_buffers(pending_room_ids, batch_size)
+            buffered_room_ids = [room_id for room_id, (_, buffered) in buffers.items() if buffered]
+            existing_room_ids = set(ChatRoom.objects.filter(id__in=buffered_room_ids).values_list("id", flat=True))
+
+            messages_to_create = []
+            latest_messages = {}
+            pipeline = chat_redis_client.pipeline(transaction=False)
+
+            for room_id in buffered_room_ids:
+                legacy_sync_score, buffered = buffers[room_id]
+                messages_key = MessageBufferService.get_messages_key(room_id)
+
+                if room_id not in existing_room_ids:
+                    # 삭제된 채팅방의 버퍼는 저장할 곳이 없으므로 버림
+                    logger.warning(f"Chat room {room_id} does not exist. Dropping buffered messages.")
+                    pipeline.delete(messages_key, MessageBufferService.get_last_sync_score_key(room_id))
+                    continue
+
+                if flushed[room_id] == 0:
+                    max_lag = max(max_lag, now - buffered[0][1])
+
+                for member, score in buffered:
+                    message_data = json.loads(member)
+                    client_message_id = message_data.get("client_message_id")
+
+                    if client_message_id is None:
+                        # client_message_id 가 없는 이전 버퍼는 last_sync_score 이하가 이미 저장된 메시지
+                        if score <= legacy_sync_score:
+                            continue
+                        client_message_id = MessageBufferService.get_legacy_message_id(member)
+
+                    message = Message(
+                        room_id=room_id,
+                        sender_id=message_data["sender_id"],
+                        message=message_data["message"],
+                        created_at=timezone.datetime.fromtimestamp(score, tz=pytz.UTC),
+                        client_message_id=client_message_id,
+                        seq=message_data.get("seq"),
+                    )
+                    messages_to_create.append(message)
+                    latest_messages[room_id] = message
+                    flushed[room_id] += 1
+
+                # DB 에 반영한 member 만 삭제
+                pipeline.zrem(messages_key, *[member for member, _ in buffered])
+
+            if messages_to_create:
+                with transaction.atomic():
+                    # 이미 저장된 메시지(이전 flush 가 지우기 전에 죽은 경우)는 unique 제약으로 건너뜀
+                    Message.objects.bulk_create(messages_to_create, ignore_conflicts=True, batch_size=batch_size)
+                    MessageFlushService.update_latest_messages(latest_messages)
+
+            pipeline.execute()
+
+            pending_room_ids = [
+                room_id for room_id in buffered_room_ids if room_id in existing_room_ids and len(buffers[room_id][1]) == batch_size
+            ]
+
+        return flushed, max(max_lag, 0.0)
+
+    @staticmethod
+    def flush_room(room_id, now=None, batch_size=None):
+        flushed, lag = MessageFlushService.flush_rooms([room_id], now=now, batch_size=batch_size)
+        return flushed[int(room_id)], lag
+
+    @staticmethod
+    def clean_dirty_rooms(room_ids, shard=None):
+        # shard 를 넘기면 그 샤드 key 에서, 아니면 채팅방이 지금 속한 샤드 key 에서 제거
+        script = chat_redis_client.register_script(CLEAN_DIRTY_ROOM_SCRIPT)
+        pipeline = chat_redis_client.pipeline(transaction=False)
+        for room_id in room_ids:
+            script(
+                keys=[
+                    (
+                        MessageFlushService.get_dirty_rooms_key(shard)
+                        if shard is not None
+                        else MessageFlushService.get_room_dirty_rooms_key(room_id)
+                    ),
+                    MessageBufferService.get_messages_key(room_id),
+                    MessageBufferService.get_last_sync_score_key(room_id),
+                ],
+                args=[room_id],
+                client=pipeline,
+            )
+        return pipeline.execute()
+
+    @staticmethod
+    def flush_shard(shard, lease=None):
+        """
+        샤드에 속한 dirty 채팅방을 CHAT_FLUSH_ROOM_BATCH_SIZE 개씩 묶어서 flush 하고 lag 지표를 Redis 에 기록
+        걸리는 시간은 전체 key 수가 아니라 dirty 채팅방 수에 비례
+        lease 를 넘기면 묶음마다 연장하고, 잃으면 그 자리에서 멈춤
+        """
+        started_at = time.time()
+        room_ids = MessageFlushService.get_dirty_room_ids(shard)
+        room_batch_size = settings.CHAT_FLUSH_ROOM_BATCH_SIZE
+        flushed_rooms = flushed_messages = 0
+        max_lag = 0.0
+
+        for i in range(0, len(room_ids), room_batch_size):
+            if lease is not None and not lease.renew():
+                logger.warning(f"Lost chat flush lease for shard {shard}. Stopping flush.")
+                break
+
+            chunk = room_ids[i : i + room_batch_size]
+            try:
+                flushed, lag = MessageFlushService.flush_rooms(chunk, now=started_at)
+                MessageFlushService.clean_dirty_rooms(chunk, shard=shard)
+            except Exception as e:
+                logger.error(f"Error flushing chat rooms {chunk[0]}..{chunk[-1]}: {str(e)}", exc_info=True)
+                continue
+
+            flushed_rooms += sum(1 for count in flushed.values() if count)
+            flushed_messages += sum(flushed.values())
+            max_lag = max(max_lag, lag)
+
+        # 바뀐 안 읽은 메시지 수를 DB 에 반영
+        ChatService.flush_unread_counts()
+
+        duration = time.time() - started_at
+        metrics = {
+            "shard": shard,
+            "shards": settings.CHAT_FLUSH_SHARDS,
+            "leader": lease.token if lease is not None else "",
+            "last_flush_at": started_at,
+            "duration_ms": round(duration * 1000, 2),
+            "dirty_rooms": len(room_ids),
+            "flushed_rooms": flushed_rooms,
+            "flushed_messages": flushed_messages,
+            "rows_per_sec": round(flushed_messages / duration) if duration > 0 else 0,
+            "lag_seconds": round(max_lag, 3),
+        }
+        chat_redis_client.hset(MessageFlushService.get_metrics_key(shard), mapping=metrics)
+
+        return metrics
+
+    @staticmethod
+    def get_metrics(shard):
+        metrics = chat_redis_client.hgetall(MessageFlushService.get_metrics_key(shard))
+        return {key.decode(): value.decode() for key, value in metrics.items()}
+
+
+class ChatFlushLease:
+    """
+    샤드마다 flush worker 하나만 돌도록 잡는 Redis lease (SET NX PX)
+    ttl 안에 renew 하지 못하면 다른 worker 가 가져감
+    """
+
+    def __init__(self, shard, ttl):
+        self.key = f"chat_flush_lease:{shard}"
+        self.ttl_ms = int(ttl * 1000)
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self):
+        if chat_redis_client.set(self.key, self.token, nx=True, px=self.ttl_ms):
+            return True
+        return self.renew()
+
+    def renew(self):
+        return bool(chat_redis_client.eval(RENEW_LEASE_SCRIPT, 1, self.key, self.token, self.ttl_ms))
+
+    def release(self):
+        return bool(chat_redis_client.eval(RELEASE_LEASE_SCRIPT, 1, self.key, self.token))
@@ -0,0 +1,224 @@
+from asgiref.sync import async_to_sync
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.routing import websocket_urlpatterns
+from chats.services import (
+    ACTIVE_CHAT_ROOMS_KEY,
+    DIRTY_UNREAD_COUNTS_KEY,
+    ChatRoomListCacheService,
+    ChatService,
+    MessageBufferService,
+    MessageFlushService,
+    chat_redis_client,
+)
+from users.middleware import JWTAuthMiddleware
+from users.models import User
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatConsumerSequenceTest(TransactionTestCase):
+    # consumer 가 메시지를 처리할 때마다 오래된 DB 연결을 닫으므로 TestCase 의 트랜잭션을 쓸 수 없음
+    serialized_rollback = True
+
+    def setUp(self):
+        channel_layers.backends.clear()
+        self.main_user = User.objects.create_user(nickname="하하", social_provider="google", email="haha@haha.com")
+        self.other_user = User.objects.create_user(nickname="이이", social_provider="google", email="ee@ee.com")
+        self.chatroom = ChatRoom.objects.create()
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.main_user)
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.other_user)
+        self.tokens = {user.id: str(AccessToken.for_user(user)) for user in (self.main_user, self.other_user)}
+        self.clear_redis()
+
+    def tearDown(self):
+        channel_layers.backends.clear()
+        self.clear_redis()
+
+    def clear_redis(self):
+        for user in (self.main_user, self.other_user):
+            chat_redis_client.delete(ChatService.get_unread_counts_key(user.id), ChatRoomListCacheService.get_key(user.id))
+            chat_redis_client.srem(DIRTY_UNREAD_COUNTS_KEY, ChatService.get_dirty_unread_count_member(self.chatroom.id, user.id))
+        chat_redis_client.delete(
+            MessageBufferService.get_messages_key(self.chatroom.id),
+            MessageBufferService.get_last_sync_score_key(self.chatroom.id),
+            MessageBufferService.get_seq_key(self.chatroom.id),
+            f"chat_room_{self.chatroom.id}_users",
+        )
+        chat_redis_client.zrem(MessageFlushService.get_room_dirty_rooms_key(self.chatroom.id), self.chatroom.id)
+        chat_redis_client.srem(ACTIVE_CHAT_ROOMS_KEY, self.chatroom.id)
+
+    async def connect(self, user, query="", path=None):
+        path = path or f"/ws/chat/{self.chatroom.id}/"
+        communicator = WebsocketCommunicator(
+            JWTAuthMiddleware(URLRouter(websocket_urlpatterns)), f"{path}?token={self.tokens[user.id]}{query}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def send_messages(self, communicator, texts):
+        acks = []
+        for text in texts:
+            await communicator.send_json_to({"message": text, "sender_nickname": "하하"})
+            acks.append(await communicator.receive_json_from())
+            await communicator.receive_json_from()
+        return acks
+
+    def test_ack_with_increasing_seq(self):
+        async def run():
+            sender = await self.connect(self.main_user)
+
+            await sender.send_json_to({"message": "하이", "sender_nickname": "하하", "client_message_id": "c1"})
+            ack = await sender.receive_json_from()
+            echo = await sender.receive_json_from()
+            acks = await self.send_messages(sender, ["둘", "셋"])
+
+            self.assertEqual(ack, {"type": "ack", "seq": 1, "client_message_id": "c1"})
+            self.assertEqual((echo["message"], echo["seq"]), ("하이", 1))
+            self.assertEqual([ack["seq"] for ack in acks], [2, 3])
+            await sender.disconnect()
+
+        async_to_sync(run)()
+
+    def test_seq_continues_from_db(self):
+        Message.objects.create(room=self.chatroom, sender=self.other_user, message="예전 메시지", seq=7)
+
+        async def run():
+            sender = await self.connect(self.main_user)
+            acks = await self.send_messages(sender, ["하이"])
+            await sender.disconnect()
+            return acks
+
+        # Redis 에 순번이 없으면 DB 의 마지막 순번 다음부터 붙임
+        self.assertEqual(async_to_sync(run)()[0]["seq"], 8)
+
+    def test_resume_replays_missing_messages_from_db_and_buffer(self):
+        async def send(texts):
+            sender = await self.connect(self.other_user)
+            await self.send_messages(sender, texts)
+            await sender.disconnect()
+
+        async_to_sync(send)(["하나", "둘", "셋"])
+        MessageFlushService.flush_room(self.chatroom.id)
+        async_to_sync(send)(["넷"])
+
+        async def run():
+            receiver = await self.connect(self.main_user, "&resume_from=1")
+            frames = [await receiver.receive_json_from() for _ in range(4)]
+            self.assertTrue(await receiver.receive_nothing(0.1))
+            await receiver.disconnect()
+            return frames
+
+        *messages, resumed = async_to_sync(run)()
+
+        # DB 에 저장된 2, 3 과 아직 버퍼에 있는 4 만 순번 순으로 보냄
+        self.assertEqual([(message["message"], message["seq"]) for message in messages], [("둘", 2), ("셋", 3), ("넷", 4)])
+        self.assertEqual(messages[0]["sender_nickname"], "이이")
+        self.assertEqual(resumed, {"type": "resumed", "seq": 4, "truncated": False})
+        self.assertEqual(list(Message.objects.filter(room=self.chatroom).order_by("seq").values_list("seq", flat=True)), [1, 2, 3])
+
+    @override_settings(CHAT_RESUME_MAX_MESSAGES=2)
+    def test_resume_is_truncated(self):
+        async def run():
+            sender = await self.connect(self.other_user)
+            await self.send_messages(sender, ["하나", "둘", "셋"])
+            await sender.disconnect()
+
+            receiver = await self.connect(self.main_user, "&resume_from=0")
+            frames = [await receiver.receive_json_from() for _ in range(3)]
+            await receiver.disconnect()
+            return frames
+
+        *messages, resumed = async_to_sync(run)()
+
+        self.assertEqual([message["seq"] for message in messages], [1, 2])
+        self.assertEqual(resumed, {"type": "resumed", "seq": 2, "truncated": True})
+
+    def test_batch_frame(self):
+        async def run():
+            receiver = await self.connect(self.other_user)
+            sender = await self.connect(self.main_user)
+            await sender.send_json_to(
+                {"messages": [{"message": "하나", "client_message_id": "c1"}, {"message": "둘"}], "sender_nickname": "하하"}
+            )
+
+            ack = await sender.receive_json_from()
+            received = await receiver.receive_json_from()
+            self.assertTrue(await receiver.receive_nothing(0.1))
+
+            for communicator in (sender, receiver):
+                await communicator.disconnect()
+            return ack, received
+
+        ack, received = async_to_sync(run)()
+
+        self.assertEqual(ack["type"], "ack")
+        self.assertEqual(
+            [(item["seq"], item["client_message_id"]) for item in ack["messages"]],
+            [(1, "c1"), (2, ack["messages"][1]["client_message_id"])],
+        )
+        # 다른 참여자에게는 한 프레임으로 보냄
+        self.assertEqual([(item["message"], item["seq"]) for item in received["messages"]], [("하나", 1), ("둘", 2)])
+        self.assertLess(received["messages"][0]["timestamp"], received["messages"][1]["timestamp"])
+
+        MessageFlushService.flush_room(self.chatroom.id)
+        self.assertEqual(
+            list(Message.objects.filter(room=self.chatroom).order_by("created_at").values_list("message", "seq")), [("하나", 1), ("둘", 2)]
+        )
+        # 받는 사람이 채팅방에 접속해 있으므로 안 읽은 수가 늘지 않음
+        self.assertEqual(ChatService.get_unread_count(self.chatroom.id, self.other_user.id), 0)
+
+    @override_settings(CHAT_MAX_BATCH_MESSAGES=2)
+    def test_batch_frame_validation(self):
+        async def run():
+            sender = await self.connect(self.main_user)
+            responses = []
+            for messages in ([], [{"message": "하나"}] * 3, [{"message": "하나"}, {"message": ""}]):
+                await sender.send_json_to({"messages": messages, "sender_nickname": "하하"})
+                responses.append(await sender.receive_json_from())
+            await sender.disconnect()
+            return responses
+
+        for response in async_to_sync(run)():
+            self.assertIn("error", response)
+        self.assertEqual(chat_redis_client.zcard(MessageBufferService.get_messages_key(self.chatroom.id)), 0)
+
+    def test_send_in_room_whose_other_user_left(self):
+        ChatRoomUser.objects.filter(chatroom=self.chatroom, user=self.other_user).delete()
+
+        async def run():
+            sender_list = await self.connect(self.main_user, path="/ws/chat/list/")
+            sender = await self.connect(self.main_user)
+            acks = await self.send_messages(sender, ["하이"])
+            update = await sender_list.receive_json_from()
+
+            for communicator in (sender, sender_list):
+                await communicator.disconnect()
+            return acks, update
+
+        acks, update = async_to_sync(run)()
+
+        # 수신자가 없어도 메시지는 저장하고 보내는 사람의 채팅방 목록만 갱신
+        self.assertEqual(acks[0]["type"], "ack")
+        self.assertEqual((update["id"], update["latest_message"]), (self.chatroom.id, "하이"))
+        self.assertFalse(chat_redis_client.exists(ChatService.get_unread_counts_key(""), ChatRoomListCacheService.get_key("")))
+        self.assertFalse(chat_redis_client.exists(ChatService.get_unread_counts_key(None), ChatRoomListCacheService.get_key(None)))
+
+        MessageFlushService.flush_room(self.chatroom.id)
+        self.assertEqual(list(Message.objects.filter(room=self.chatroom).values_list("message", "seq")), [("하이", 1)])
+
+    def test_invalid_resume_from(self):
+        async def run():
+            communicator = WebsocketCommunicator(
+                JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+                f"/ws/chat/{self.chatroom.id}/?token={self.tokens[self.main_user.id]}&resume_from=abc",
+            )
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+
+        async_to_sync(run)()
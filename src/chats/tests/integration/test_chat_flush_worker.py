@@ -0,0 +1,324 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from redis.client import Pipeline
+
+from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.services import (
+    ChatFlushLease,
+    MessageBufferService,
+    MessageFlushService,
+    chat_redis_client,
+)
+from chats.utils import generate_message_id
+from users.models import User
+
+
+class ChatFlushTestCase(TestCase):
+    def setUp(self):
+        self.main_user = User.objects.create_user(nickname="하하", social_provider="google", email="haha@haha.com")
+        self.other_user = User.objects.create_user(nickname="이이", social_provider="google", email="ee@ee.com")
+        self.chatrooms = [ChatRoom.objects.create() for _ in range(2)]
+        for chatroom in self.chatrooms:
+            ChatRoomUser.objects.create(chatroom=chatroom, user=self.main_user)
+            ChatRoomUser.objects.create(chatroom=chatroom, user=self.other_user)
+
+        self.leases = []
+
+    def tearDown(self):
+        for lease in self.leases:
+            lease.release()
+        for chatroom in self.chatrooms:
+            chat_redis_client.delete(
+                MessageBufferService.get_messages_key(chatroom.id),
+                MessageBufferService.get_last_sync_score_key(chatroom.id),
+                f"chat_room_{chatroom.id}_users",
+            )
+            # 샤드 수를 바꾼 테스트가 있으므로 두 샤드 key 에서 모두 제거
+            for shard in range(2):
+                chat_redis_client.zrem(MessageFlushService.get_dirty_rooms_key(shard), chatroom.id)
+        chat_redis_client.delete(MessageFlushService.get_metrics_key(0), MessageFlushService.get_metrics_key(1))
+
+    def buffer_messages(self, chatroom, texts, same_score=False, register=True):
+        now = timezone.now()
+        if register:
+            chat_redis_client.zadd(MessageFlushService.get_room_dirty_rooms_key(chatroom.id), {chatroom.id: now.timestamp()}, nx=True)
+        for i, text in enumerate(texts):
+            created_at = now if same_score else now + timezone.timedelta(seconds=i)
+            message_data = {
+                "room_id": chatroom.id,
+                "sender_id": self.main_user.id,
+                "message": text,
+                "created_at": created_at.isoformat(),
+                "client_message_id": generate_message_id(),
+            }
+            chat_redis_client.zadd(MessageBufferService.get_messages_key(chatroom.id), {json.dumps(message_data): created_at.timestamp()})
+
+    def create_lease(self, shard, ttl=30):
+        lease = ChatFlushLease(shard, ttl)
+        self.leases.append(lease)
+        return lease
+
+
+class ChatFlushWorkerTest(ChatFlushTestCase):
+    def test_flush_room(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하이", "반가워"])
+
+        count, lag = MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(count, 2)
+        self.assertGreaterEqual(lag, 0)
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 2)
+        chatroom.refresh_from_db()
+        self.assertEqual(chatroom.latest_message.message, "반가워")
+
+        # 이미 동기화된 메시지는 다시 저장하지 않음
+        self.assertEqual(MessageFlushService.flush_room(chatroom.id), (0, 0.0))
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 2)
+
+    def test_flush_rooms_updates_latest_messages_in_one_query(self):
+        self.chatrooms += [ChatRoom.objects.create() for _ in range(3)]
+        for chatroom in self.chatrooms:
+            self.buffer_messages(chatroom, ["하이", f"마지막 {chatroom.id}"])
+
+        # 채팅방 확인 1 + SAVEPOINT / RELEASE 2 + INSERT 1 + UPDATE ... FROM (VALUES ...) 1 (채팅방 수와 상관없음)
+        with self.assertNumQueries(5):
+            flushed, _ = MessageFlushService.flush_rooms([chatroom.id for chatroom in self.chatrooms])
+
+        self.assertEqual(set(flushed.values()), {2})
+        for chatroom in self.chatrooms:
+            chatroom.refresh_from_db()
+            self.assertEqual(chatroom.latest_message.message, f"마지막 {chatroom.id}")
+            self.assertEqual(chatroom.latest_message_time, chatroom.latest_message.created_at)
+
+    def test_update_latest_messages_keeps_newer_message(self):
+        chatroom = self.chatrooms[0]
+        newer = Message.objects.create(room=chatroom, sender=self.main_user, message="최신")
+        older = Message.objects.create(
+            room=chatroom,
+            sender=self.main_user,
+            message="예전",
+            created_at=newer.created_at - timezone.timedelta(minutes=1),
+            client_message_id=generate_message_id(),
+        )
+        chatroom.update_latest_message(newer)
+
+        self.assertEqual(MessageFlushService.update_latest_messages({chatroom.id: older}), 0)
+        chatroom.refresh_from_db()
+        self.assertEqual(chatroom.latest_message_id, newer.id)
+
+    def test_lease_is_exclusive(self):
+        first = self.create_lease(0)
+        second = self.create_lease(0)
+
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.acquire())  # 자신의 lease 는 연장
+
+        first.release()
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.renew())
+
+    @override_settings(CHAT_FLUSH_SHARDS=2)
+    def test_flush_shard_only_flushes_own_rooms(self):
+        for chatroom in self.chatrooms:
+            self.buffer_messages(chatroom, ["하이"])
+        own_room, other_room = sorted(self.chatrooms, key=lambda chatroom: MessageFlushService.get_shard(chatroom.id))
+        shard = MessageFlushService.get_shard(own_room.id)
+        self.assertNotEqual(shard, MessageFlushService.get_shard(other_room.id))
+
+        # 샤드마다 자기 dirty key 에 있는 채팅방만 읽음
+        self.assertIn(own_room.id, MessageFlushService.get_dirty_room_ids(shard))
+        self.assertNotIn(other_room.id, MessageFlushService.get_dirty_room_ids(shard))
+
+        lease = self.create_lease(shard)
+        self.assertTrue(lease.acquire())
+
+        metrics = MessageFlushService.flush_shard(shard, lease=lease)
+
+        self.assertEqual(metrics["flushed_messages"], 1)
+        self.assertTrue(Message.objects.filter(room=own_room).exists())
+        self.assertFalse(Message.objects.filter(room=other_room).exists())
+        self.assertEqual(MessageFlushService.get_metrics(shard)["flushed_messages"], "1")
+        self.assertIn("rows_per_sec", metrics)
+
+        # 다 저장한 채팅방은 dirty 목록에서 빠짐
+        self.assertIsNone(chat_redis_client.zscore(MessageFlushService.get_dirty_rooms_key(shard), own_room.id))
+        self.assertIsNotNone(chat_redis_client.zscore(MessageFlushService.get_room_dirty_rooms_key(other_room.id), other_room.id))
+
+    def test_room_stays_dirty_when_message_arrives_during_flush(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하이"])
+
+        MessageFlushService.flush_rooms([chatroom.id])
+        self.buffer_messages(chatroom, ["flush 중에 보낸 메시지"])
+        MessageFlushService.clean_dirty_rooms([chatroom.id])
+
+        self.assertIn(chatroom.id, MessageFlushService.get_dirty_room_ids())
+
+    def test_drain_does_not_use_keys(self):
+        self.buffer_messages(self.chatrooms[0], ["하이"])
+
+        with patch.object(chat_redis_client, "keys", side_effect=AssertionError("KEYS 를 쓰면 안 됨")):
+            call_command("run_chat_flush_worker", "--drain", stdout=StringIO())
+
+        self.assertTrue(Message.objects.filter(room=self.chatrooms[0]).exists())
+        self.assertNotIn(self.chatrooms[0].id, MessageFlushService.get_dirty_room_ids())
+
+    def test_drain_scan_fallback(self):
+        # dirty 목록에 등록되지 않은 버퍼는 SCAN 으로 찾아서 flush
+        self.buffer_messages(self.chatrooms[0], ["하이"], register=False)
+
+        call_command("run_chat_flush_worker", "--drain", stdout=StringIO())
+        self.assertFalse(Message.objects.filter(room=self.chatrooms[0]).exists())
+
+        # 다른 테스트 / 개발용 버퍼까지 flush 하지 않도록 SCAN 결과는 이 채팅방 key 로 한정
+        messages_key = MessageBufferService.get_messages_key(self.chatrooms[0].id)
+        with patch.object(chat_redis_client, "scan_iter", return_value=iter([messages_key.encode()])) as scan_iter:
+            call_command("run_chat_flush_worker", "--drain", "--scan", stdout=StringIO())
+
+        scan_iter.assert_called_once_with(match="chat_room_*_messages", count=1000)
+        self.assertTrue(Message.objects.filter(room=self.chatrooms[0]).exists())
+
+    def test_worker_skips_shard_held_by_other_worker(self):
+        self.buffer_messages(self.chatrooms[0], ["하이"])
+        self.assertTrue(self.create_lease(0).acquire())
+
+        call_command("run_chat_flush_worker", "--once", stdout=StringIO())
+
+        self.assertFalse(Message.objects.filter(room=self.chatrooms[0]).exists())
+
+    def test_drain_fails_when_other_worker_holds_lease(self):
+        self.buffer_messages(self.chatrooms[0], ["하이"])
+        self.assertTrue(self.create_lease(0).acquire())
+
+        with self.assertRaises(CommandError):
+            call_command("run_chat_flush_worker", "--drain", stdout=StringIO())
+
+        self.assertFalse(Message.objects.filter(room=self.chatrooms[0]).exists())
+
+
+class ChatFlushCrashTest(ChatFlushTestCase):
+    """
+    flush 도중 어느 지점에서 죽어도 다시 flush 하면 메시지가 빠지거나 중복되지 않는지 확인
+    """
+
+    @staticmethod
+    def crash_on_pipeline_execute(crash_at):
+        execute = Pipeline.execute
+        calls = []
+
+        def execute_then_crash(pipeline, *args, **kwargs):
+            calls.append(pipeline)
+            if len(calls) == crash_at:
+                raise RuntimeError("crash")
+            return execute(pipeline, *args, **kwargs)
+
+        return patch.object(Pipeline, "execute", autospec=True, side_effect=execute_then_crash)
+
+    def get_buffer_size(self, chatroom):
+        return chat_redis_client.zcard(MessageBufferService.get_messages_key(chatroom.id))
+
+    def test_crash_after_insert_before_buffer_removal(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하나", "둘", "셋"])
+
+        # 버퍼 읽기(1번째 파이프라인)는 통과, 저장한 메시지 삭제(2번째 파이프라인) 전에 죽음
+        with self.crash_on_pipeline_execute(2):
+            with self.assertRaises(RuntimeError):
+                MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 3)
+        self.assertEqual(self.get_buffer_size(chatroom), 3)
+
+        MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 3)
+        self.assertEqual(self.get_buffer_size(chatroom), 0)
+
+    def test_crash_inside_insert_transaction(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하나", "둘"])
+
+        with patch.object(MessageFlushService, "update_latest_messages", side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                MessageFlushService.flush_room(chatroom.id)
+
+        self.assertFalse(Message.objects.filter(room=chatroom).exists())
+        self.assertEqual(self.get_buffer_size(chatroom), 2)
+
+        MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(
+            list(Message.objects.filter(room=chatroom).order_by("created_at").values_list("message", flat=True)), ["하나", "둘"]
+        )
+
+    def test_crash_between_batches(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, [f"메시지 {i}" for i in range(5)])
+        # 첫 번째 배치는 지우고 두 번째 배치를 지우기 전에 죽음 (읽기, 삭제, 읽기, 삭제 순서)
+        with self.crash_on_pipeline_execute(4):
+            with self.assertRaises(RuntimeError):
+                MessageFlushService.flush_room(chatroom.id, batch_size=2)
+
+        MessageFlushService.flush_room(chatroom.id, batch_size=2)
+
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 5)
+        self.assertEqual(self.get_buffer_size(chatroom), 0)
+
+    def test_messages_with_same_score(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하나", "둘", "셋"], same_score=True)
+
+        count, _ = MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 3)
+
+    def test_message_buffered_during_flush_is_kept(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하나"])
+        bulk_create = Message.objects.bulk_create
+
+        def bulk_create_with_new_message(*args, **kwargs):
+            # DB 에 쓰는 도중 같은 score 로 새 메시지가 들어옴
+            self.buffer_messages(chatroom, ["flush 중에 보낸 메시지"], same_score=True)
+            return bulk_create(*args, **kwargs)
+
+        with patch.object(Message.objects, "bulk_create", side_effect=bulk_create_with_new_message):
+            MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 1)
+        self.assertEqual(self.get_buffer_size(chatroom), 1)
+
+        MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(Message.objects.filter(room=chatroom).count(), 2)
+
+    def test_created_at_is_kept_from_buffer(self):
+        chatroom = self.chatrooms[0]
+        self.buffer_messages(chatroom, ["하나"])
+        ((_, score),) = chat_redis_client.zrange(MessageBufferService.get_messages_key(chatroom.id), 0, -1, withscores=True)
+
+        MessageFlushService.flush_room(chatroom.id)
+
+        self.assertAlmostEqual(Message.objects.get(room=chatroom).created_at.timestamp(), score, places=3)
+
+    def test_legacy_messages_without_id(self):
+        chatroom = self.chatrooms[0]
+        messages_key = MessageBufferService.get_messages_key(chatroom.id)
+        created_at = timezone.now()
+        for i, text in enumerate(["이미 동기화된 메시지", "동기화 안 된 메시지"]):
+            message_data = {"room_id": chatroom.id, "sender_id": self.main_user.id, "message": text, "created_at": created_at.isoformat()}
+            chat_redis_client.zadd(messages_key, {json.dumps(message_data): created_at.timestamp() + i})
+        chat_redis_client.set(MessageBufferService.get_last_sync_score_key(chatroom.id), str(created_at.timestamp()))
+
+        MessageFlushService.flush_room(chatroom.id)
+        MessageFlushService.flush_room(chatroom.id)
+
+        self.assertEqual(list(Message.objects.filter(room=chatroom).values_list("message", flat=True)), ["동기화 안 된 메시지"])
@@ -0,0 +1,163 @@
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import channel_layers, get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chats.consumers import ChatListConsumer
+from chats.models import ChatRoom, ChatRoomUser
+from chats.routing import websocket_urlpatterns
+from chats.services import (
+    ACTIVE_CHAT_ROOMS_KEY,
+    DIRTY_UNREAD_COUNTS_KEY,
+    ChatRoomListCacheService,
+    ChatService,
+    MessageBufferService,
+    MessageFlushService,
+    chat_redis_client,
+)
+from users.middleware import JWTAuthMiddleware
+from users.models import User
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    CHAT_LIST_UPDATE_INTERVAL=0.05,
+    CHAT_LIST_MAX_PUSH_RATE=1000,
+)
+class ChatListConsumerTest(TransactionTestCase):
+    # consumer 가 메시지를 처리할 때마다 오래된 DB 연결을 닫으므로 TestCase 의 트랜잭션을 쓸 수 없음
+    serialized_rollback = True
+
+    def setUp(self):
+        channel_layers.backends.clear()
+        self.main_user = User.objects.create_user(nickname="하하", social_provider="google", email="haha@haha.com")
+        self.other_user = User.objects.create_user(nickname="이이", social_provider="google", email="ee@ee.com")
+        self.chatroom = ChatRoom.objects.create()
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.main_user)
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.other_user)
+        self.tokens = {user.id: str(AccessToken.for_user(user)) for user in (self.main_user, self.other_user)}
+        self.clear_redis()
+
+    def tearDown(self):
+        channel_layers.backends.clear()
+        self.clear_redis()
+
+    def clear_redis(self):
+        for user in (self.main_user, self.other_user):
+            chat_redis_client.delete(ChatService.get_unread_counts_key(user.id), ChatRoomListCacheService.get_key(user.id))
+            chat_redis_client.srem(DIRTY_UNREAD_COUNTS_KEY, ChatService.get_dirty_unread_count_member(self.chatroom.id, user.id))
+        chat_redis_client.delete(
+            MessageBufferService.get_messages_key(self.chatroom.id),
+            MessageBufferService.get_seq_key(self.chatroom.id),
+            f"chat_room_{self.chatroom.id}_users",
+        )
+        chat_redis_client.zrem(MessageFlushService.get_room_dirty_rooms_key(self.chatroom.id), self.chatroom.id)
+        chat_redis_client.srem(ACTIVE_CHAT_ROOMS_KEY, self.chatroom.id)
+
+    async def connect(self, user, path="/ws/chat/list/"):
+        communicator = WebsocketCommunicator(JWTAuthMiddleware(URLRouter(websocket_urlpatterns)), f"{path}?token={self.tokens[user.id]}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def send_update(self, room_id, message, unread_count):
+        await get_channel_layer().group_send(
+            f"chat_list_{self.main_user.id}",
+            {
+                "type": "chat_list_update",
+                "id": room_id,
+                "latest_message": message,
+                "sender_nickname": "이이",
+                "latest_message_time": "2024-01-01T00:00:00+00:00",
+                "updated_user_id": self.main_user.id,
+                "unread_count": unread_count,
+            },
+        )
+
+    def test_updates_of_same_room_are_coalesced(self):
+        async def run():
+            communicator = await self.connect(self.main_user)
+
+            with mock.patch.object(ChatListConsumer, "get_unread_count") as get_unread_count:
+                for i in range(1, 6):
+                    await self.send_update(self.chatroom.id, f"메시지 {i}", i)
+
+                response = await communicator.receive_json_from()
+                self.assertTrue(await communicator.receive_nothing(0.2))
+
+            # 마지막 상태 하나만 보내고, 이벤트에 안 읽은 수가 있으므로 다시 읽지 않음
+            self.assertEqual(response["latest_message"], "메시지 5")
+            self.assertEqual(response["unread_count"], 5)
+            get_unread_count.assert_not_called()
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+
+    def test_failed_update_does_not_stop_remaining_updates(self):
+        async def run():
+            communicator = await self.connect(self.main_user)
+
+            # 이벤트에 안 읽은 수가 없으면 다시 읽는데, 첫 채팅방에서 실패
+            with mock.patch.object(ChatListConsumer, "get_unread_count", side_effect=[Exception("DB 오류"), 3]):
+                with self.assertLogs("channels", level="ERROR"):
+                    await self.send_update(1, "하이", None)
+                    await self.send_update(2, "하이", None)
+                    response = await communicator.receive_json_from()
+
+            self.assertEqual((response["id"], response["unread_count"]), (2, 3))
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+
+    @override_settings(CHAT_LIST_MAX_PUSH_RATE=10)
+    def test_push_rate_is_limited(self):
+        async def run():
+            communicator = await self.connect(self.main_user)
+
+            started_at = time.perf_counter()
+            for room_id in range(1, 6):
+                await self.send_update(room_id, "하이", 1)
+
+            room_ids = [(await communicator.receive_json_from())["id"] for _ in range(5)]
+            elapsed = time.perf_counter() - started_at
+
+            # 채팅방마다 한 번씩, 오래된 변경부터 0.1초 간격으로 보냄
+            self.assertEqual(room_ids, [1, 2, 3, 4, 5])
+            self.assertGreaterEqual(elapsed, 0.4)
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+
+    @override_settings(CHAT_LIST_UPDATE_INTERVAL=0.3)
+    def test_message_carries_unread_counts(self):
+        ChatService.load_unread_counts(self.main_user.id)
+        ChatService.load_unread_counts(self.other_user.id)
+
+        async def run():
+            receiver_list = await self.connect(self.main_user)
+            sender_list = await self.connect(self.other_user)
+            sender = await self.connect(self.other_user, f"/ws/chat/{self.chatroom.id}/")
+
+            with mock.patch.object(ChatListConsumer, "get_unread_count") as get_unread_count:
+                for _ in range(2):
+                    await sender.send_json_to({"message": "하이", "sender_nickname": "이이"})
+                    # ack 와 그룹으로 받은 메시지
+                    await sender.receive_json_from()
+                    await sender.receive_json_from()
+
+                receiver_update = await receiver_list.receive_json_from()
+                sender_update = await sender_list.receive_json_from()
+
+            self.assertEqual((receiver_update["latest_message"], receiver_update["unread_count"]), ("하이", 2))
+            self.assertEqual((sender_update["latest_message"], sender_update["unread_count"]), ("하이", 0))
+            get_unread_count.assert_not_called()
+
+            for communicator in (sender, sender_list, receiver_list):
+                await communicator.disconnect()
+
+        async_to_sync(run)()
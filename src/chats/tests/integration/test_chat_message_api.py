@@ -1,10 +1,18 @@
+import json
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.services import MessageBufferService, chat_redis_client
 from users.models import User
 
 
@@ -45,3 +53,143 @@ class ChatMessageAPITest(APITestCase):
         response = self.client.get(self.list_messages_url)
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_messages_cursor_pagination(self):
+        Message.objects.bulk_create([Message(room=self.chatroom, sender=self.main_user, message=f"메시지 {i}") for i in range(25)])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.list_messages_url, {"cursor": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data.keys()), {"next", "results"})
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertEqual(set(response.data["results"][0].keys()), {"id", "sender_nickname", "message", "timestamp", "seq"})
+        self.assertFalse(any("COUNT" in query["sql"] for query in queries.captured_queries))
+
+        next_response = self.client.get(response.data["next"])
+
+        self.assertEqual(next_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(next_response.data["results"]), 5)
+        self.assertIsNone(next_response.data["next"])
+
+        ids = [message["id"] for message in response.data["results"] + next_response.data["results"]]
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_list_messages_cursor_room_not_found(self):
+        response = self.client.get(reverse("chat_messages", kwargs={"room_id": 99}), {"cursor": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_messages_invalid_cursor(self):
+        response = self.client.get(self.list_messages_url, {"cursor": "invalid"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChatMessageBufferMergeAPITest(APITestCase):
+    def setUp(self):
+        self.main_user = User.objects.create_user(nickname="서강준", social_provider="google", email="haha@haha.com")
+        self.other_user = User.objects.create_user(nickname="아이유", social_provider="google", email="ee@ee.com")
+        self.chatroom = ChatRoom.objects.create()
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.main_user)
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.other_user)
+        self.list_messages_url = reverse("chat_messages", kwargs={"room_id": self.chatroom.id})
+
+        self.messages_key = MessageBufferService.get_messages_key(self.chatroom.id)
+        self.last_sync_score_key = MessageBufferService.get_last_sync_score_key(self.chatroom.id)
+
+        self.token = str(TokenObtainPairSerializer.get_token(self.main_user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.token)
+
+    def tearDown(self):
+        chat_redis_client.delete(self.messages_key, self.last_sync_score_key)
+
+    def buffer_message(self, message, created_at):
+        message_data = {
+            "room_id": self.chatroom.id,
+            "sender_id": self.main_user.id,
+            "message": message,
+            "created_at": created_at.isoformat(),
+        }
+        chat_redis_client.zadd(self.messages_key, {json.dumps(message_data): created_at.timestamp()})
+
+    def test_first_page_includes_unsynced_messages(self):
+        Message.objects.create(room=self.chatroom, sender=self.other_user, message="저장된 메시지")
+        self.buffer_message("버퍼 메시지", timezone.now() + timedelta(seconds=1))
+
+        response = self.client.get(self.list_messages_url, {"cursor": ""})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([message["message"] for message in response.data["results"]], ["버퍼 메시지", "저장된 메시지"])
+        self.assertIsNone(response.data["results"][0]["id"])
+        self.assertEqual(response.data["results"][0]["sender_nickname"], self.main_user.nickname)
+
+    def test_room_with_only_unsynced_messages(self):
+        self.buffer_message("버퍼 메시지", timezone.now())
+
+        response = self.client.get(self.list_messages_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_synced_boundary_messages_are_not_duplicated(self):
+        created_at = timezone.now()
+        self.buffer_message("동기화 중인 메시지", created_at)
+
+        # 버퍼를 읽은 뒤 DB 에 저장된 것처럼 같은 메시지를 DB 에도 만들어 둠
+        message = Message.objects.create(room=self.chatroom, sender=self.main_user, message="동기화 중인 메시지")
+        Message.objects.filter(id=message.id).update(created_at=timezone.datetime.fromtimestamp(created_at.timestamp()))
+
+        response = self.client.get(self.list_messages_url, {"cursor": ""})
+
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["id"], message.id)
+
+    def test_already_synced_messages_are_skipped(self):
+        created_at = timezone.now()
+        self.buffer_message("이미 동기화된 메시지", created_at)
+        chat_redis_client.set(self.last_sync_score_key, str(created_at.timestamp()))
+        Message.objects.create(room=self.chatroom, sender=self.main_user, message="다른 메시지")
+
+        response = self.client.get(self.list_messages_url, {"cursor": ""})
+
+        self.assertEqual([message["message"] for message in response.data["results"]], ["다른 메시지"])
+
+    def test_cursor_pages_are_trimmed_with_large_buffer(self):
+        now = timezone.now()
+        Message.objects.bulk_create(
+            [
+                Message(room=self.chatroom, sender=self.other_user, message=f"저장된 {i}", created_at=now - timedelta(minutes=10 - i))
+                for i in range(3)
+            ]
+        )
+        for i in range(7):
+            self.buffer_message(f"버퍼 {i}", now + timedelta(seconds=i))
+
+        pages = []
+        params = {"cursor": "", "page_size": 4}
+        while True:
+            response = self.client.get(self.list_messages_url, params)
+            pages.append([message["message"] for message in response.data["results"]])
+            if response.data["next"] is None:
+                break
+            params = {"cursor": parse_qs(urlsplit(response.data["next"]).query)["cursor"][0], "page_size": 4}
+
+        # 버퍼가 page_size 보다 커도 페이지마다 page_size 개만 보내고, 버퍼와 DB 메시지가 빠짐없이 이어짐
+        self.assertEqual(
+            pages,
+            [
+                ["버퍼 6", "버퍼 5", "버퍼 4", "버퍼 3"],
+                ["버퍼 2", "버퍼 1", "버퍼 0", "저장된 2"],
+                ["저장된 1", "저장된 0"],
+            ],
+        )
+
+    def test_page_number_mode_reads_only_newest_buffered_messages(self):
+        Message.objects.create(room=self.chatroom, sender=self.other_user, message="저장된 메시지")
+        for i in range(5):
+            self.buffer_message(f"버퍼 {i}", timezone.now() + timedelta(seconds=i + 1))
+
+        response = self.client.get(self.list_messages_url, {"page_size": 2})
+
+        self.assertEqual([message["message"] for message in response.data["results"]], ["버퍼 4", "버퍼 3", "저장된 메시지"])
@@ -1,10 +1,24 @@
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import redis
+from asgiref.sync import async_to_sync
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from chats.models import ChatRoom, ChatRoomUser
+from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.services import (
+    ChatRoomListCacheService,
+    ChatService,
+    MessageBufferService,
+    MessageFlushService,
+    MessageService,
+    chat_redis_client,
+)
+from chats.utils import generate_message_id
 from users.models import User
 
 
@@ -35,7 +49,8 @@ class ChatRoomAPITest(APITestCase):
         self.assertEqual(ChatRoom.objects.count(), 1)
 
     def test_create_chat_room_existing(self):
-        self.chatroom = ChatRoom.objects.create()
+        user_low, user_high = sorted([self.main_user, self.other_user], key=lambda user: user.id)
+        self.chatroom = ChatRoom.objects.create(user_low=user_low, user_high=user_high)
         ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.main_user)
         ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.other_user)
 
@@ -43,6 +58,34 @@ class ChatRoomAPITest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(ChatRoom.objects.count(), 1)
+        self.assertEqual(response.data["id"], self.chatroom.id)
+
+    def test_create_chat_room_twice(self):
+        first = self.client.post(self.chat_room_create_url, {"other_user_nickname": self.other_user.nickname})
+        second = self.client.post(self.chat_room_create_url, {"other_user_nickname": self.other_user.nickname})
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["id"], second.data["id"])
+        self.assertEqual(ChatRoomUser.objects.filter(chatroom_id=first.data["id"]).count(), 2)
+        self.assertEqual(Message.objects.filter(room_id=first.data["id"]).count(), 2)
+        self.assertEqual(second.data["latest_message"], f"안녕하세요 {self.other_user.nickname}입니다")
+
+    def test_create_chat_room_queries(self):
+        # 인증 사용자 1 + 상대 조회 1 + SAVEPOINT / RELEASE 2 + 채팅방 INSERT ... ON CONFLICT 1 + 참여자 1 + 인사 메시지 1
+        with self.assertNumQueries(7):
+            response = self.client.post(self.chat_room_create_url, {"other_user_nickname": self.other_user.nickname})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        chatroom = ChatRoom.objects.get(id=response.data["id"])
+        self.assertEqual((chatroom.user_low_id, chatroom.user_high_id), tuple(sorted([self.main_user.id, self.other_user.id])))
+        self.assertEqual(chatroom.latest_message.message, f"반갑습니다 {self.other_user.nickname}입니다")
+
+    def test_create_chat_room_with_self(self):
+        response = self.client.post(self.chat_room_create_url, {"other_user_nickname": self.main_user.nickname})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ChatRoom.objects.count(), 0)
 
     def test_create_chat_room_missing_nickname(self):
         """
@@ -64,3 +107,197 @@ class ChatRoomAPITest(APITestCase):
         response = self.client.get(self.list_chat_rooms_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+
+
+class ChatRoomListQueryTest(APITestCase):
+    def setUp(self):
+        self.main_user = User.objects.create_user(nickname="서강준", social_provider="google", email="haha@haha.com")
+        self.list_chat_rooms_url = reverse("chat_rooms")
+        self.chatrooms = []
+
+        for i in range(5):
+            other_user = User.objects.create_user(nickname=f"상대{i}", social_provider="google", email=f"other{i}@example.com")
+            chatroom = ChatRoom.objects.create()
+            ChatRoomUser.objects.create(chatroom=chatroom, user=self.main_user, unread_count=i)
+            ChatRoomUser.objects.create(chatroom=chatroom, user=other_user)
+            MessageService.append_many(chatroom, [Message(sender=other_user, message=f"메시지 {i}")])
+            self.chatrooms.append(chatroom)
+
+        # 메시지가 없는 채팅방은 목록 마지막
+        self.empty_chatroom = ChatRoom.objects.create()
+        ChatRoomUser.objects.create(chatroom=self.empty_chatroom, user=self.main_user)
+        ChatRoomUser.objects.create(chatroom=self.empty_chatroom, user=other_user)
+
+        # 다른 사용자끼리의 채팅방은 보이지 않음
+        other_chatroom = ChatRoom.objects.create()
+        ChatRoomUser.objects.create(chatroom=other_chatroom, user=other_user)
+
+        # 테스트 DB 를 다시 만들면 사용자 id 가 재사용되므로 이전 실행의 인덱스 / 안 읽은 수를 지우고 다시 읽어 둠
+        ChatRoomListCacheService.invalidate(self.main_user.id)
+        chat_redis_client.delete(ChatService.get_unread_counts_key(self.main_user.id))
+        ChatService.load_unread_counts(self.main_user.id)
+
+        token = str(TokenObtainPairSerializer.get_token(self.main_user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + token)
+
+    def tearDown(self):
+        ChatRoomListCacheService.invalidate(self.main_user.id)
+        chat_redis_client.delete(ChatService.get_unread_counts_key(self.main_user.id))
+        for chatroom in self.chatrooms:
+            chat_redis_client.delete(MessageBufferService.get_messages_key(chatroom.id))
+            chat_redis_client.zrem(MessageFlushService.get_room_dirty_rooms_key(chatroom.id), chatroom.id)
+
+    def get_all_pages(self, page_size=2):
+        room_ids = []
+        params = {"cursor": "", "page_size": page_size}
+
+        while True:
+            response = self.client.get(self.list_chat_rooms_url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            room_ids += [room["id"] for room in response.data["results"]]
+
+            if response.data["next"] is None:
+                return room_ids
+            params = {"cursor": parse_qs(urlparse(response.data["next"]).query)["cursor"][0], "page_size": page_size}
+
+    def test_list_is_single_query(self):
+        # 인증 사용자 조회 1 + 채팅방 목록 1
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_chat_rooms_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([room["id"] for room in response.data], [room.id for room in reversed(self.chatrooms)] + [self.empty_chatroom.id])
+
+        latest = response.data[0]
+        self.assertEqual(latest["other_user_nickname"], "상대4")
+        self.assertEqual(latest["latest_message"], "메시지 4")
+        self.assertEqual(latest["unread_count"], 4)
+        self.assertIsNone(response.data[-1]["latest_message"])
+
+    def test_room_whose_other_user_left_stays_in_list(self):
+        # 상대방이 나간 채팅방과 상대방이 탈퇴한 채팅방
+        ChatRoomUser.objects.filter(chatroom=self.chatrooms[2]).exclude(user=self.main_user).delete()
+        ChatRoomUser.objects.filter(chatroom=self.chatrooms[1]).exclude(user=self.main_user).get().user.delete()
+        room_ids = [room.id for room in reversed(self.chatrooms)] + [self.empty_chatroom.id]
+
+        response = self.client.get(self.list_chat_rooms_url)
+
+        self.assertEqual([room["id"] for room in response.data], room_ids)
+        left_room = response.data[2]
+        self.assertEqual((left_room["other_user_id"], left_room["other_user_nickname"]), (None, None))
+        self.assertEqual((left_room["latest_message"], left_room["unread_count"]), ("메시지 2", 2))
+        self.assertIsNone(response.data[3]["other_user_id"])
+        self.assertEqual(self.get_all_pages(), room_ids)
+
+    def test_cursor_pagination(self):
+        room_ids = self.get_all_pages()
+
+        self.assertEqual(room_ids, [room.id for room in reversed(self.chatrooms)] + [self.empty_chatroom.id])
+
+    def test_cursor_pagination_from_room_index(self):
+        # 인증 사용자 조회 1 + 인덱스 생성 1 + 보이는 채팅방 1
+        with self.assertNumQueries(3):
+            self.client.get(self.list_chat_rooms_url, {"cursor": "", "page_size": 2})
+
+        self.assertTrue(chat_redis_client.exists(ChatRoomListCacheService.get_key(self.main_user.id)))
+
+        # 인덱스가 있으면 보이는 채팅방만 DB 에서 가져옴 (인증 사용자는 UserCacheService 에서 찾음)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_chat_rooms_url, {"cursor": "", "page_size": 2})
+
+        self.assertEqual([room["id"] for room in response.data["results"]], [self.chatrooms[4].id, self.chatrooms[3].id])
+        self.assertEqual(response.data["results"][0]["unread_count"], 4)
+
+    def test_room_index_follows_buffered_message(self):
+        self.get_all_pages()
+        chatroom = self.chatrooms[0]
+        other_user_id = ChatRoomUser.objects.filter(chatroom=chatroom).exclude(user=self.main_user).values_list("user_id", flat=True)[0]
+        message_data = {
+            "room_id": chatroom.id,
+            "sender_id": other_user_id,
+            "message": "아직 flush 안 된 메시지",
+            "created_at": "",
+            "client_message_id": generate_message_id(),
+        }
+        async_to_sync(ChatService.buffer_message)(
+            chatroom.id, message_data, chatroom.latest_message_time.timestamp() + 60, self.main_user.id
+        )
+
+        response = self.client.get(self.list_chat_rooms_url, {"cursor": "", "page_size": 2})
+
+        latest = response.data["results"][0]
+        self.assertEqual(latest["id"], chatroom.id)
+        self.assertEqual(latest["latest_message"], "아직 flush 안 된 메시지")
+        self.assertEqual(
+            self.get_all_pages(), [chatroom.id] + [room.id for room in reversed(self.chatrooms[1:])] + [self.empty_chatroom.id]
+        )
+
+    def test_room_index_rebuild_includes_buffered_message(self):
+        chatroom = self.chatrooms[1]
+        chat_redis_client.zadd(
+            MessageBufferService.get_messages_key(chatroom.id),
+            {'{"sender_id": %d, "message": "버퍼"}' % self.main_user.id: chatroom.latest_message_time.timestamp() + 60},
+        )
+
+        self.assertEqual(self.get_all_pages()[0], chatroom.id)
+
+    def test_new_chatroom_added_to_room_index(self):
+        self.get_all_pages()
+        User.objects.create_user(nickname="새상대", social_provider="google", email="new@example.com")
+
+        response = self.client.post(reverse("chat_room_create"), {"other_user_nickname": "새상대"})
+        self.chatrooms.append(ChatRoom.objects.get(id=response.data["id"]))
+
+        self.assertEqual(self.get_all_pages()[0], response.data["id"])
+
+    def test_unread_count_from_redis(self):
+        ChatService.increment_unread_count(self.chatrooms[4].id, self.main_user.id)
+
+        response = self.client.get(self.list_chat_rooms_url)
+
+        self.assertEqual(response.data[0]["unread_count"], 5)
+
+    def test_cursor_pagination_without_redis(self):
+        with patch.object(ChatRoomListCacheService, "get_page", side_effect=redis.ConnectionError):
+            room_ids = self.get_all_pages()
+
+        self.assertEqual(room_ids, [room.id for room in reversed(self.chatrooms)] + [self.empty_chatroom.id])
+
+    def test_no_message_rooms_page_the_same_on_both_paths(self):
+        # 메시지가 없는 채팅방을 더 만들어서 id 역순 꼬리를 길게 함
+        empty_chatrooms = [self.empty_chatroom]
+        other_user = User.objects.get(nickname="상대0")
+        for _ in range(3):
+            chatroom = ChatRoom.objects.create()
+            ChatRoomUser.objects.create(chatroom=chatroom, user=self.main_user)
+            ChatRoomUser.objects.create(chatroom=chatroom, user=other_user)
+            empty_chatrooms.append(chatroom)
+        ChatRoomListCacheService.invalidate(self.main_user.id)
+        empty_room_ids = sorted((chatroom.id for chatroom in empty_chatrooms), reverse=True)
+
+        def get_page(cursor, use_redis):
+            params = {"cursor": cursor, "page_size": 2}
+            if use_redis:
+                response = self.client.get(self.list_chat_rooms_url, params)
+            else:
+                with patch.object(ChatRoomListCacheService, "get_page", side_effect=redis.ConnectionError):
+                    response = self.client.get(self.list_chat_rooms_url, params)
+            next_cursor = parse_qs(urlparse(response.data["next"]).query)["cursor"][0] if response.data["next"] else None
+            return [room["id"] for room in response.data["results"]], next_cursor
+
+        # 메시지가 있는 채팅방을 지나서 꼬리 첫 채팅방에서 끊긴 cursor
+        cursor = ""
+        for _ in range(3):
+            room_ids, cursor = get_page(cursor, use_redis=True)
+        self.assertEqual(room_ids, [self.chatrooms[0].id, empty_room_ids[0]])
+
+        # 같은 cursor 로 Redis 인덱스와 DB 어느 쪽에서 이어가도 같은 채팅방이 나옴
+        for first, second in ((True, False), (False, True)):
+            room_ids, next_cursor = get_page(cursor, use_redis=first)
+            self.assertEqual(room_ids, empty_room_ids[1:3])
+            self.assertEqual(get_page(next_cursor, use_redis=second), ([empty_room_ids[3]], None))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.list_chat_rooms_url, {"cursor": "invalid"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
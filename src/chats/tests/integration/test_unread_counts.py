@@ -0,0 +1,150 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from django.utils import timezone
+
+from chats.models import ChatRoom, ChatRoomUser
+from chats.services import (
+    DIRTY_UNREAD_COUNTS_KEY,
+    PENDING_UNREAD_COUNTS_KEY,
+    ChatRoomListCacheService,
+    ChatService,
+    MessageBufferService,
+    MessageFlushService,
+    chat_redis_client,
+)
+from chats.utils import generate_message_id
+from users.models import User
+
+
+class UnreadCountTest(TestCase):
+    def setUp(self):
+        self.main_user = User.objects.create_user(nickname="하하", social_provider="google", email="haha@haha.com")
+        self.other_user = User.objects.create_user(nickname="이이", social_provider="google", email="ee@ee.com")
+        self.chatroom = ChatRoom.objects.create()
+        self.main_chatroom_user = ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.main_user, unread_count=1)
+        self.other_chatroom_user = ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.other_user)
+        self.clear_redis()
+        # 다른 테스트가 남긴 항목은 먼저 반영해서 비워 둠
+        ChatService.flush_unread_counts()
+
+    def tearDown(self):
+        self.clear_redis()
+
+    def clear_redis(self):
+        for user in (self.main_user, self.other_user):
+            chat_redis_client.delete(ChatService.get_unread_counts_key(user.id), ChatRoomListCacheService.get_key(user.id))
+            chat_redis_client.srem(DIRTY_UNREAD_COUNTS_KEY, ChatService.get_dirty_unread_count_member(self.chatroom.id, user.id))
+        chat_redis_client.delete(
+            MessageBufferService.get_messages_key(self.chatroom.id),
+            MessageBufferService.get_seq_key(self.chatroom.id),
+            PENDING_UNREAD_COUNTS_KEY,
+        )
+        chat_redis_client.zrem(MessageFlushService.get_room_dirty_rooms_key(self.chatroom.id), self.chatroom.id)
+
+    def buffer_message(self):
+        message_data = {
+            "room_id": self.chatroom.id,
+            "sender_id": self.other_user.id,
+            "message": "하이",
+            "created_at": timezone.now().isoformat(),
+            "client_message_id": generate_message_id(),
+        }
+        return async_to_sync(ChatService.buffer_message)(self.chatroom.id, message_data, timezone.now().timestamp(), self.main_user.id)
+
+    def test_buffer_message_does_not_write_db(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(self.buffer_message()[0])
+            self.buffer_message()
+
+        self.main_chatroom_user.refresh_from_db()
+        self.assertEqual(self.main_chatroom_user.unread_count, 1)
+
+    def test_cold_start_adds_db_count(self):
+        # Redis 에 DB 값이 없을 때 쌓인 증가분은 처음 읽을 때 DB 값과 합쳐짐
+        self.buffer_message()
+        self.buffer_message()
+
+        self.assertEqual(ChatService.get_unread_count(self.chatroom.id, self.main_user.id), 3)
+        self.assertEqual(ChatService.get_unread_counts(self.main_user.id), {self.chatroom.id: 3})
+
+        # 이미 합쳐진 hash 는 다시 읽어도 DB 값을 더하지 않음
+        with self.assertNumQueries(0):
+            self.assertEqual(ChatService.get_unread_count(self.chatroom.id, self.main_user.id), 3)
+
+    def test_flush_writes_counts_in_one_update(self):
+        ChatService.load_unread_counts(self.main_user.id)
+        self.buffer_message()
+        ChatService.reset_unread_count(self.chatroom.id, self.other_user.id)
+
+        # 두 사용자 hash 모두 DB 값이 합쳐져 있으므로 UPDATE ... FROM (VALUES ...) 한 번
+        with self.assertNumQueries(1):
+            self.assertEqual(ChatService.flush_unread_counts(), 2)
+
+        self.main_chatroom_user.refresh_from_db()
+        self.other_chatroom_user.refresh_from_db()
+        self.assertEqual(self.main_chatroom_user.unread_count, 2)
+        self.assertEqual(self.other_chatroom_user.unread_count, 0)
+        self.assertEqual(ChatService.flush_unread_counts(), 0)
+
+    def test_reset_unread_count(self):
+        self.buffer_message()
+
+        ChatService.reset_unread_count(self.chatroom.id, self.main_user.id)
+        ChatService.flush_unread_counts()
+
+        self.assertEqual(ChatService.get_unread_count(self.chatroom.id, self.main_user.id), 0)
+        self.main_chatroom_user.refresh_from_db()
+        self.assertEqual(self.main_chatroom_user.unread_count, 0)
+
+    def test_online_receiver_is_not_counted(self):
+        chat_redis_client.sadd(f"chat_room_{self.chatroom.id}_users", self.main_user.id)
+        try:
+            self.assertTrue(self.buffer_message()[0])
+        finally:
+            chat_redis_client.delete(f"chat_room_{self.chatroom.id}_users")
+
+        self.assertEqual(ChatService.get_unread_count(self.chatroom.id, self.main_user.id), 1)
+
+    def test_buffer_message_returns_unread_counts(self):
+        # DB 값이 합쳐지지 않은 hash 는 개수를 알 수 없음
+        self.assertEqual(self.buffer_message()[1], {self.other_user.id: None, self.main_user.id: None})
+
+        ChatService.load_unread_counts(self.main_user.id)
+        ChatService.reset_unread_count(self.chatroom.id, self.other_user.id)
+
+        self.assertEqual(self.buffer_message()[1], {self.other_user.id: 0, self.main_user.id: 3})
+
+    def test_buffer_messages_in_one_call(self):
+        ChatService.load_unread_counts(self.main_user.id)
+        now = timezone.now().timestamp()
+        messages = [
+            (
+                {
+                    "room_id": self.chatroom.id,
+                    "sender_id": self.other_user.id,
+                    "message": f"메시지 {i}",
+                    "created_at": "",
+                    "client_message_id": generate_message_id(),
+                },
+                now + i / 1000,
+            )
+            for i in range(3)
+        ]
+
+        _, unread_counts, seqs = async_to_sync(ChatService.buffer_messages)(self.chatroom.id, messages, self.main_user.id)
+
+        self.assertEqual(unread_counts[self.main_user.id], 4)
+        self.assertEqual(seqs, [1, 2, 3])
+        buffered = chat_redis_client.zrange(MessageBufferService.get_messages_key(self.chatroom.id), 0, -1, withscores=True)
+        self.assertEqual([(json.loads(member)["seq"], score) for member, score in buffered], [(i + 1, now + i / 1000) for i in range(3)])
+
+    def test_legacy_pending_counts_are_migrated(self):
+        chat_redis_client.hset(PENDING_UNREAD_COUNTS_KEY, f"{self.chatroom.id}:{self.main_user.id}", 2)
+
+        ChatService.flush_unread_counts()
+
+        self.main_chatroom_user.refresh_from_db()
+        self.assertEqual(self.main_chatroom_user.unread_count, 3)
+        self.assertFalse(chat_redis_client.exists(PENDING_UNREAD_COUNTS_KEY))
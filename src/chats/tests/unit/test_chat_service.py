@@ -0,0 +1,47 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from chats.models import ChatRoom, ChatRoomUser, Message
+from chats.services import MessageService
+from users.models import User
+
+
+class MessageServiceTest(TestCase):
+    def setUp(self):
+        self.main_user = User.objects.create_user(nickname="하하", social_provider="google", email="haha@haha.com")
+        self.chatroom = ChatRoom.objects.create()
+        ChatRoomUser.objects.create(chatroom=self.chatroom, user=self.main_user)
+
+    def test_append_many_is_single_query(self):
+        now = timezone.now()
+        messages = [
+            Message(sender=self.main_user, message="두번째", created_at=now),
+            Message(sender=self.main_user, message="첫번째", created_at=now - timezone.timedelta(seconds=1)),
+        ]
+
+        # 메시지 INSERT 와 latest_message UPDATE 를 한 문장으로
+        with self.assertNumQueries(1):
+            saved = MessageService.append_many(self.chatroom, messages)
+
+        self.assertTrue(all(message.pk for message in saved))
+        self.assertEqual(self.chatroom.latest_message, messages[0])
+        self.chatroom.refresh_from_db()
+        self.assertEqual(self.chatroom.latest_message_id, messages[0].pk)
+        self.assertEqual(self.chatroom.latest_message_time, now)
+
+    def test_append_many_keeps_newer_latest_message(self):
+        (newer,) = MessageService.append_many(self.chatroom, [Message(sender=self.main_user, message="최신")])
+
+        MessageService.append_many(
+            self.chatroom, [Message(sender=self.main_user, message="예전", created_at=newer.created_at - timezone.timedelta(minutes=1))]
+        )
+
+        self.chatroom.refresh_from_db()
+        self.assertEqual(self.chatroom.latest_message_id, newer.pk)
+
+    def test_message_save_does_not_write_room(self):
+        with self.assertNumQueries(1):
+            Message.objects.create(room=self.chatroom, sender=self.main_user, message="하이")
+
+        self.chatroom.refresh_from_db()
+        self.assertIsNone(self.chatroom.latest_message)
@@ -0,0 +1,7 @@
+import uuid
+
+
+def generate_message_id():
+    # 프로세스 / 컨테이너마다 따로 정할 값이 없어도 겹치지 않도록 uuid4 사용
+    # (겹치면 flush 때 (sender, client_message_id) unique 제약에 걸려 메시지가 저장되지 않음)
+    return uuid.uuid4().hex
@@ -1,17 +1,34 @@
+import base64
+import logging
+import math
+from datetime import datetime
+
+import redis
 from django.conf import settings
-from django.db.models import OuterRef, Subquery
+from django.db import transaction
+from django.db.models import F, FilteredRelation, OuterRef, Q, Subquery
 from django.http import Http404
 from django.utils import timezone
 from rest_framework import generics, status
-from rest_framework.exceptions import ValidationError
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from users.models import User
 
 from .models import ChatRoom, ChatRoomUser, Message
 from .serializers import ChatRoomListSerializer, ChatRoomSerializer, MessageSerializer
+from .services import (
+    ChatRoomListCacheService,
+    ChatRoomService,
+    ChatService,
+    MessageBufferService,
+    MessageService,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class ChatRoomCreateView(generics.CreateAPIView):
@@ -22,11 +39,21 @@ class ChatRoomCreateView(generics.CreateAPIView):
         main_user = request.user
         other_user = self.get_other_user()
 
-        existing_chatroom = self.get_existing_chatroom(main_user, other_user)
-        if existing_chatroom:
-            return self.handle_existing_chatroom(existing_chatroom, other_user)
+        if other_user.id == main_user.id:
+            raise ValidationError("자기 자신과는 채팅방을 만들 수 없습니다.")
+
+        # 채팅방 / 참여자 / 인사 메시지를 한 트랜잭션으로 저장
+        with transaction.atomic():
+            chatroom, created = ChatRoomService.get_or_create_direct_room(main_user, other_user)
+            greeting = f"반갑습니다 {other_user.nickname}입니다" if created else f"안녕하세요 {other_user.nickname}입니다"
+            MessageService.append_many(chatroom, [Message(sender=other_user, message=greeting, seq=self.get_next_seq(chatroom, created))])
 
-        return self.create_new_chatroom(main_user, other_user)
+        self.touch_chat_room_list(chatroom, [main_user.id, other_user.id])
+
+        context = self.get_serializer_context()
+        context.update(self.get_additional_context(chatroom, other_user))
+        serializer = self.get_serializer(chatroom, context=context)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     def get_other_user(self):
         other_user_nickname = self.request.data.get("other_user_nickname")
@@ -37,25 +64,26 @@ class ChatRoomCreateView(generics.CreateAPIView):
         except User.DoesNotExist:
             raise ValidationError("해당 닉네임을 가진 사용자가 존재하지 않습니다.")
 
-    def get_existing_chatroom(self, main_user, other_user):
-        return ChatRoom.objects.filter(chatroom_users__user=main_user).filter(chatroom_users__user=other_user).first()
-
-    def handle_existing_chatroom(self, chatroom, other_user):
-        Message.objects.create(room=chatroom, sender=other_user, message=f"안녕하세요 {other_user.nickname}입니다")
-        context = self.get_serializer_context()
-        context.update(self.get_additional_context(chatroom, other_user))
-        serializer = self.get_serializer(chatroom, context=context)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    def get_next_seq(self, chatroom, created):
+        try:
+            # 새로 만든 채팅방은 메시지가 없으므로 DB 에서 마지막 순번을 읽지 않음
+            return MessageBufferService.next_seq(chatroom.id, 0 if created else None)
+        except redis.RedisError as e:
+            # 순번이 없는 메시지는 재연결 시 다시 보내지 않을 뿐 저장은 그대로 함
+            logger.error(f"Redis error in get_next_seq: {str(e)}")
+            return None
 
-    def create_new_chatroom(self, main_user, other_user):
-        chatroom = ChatRoom.objects.create()
-        ChatRoomUser.objects.create(chatroom=chatroom, user=main_user)
-        ChatRoomUser.objects.create(chatroom=chatroom, user=other_user)
-        Message.objects.create(room=chatroom, sender=other_user, message=f"반갑습니다 {other_user.nickname}입니다")
-        context = self.get_serializer_context()
-        context.update(self.get_additional_context(chatroom, other_user))
-        serializer = self.get_serializer(chatroom, context=context)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    def touch_chat_room_list(self, chatroom, user_ids):
+        try:
+            ChatRoomListCacheService.touch_room(chatroom.id, chatroom.latest_message_time, user_ids)
+        except redis.RedisError as e:
+            # 갱신하지 못한 인덱스는 지워서 다음 조회 때 DB 에서 다시 만들게 함
+            logger.error(f"Redis error in touch_chat_room_list: {str(e)}")
+            for user_id in user_ids:
+                try:
+                    ChatRoomListCacheService.invalidate(user_id)
+                except redis.RedisError:
+                    pass
 
     def get_additional_context(self, chatroom, other_user):
         return {
@@ -70,25 +98,65 @@ class ChatRoomCreateView(generics.CreateAPIView):
 
 
 class ChatRoomListView(generics.ListAPIView):
+    """
+    기본은 전체 목록, cursor 파라미터가 있으면 (첫 페이지는 빈 값) 사용자별 채팅방 목록 인덱스(Redis)로 페이지를 나누고
+    보이는 채팅방만 DB 에서 한 번에 가져옴, Redis 를 쓸 수 없으면 latest_message_time 기준 keyset 페이지네이션
+    """
+
     permission_classes = [IsAuthenticated]
     serializer_class = ChatRoomListSerializer
 
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = (
+                ChatRoomCursorPagination() if ChatRoomCursorPagination.cursor_query_param in self.request.query_params else None
+            )
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        chatrooms = list(queryset) if page is None else page
+        self.apply_unread_counts(chatrooms)
+
+        serializer = self.get_serializer(chatrooms, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    def apply_unread_counts(self, chatrooms):
+        # 안 읽은 수는 Redis 가 기준이고 DB 는 flush 때 반영되므로 Redis 값으로 덮어씀, Redis 를 쓸 수 없으면 DB 값
+        try:
+            unread_counts = ChatService.get_unread_counts(self.request.user.id)
+        except redis.RedisError as e:
+            logger.error(f"Redis error in apply_unread_counts: {str(e)}")
+            return
+
+        for chatroom in chatrooms:
+            chatroom.unread_count = unread_counts.get(chatroom.id, chatroom.unread_count)
+
     def get_queryset(self):
         user = self.request.user
-        chatroom_users = ChatRoomUser.objects.filter(chatroom=OuterRef("pk")).values(
-            "user__id", "user__nickname", "user__profile_image", "unread_count"
-        )
+
+        # 내 참여 행과 상대방 참여 행을 조건을 join 에 넣은 FilteredRelation 으로 각각 join 해서 한 쿼리로 가져옴
+        # 상대방 행은 LEFT OUTER JOIN 이라 상대방이 나갔거나 탈퇴한 채팅방도 상대방 정보만 비어서 나옴
+        # FilteredRelation 너머로 users_user 를 한 번 더 join 하면 Django 가 join 순서를 잘못 만들어서 닉네임 / 프로필 이미지는 pk 서브쿼리로 읽음
+        other_users = User.objects.filter(id=OuterRef("other_user_id"))
 
         return (
-            ChatRoom.objects.filter(chatroom_users__user=user)
-            .select_related("latest_message__sender")
+            ChatRoom.objects.annotate(
+                my_membership=FilteredRelation("chatroom_users", condition=Q(chatroom_users__user_id=user.id)),
+                other_membership=FilteredRelation("chatroom_users", condition=~Q(chatroom_users__user_id=user.id)),
+            )
+            .filter(my_membership__user_id=user.id)
+            .annotate(unread_count=F("my_membership__unread_count"), other_user_id=F("other_membership__user_id"))
             .annotate(
-                other_user_nickname=Subquery(chatroom_users.exclude(user__id=user.id).values("user__nickname")[:1]),
-                other_user_id=Subquery(chatroom_users.exclude(user__id=user.id).values("user__id")[:1]),
-                other_user_profile_image=Subquery(chatroom_users.exclude(user__id=user.id).values("user__profile_image")[:1]),
-                unread_count=Subquery(chatroom_users.filter(user__id=user.id).values("unread_count")[:1]),
+                other_user_nickname=Subquery(other_users.values("nickname")[:1]),
+                other_user_profile_image=Subquery(other_users.values("profile_image")[:1]),
             )
-            .order_by("-latest_message_time")
+            .select_related("latest_message__sender")
+            .order_by(F("latest_message_time").desc(nulls_last=True), "-id")
         )
 
 
@@ -98,21 +166,249 @@ class MessagePagination(PageNumberPagination):
     max_page_size = 100
 
 
+class MessageCursorPagination(BasePagination):
+    """
+    (created_at, id) 기준 keyset 페이지네이션
+    OFFSET / COUNT 쿼리 없이 (room_id, created_at, id) 인덱스만 타고 이전 메시지를 가져옴
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        # 버퍼를 DB 보다 먼저 읽어야 그 사이에 동기화된 메시지가 양쪽에서 모두 빠지지 않음
+        # 버퍼도 cursor 보다 오래된 메시지를 page_size + 1 개까지만 읽으므로 응답 크기는 버퍼 크기와 상관없음
+        buffered_messages = (
+            MessageBufferService.get_unsynced_messages(view.kwargs["room_id"], limit=page_size + 1, before=self.get_buffer_bound(position))
+            if view is not None
+            else []
+        )
+
+        if position is not None:
+            created_at, message_id = position
+            if message_id is None:
+                queryset = queryset.filter(created_at__lt=created_at)
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=message_id))
+
+        results = MessageBufferService.merge(buffered_messages, list(queryset.order_by("-created_at", "-id")[: page_size + 1]))
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+
+        return self.page
+
+    @staticmethod
+    def get_buffer_bound(position):
+        if position is None:
+            return None
+
+        # 버퍼의 score 는 created_at 의 timestamp, cursor 의 메시지 자신은 포함하지 않도록 0.5 마이크로초 앞까지 읽음
+        return position[0].timestamp() - 0.0000005
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        # 아직 동기화되지 않은 버퍼 메시지는 id 가 없으므로 created_at 만으로 다음 페이지를 찾음
+        last_message = self.page[-1]
+        cursor = self.encode_cursor(last_message.created_at, last_message.id)
+
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    @staticmethod
+    def encode_cursor(created_at, message_id):
+        return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{message_id or ''}".encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            created_at, message_id = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8").split("|")
+            return datetime.fromisoformat(created_at), int(message_id) if message_id else None
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound("유효하지 않은 cursor 입니다.")
+
+
+class ChatRoomCursorPagination(MessageCursorPagination):
+    """
+    (마지막 메시지 시각, id) 기준 페이지네이션, 메시지가 없는 채팅방(latest_message_time 이 NULL)은 마지막
+    cursor 는 ChatRoomListCacheService 의 (score, 채팅방 id) 로 Redis 인덱스와 DB keyset 둘 다에서 씀
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        try:
+            return self.paginate_room_index(queryset, request.user.id, position, page_size)
+        except redis.RedisError as e:
+            logger.error(f"Redis error in ChatRoomCursorPagination: {str(e)}")
+
+        return self.paginate_database(queryset, position, page_size)
+
+    def paginate_room_index(self, queryset, user_id, position, page_size):
+        entries = ChatRoomListCacheService.get_page(user_id, position, page_size + 1)
+        self.has_next = len(entries) > page_size
+        entries = entries[:page_size]
+
+        room_ids = [room_id for room_id, _ in entries]
+        rooms = queryset.in_bulk(room_ids)
+        buffered = MessageBufferService.get_latest_buffered_messages(room_ids)
+
+        self.page = []
+        for room_id, score in entries:
+            # 인덱스에만 남아 있는 채팅방은 건너뜀
+            room = rooms.get(room_id)
+            if room is None:
+                continue
+
+            # 아직 flush 되지 않은 메시지가 있으면 DB 의 마지막 메시지 대신 보여줌
+            if room_id in buffered and buffered[room_id][1] > ChatRoomListCacheService.get_score(room.latest_message_time, room_id):
+                message_data, buffered_score = buffered[room_id]
+                room.latest_message_time = datetime.fromtimestamp(buffered_score)
+                room.latest_message = Message(
+                    room_id=room_id,
+                    sender_id=message_data["sender_id"],
+                    message=message_data["message"],
+                    created_at=room.latest_message_time,
+                    client_message_id=message_data.get("client_message_id"),
+                )
+            self.page.append(room)
+
+        self.last_position = (entries[-1][1], entries[-1][0]) if entries else None
+
+        return self.page
+
+    def paginate_database(self, queryset, position, page_size):
+        if position is not None:
+            score, room_id = position
+            # 메시지가 없는 채팅방의 score 는 음수 (ChatRoomListCacheService.get_score)
+            if score < 0:
+                queryset = queryset.filter(latest_message_time__isnull=True, id__lt=room_id)
+            else:
+                latest_message_time = datetime.fromtimestamp(score)
+                queryset = queryset.filter(
+                    Q(latest_message_time__lt=latest_message_time)
+                    | Q(latest_message_time=latest_message_time, id__lt=room_id)
+                    | Q(latest_message_time__isnull=True)
+                )
+
+        results = list(queryset[: page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+
+        if self.page:
+            last_room = self.page[-1]
+            self.last_position = (ChatRoomListCacheService.get_score(last_room.latest_message_time, last_room.id), last_room.id)
+        else:
+            self.last_position = None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+
+        cursor = self.encode_cursor(*self.last_position)
+
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    @staticmethod
+    def encode_cursor(score, room_id):
+        return base64.urlsafe_b64encode(f"{score!r}|{room_id}".encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            score, room_id = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("utf-8").split("|")
+            score = float(score)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound("유효하지 않은 cursor 입니다.")
+
+        if not math.isfinite(score) or not room_id.isdigit():
+            raise NotFound("유효하지 않은 cursor 입니다.")
+
+        return score, int(room_id)
+
+
 class MessageListView(generics.ListAPIView):
+    """
+    기본은 page 번호 페이지네이션, cursor 파라미터가 있으면 (첫 페이지는 빈 값) keyset 페이지네이션
+    첫 페이지에는 아직 DB 에 동기화되지 않은 Redis 버퍼의 메시지도 합쳐서 반환
+    """
+
     permission_classes = [IsAuthenticated]
     serializer_class = MessageSerializer
     pagination_class = MessagePagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            self._paginator = MessageCursorPagination() if self.is_cursor_mode() else self.pagination_class()
+        return self._paginator
+
+    def is_cursor_mode(self):
+        return MessageCursorPagination.cursor_query_param in self.request.query_params
+
+    def is_first_page(self):
+        if self.is_cursor_mode():
+            return not self.request.query_params.get(MessageCursorPagination.cursor_query_param)
+
+        return self.request.query_params.get(self.paginator.page_query_param, "1") == "1"
+
+    def list(self, request, *args, **kwargs):
+        if self.is_cursor_mode():
+            # 버퍼와 DB 를 합쳐서 page_size 개로 자르는 것까지 MessageCursorPagination 에서 처리
+            page = self.paginate_queryset(self.get_queryset())
+        else:
+            # 버퍼를 DB 보다 먼저 읽어야 그 사이에 동기화된 메시지가 양쪽에서 모두 빠지지 않음
+            # 번호 페이지는 DB 의 OFFSET 이 어긋나지 않도록 자르지 않고, 버퍼의 최신 page_size 개만 더함
+            buffered_messages = (
+                MessageBufferService.get_unsynced_messages(self.kwargs["room_id"], limit=self.paginator.get_page_size(request))
+                if self.is_first_page()
+                else []
+            )
+            page = MessageBufferService.merge(buffered_messages, self.paginate_queryset(self.get_queryset()))
+
+        # 첫 페이지가 비어 있으면 메시지가 없는 방 (exists() 쿼리 대신)
+        if not page and self.is_first_page():
+            raise Http404("해당 room_id로 메시지를 찾을 수 없습니다.")
+
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def get_queryset(self):
-        user = self.request.user
         room_id = self.kwargs.get("room_id")
 
         if not room_id:
             raise ValidationError({"detail": "room_id 파라미터가 필요합니다."})
 
-        queryset = Message.objects.filter(room_id=room_id).order_by("-created_at")
-
-        if not queryset.exists():
-            raise Http404("해당 room_id로 메시지를 찾을 수 없습니다.")
-
-        return queryset
+        return Message.objects.filter(room_id=room_id).select_related("sender").order_by("-created_at", "-id")
@@ -18,18 +18,18 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 django_asgi_app = get_asgi_application()
 
 # channels 라우팅과 미들웨어는 Django 초기화 이후에 가져와야 함
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 
 from chats.routing import websocket_urlpatterns
+from users.middleware import JWTAuthMiddleware
 from users.urls import user_status_urlpatterns
 
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
         "websocket": AllowedHostsOriginValidator(
-            AuthMiddlewareStack(
+            JWTAuthMiddleware(
                 URLRouter(websocket_urlpatterns + user_status_urlpatterns),
             )
         ),
@@ -0,0 +1,55 @@
+import bisect
+import hashlib
+from urllib.parse import urlsplit
+
+from channels_redis.core import RedisChannelLayer
+
+# Redis 하나가 링 위에 차지하는 점의 수, 많을수록 그룹이 고르게 나뉨
+VIRTUAL_NODES_PER_HOST = 160
+
+
+def get_hash(value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+
+    return int.from_bytes(hashlib.md5(value).digest()[:8], "big")
+
+
+def get_host_name(host):
+    """
+    링 위의 위치를 정하는 Redis 이름, 목록 순서나 비밀번호가 바뀌어도 같은 Redis 는 같은 위치에 둠
+    """
+    if "address" in host:
+        address = urlsplit(host["address"])
+        return f"{address.hostname}:{address.port or 6379}{address.path or '/0'}"
+
+    if "master_name" in host:
+        return f"{host['master_name']}/{host.get('db', 0)}"
+
+    return f"{host.get('host')}:{host.get('port', 6379)}/{host.get('db', 0)}"
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """
+    hosts 가 여러 개일 때 그룹 / 채널을 consistent hashing 링으로 Redis 에 나눠 담는 채널 레이어
+    RedisChannelLayer 는 crc32 값의 구간으로 나누므로 Redis 를 하나 늘리면 대부분의 그룹이 다른 Redis 로 옮겨가지만,
+    링을 쓰면 늘어난 Redis 로 옮겨가는 1 / (Redis 수) 만큼만 바뀜
+    모든 프로세스가 같은 hosts 설정을 써야 같은 그룹을 같은 Redis 에서 찾음
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        points = sorted(
+            (get_hash(f"{get_host_name(host)}#{i}"), index) for index, host in enumerate(self.hosts) for i in range(VIRTUAL_NODES_PER_HOST)
+        )
+        self.ring_points = [point for point, _ in points]
+        self.ring_indexes = [index for _, index in points]
+
+    def consistent_hash(self, value):
+        if self.ring_size == 1:
+            return 0
+
+        position = bisect.bisect(self.ring_points, get_hash(value)) % len(self.ring_points)
+
+        return self.ring_indexes[position]
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+import weakref
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# 이름(settings.REDIS_CONNECTIONS 의 key) -> 동기 클라이언트, 프로세스에 하나씩
+_clients = {}
+_clients_lock = threading.Lock()
+
+# redis.asyncio 커넥션은 생성된 이벤트 루프에서만 쓸 수 있으므로 루프마다 이름별 클라이언트를 하나씩 둠
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_connection_settings(name):
+    try:
+        return settings.REDIS_CONNECTIONS[name]
+    except KeyError:
+        raise ImproperlyConfigured(f"settings.REDIS_CONNECTIONS 에 '{name}' Redis 연결 설정이 없습니다.")
+
+
+def get_connection_kwargs():
+    return {
+        # 이 시간(초) 이상 쉰 커넥션은 쓰기 전에 PING 으로 끊겼는지 확인
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT,
+    }
+
+
+def create_client(connection, module, max_connections):
+    """
+    연결 설정 하나로 클라이언트를 만듦 (module 은 redis 또는 redis.asyncio)
+    커넥션을 max_connections 개까지만 만들고, 다 쓰고 있으면 REDIS_POOL_TIMEOUT 초 동안 반납을 기다림
+    """
+    connection_kwargs = get_connection_kwargs()
+
+    if connection.get("cluster"):
+        return module.RedisCluster.from_url(connection["url"], max_connections=max_connections, **connection_kwargs)
+
+    if connection.get("sentinels"):
+        sentinel = module.Sentinel(connection["sentinels"], sentinel_kwargs={"password": connection.get("password")}, **connection_kwargs)
+        return sentinel.master_for(
+            connection["master_name"],
+            db=connection.get("db", 0),
+            password=connection.get("password"),
+            max_connections=max_connections,
+        )
+
+    connection_pool = module.BlockingConnectionPool.from_url(
+        connection["url"], max_connections=max_connections, timeout=settings.REDIS_POOL_TIMEOUT, **connection_kwargs
+    )
+    return module.Redis(connection_pool=connection_pool)
+
+
+def get_redis(name):
+    client = _clients.get(name)
+
+    if client is None:
+        with _clients_lock:
+            if name not in _clients:
+                connection = get_connection_settings(name)
+                _clients[name] = create_client(connection, redis, connection["max_connections"])
+            client = _clients[name]
+
+    return client
+
+
+def get_async_redis(name):
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+
+    if name not in clients:
+        connection = get_connection_settings(name)
+        clients[name] = create_client(connection, aioredis, connection["async_max_connections"])
+
+    return clients[name]
+
+
+def check_health(names=None):
+    """
+    연결마다 PING 을 보내서 {이름: (성공 여부, 응답 시간 ms 또는 오류 메시지)} 반환
+    """
+    results = {}
+
+    for name in names or settings.REDIS_CONNECTIONS:
+        started_at = time.perf_counter()
+        try:
+            get_redis(name).ping()
+            results[name] = (True, round((time.perf_counter() - started_at) * 1000, 2))
+        except redis.RedisError as e:
+            results[name] = (False, str(e))
+
+    return results
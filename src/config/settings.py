@@ -155,7 +155,7 @@ CSRF_TRUSTED_ORIGINS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    "DEFAULT_AUTHENTICATION_CLASSES": ("rest_framework_simplejwt.authentication.JWTAuthentication",),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.CachedJWTAuthentication",),
 }
 
 JWT_ACCESS_TOKEN_EXPIRE = timedelta(hours=1)
@@ -215,28 +215,148 @@ DATABASES = {
 REDIS_HOST = os.environ.get("REDIS_HOST", "0.0.0.0")
 REDIS_PORT = os.environ.get("REDIS_PORT", 6379)
 REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD", "")
+REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}"
+
+# 프로세스당(비동기는 이벤트 루프당) Redis 연결 하나가 쓰는 커넥션 수, 다 쓰고 있으면 REDIS_POOL_TIMEOUT 초 동안 기다림
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+REDIS_ASYNC_MAX_CONNECTIONS = int(os.environ.get("REDIS_ASYNC_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = int(os.environ.get("REDIS_POOL_TIMEOUT", 5))
+# 이 시간(초) 이상 쉰 커넥션은 쓰기 전에 PING 으로 확인
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 5))
+
+# Sentinel 을 쓰면 "host:port,host:port" 와 master 이름을 지정 (REDIS_{이름}_URL 을 따로 준 연결은 제외)
+REDIS_SENTINELS = [
+    (host, int(port)) for host, port in (address.rsplit(":", 1) for address in os.environ.get("REDIS_SENTINELS", "").split(",") if address)
+]
+REDIS_SENTINEL_MASTER = os.environ.get("REDIS_SENTINEL_MASTER", "mymaster")
+
+
+def redis_connection(name, db):
+    """
+    이름별 Redis 연결 설정, REDIS_{이름}_URL 로 자주 쓰는 keyspace 를 다른 인스턴스로 옮기고
+    REDIS_{이름}_CLUSTER=true 면 Redis Cluster 로 연결
+    """
+    url_env = f"REDIS_{name.upper()}_URL"
+    connection = {
+        "url": os.environ.get(url_env, f"{REDIS_URL}/{db}"),
+        "db": db,
+        "password": REDIS_PASSWORD or None,
+        "max_connections": int(os.environ.get(f"REDIS_{name.upper()}_MAX_CONNECTIONS", REDIS_MAX_CONNECTIONS)),
+        "async_max_connections": int(os.environ.get(f"REDIS_{name.upper()}_ASYNC_MAX_CONNECTIONS", REDIS_ASYNC_MAX_CONNECTIONS)),
+        "cluster": os.environ.get(f"REDIS_{name.upper()}_CLUSTER", "").lower() == "true",
+    }
+
+    if REDIS_SENTINELS and url_env not in os.environ:
+        connection.update(sentinels=REDIS_SENTINELS, master_name=REDIS_SENTINEL_MASTER)
+
+    return connection
+
+
+# 모든 앱은 config.redis_pools.get_redis / get_async_redis 에 이름을 넘겨서 클라이언트를 가져옴
+REDIS_CONNECTIONS = {
+    # Channels 채널 레이어
+    "channels": redis_connection("channels", 0),
+    # Django 캐시
+    "cache": redis_connection("cache", 1),
+    # 접속 상태, 기존 키가 캐시 db 에 있으므로 같은 db
+    "presence": redis_connection("presence", 1),
+    # 채팅 메시지 버퍼 / 안 읽은 수 / 채팅방 목록 인덱스 / flush lease
+    # Lua 스크립트가 여러 key 를 같이 쓰므로 Cluster 가 아닌 한 인스턴스(또는 Sentinel)에 둬야 함
+    "chat": redis_connection("chat", 3),
+}
 
 
+def redis_channel_layer_host(connection):
+    # channels_redis 는 커넥션 풀을 직접 만들기 때문에 host 설정으로 넘김
+    if connection.get("sentinels"):
+        return {
+            "sentinels": connection["sentinels"],
+            "master_name": connection["master_name"],
+            "db": connection["db"],
+            "password": connection["password"],
+            "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        }
+
+    return {"address": connection["url"], "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL}
+
+
+# 채널 레이어를 여러 Redis 에 나누려면 "redis://:pw@host1:6379/0,redis://:pw@host2:6379/0" 처럼 지정
+# 그룹 (chat_room_{id}, chat_list_{user_id} 등) 마다 consistent hashing 으로 Redis 하나를 정함 (config.channel_layers)
+REDIS_CHANNEL_LAYER_URLS = [url for url in os.environ.get("REDIS_CHANNEL_LAYER_URLS", "").split(",") if url]
+
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "config.channel_layers.ShardedRedisChannelLayer",
         "CONFIG": {
-            "hosts": [f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/0"],
+            "hosts": [{"address": url, "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL} for url in REDIS_CHANNEL_LAYER_URLS]
+            or [redis_channel_layer_host(REDIS_CONNECTIONS["channels"])],
         },
     },
 }
 
+# Redis 에 쌓인 채팅 메시지를 DB 로 동기화하는 주기 (초)
+CHAT_MESSAGE_SYNC_INTERVAL = int(os.environ.get("CHAT_MESSAGE_SYNC_INTERVAL", 30))
+
+# flush worker 샤드 수와 lease 유효 시간 (초), lease 는 동기화 주기보다 길어야 함
+# 채팅 서버와 flush worker 가 같은 샤드 수를 써야 하고, 바꾼 뒤에는 run_chat_flush_worker --scan 으로 dirty 목록을 다시 등록
+CHAT_FLUSH_SHARDS = int(os.environ.get("CHAT_FLUSH_SHARDS", 1))
+CHAT_FLUSH_LEASE_TTL = int(os.environ.get("CHAT_FLUSH_LEASE_TTL", CHAT_MESSAGE_SYNC_INTERVAL * 3))
+# 채팅방 하나를 flush 할 때 한 번에 bulk_create 하는 메시지 수
+CHAT_FLUSH_BATCH_SIZE = int(os.environ.get("CHAT_FLUSH_BATCH_SIZE", 1000))
+# 버퍼 읽기 / 저장 / 삭제를 한 번에 묶어서 처리하는 채팅방 수
+CHAT_FLUSH_ROOM_BATCH_SIZE = int(os.environ.get("CHAT_FLUSH_ROOM_BATCH_SIZE", 100))
+
+# 사용자별 채팅방 목록 인덱스(Redis zset) 유효 시간 (초), 조회할 때마다 연장
+CHAT_ROOM_LIST_CACHE_TTL = int(os.environ.get("CHAT_ROOM_LIST_CACHE_TTL", 60 * 60 * 24))
+
+# 채팅 웹소켓 프레임 하나({"messages": [...]})로 보낼 수 있는 최대 메시지 수
+CHAT_MAX_BATCH_MESSAGES = int(os.environ.get("CHAT_MAX_BATCH_MESSAGES", 100))
+
+# 재연결(resume_from) 시 다시 보내는 최대 메시지 수, 더 많이 놓쳤으면 메시지 목록 API 로 다시 불러오게 함
+CHAT_RESUME_MAX_MESSAGES = int(os.environ.get("CHAT_RESUME_MAX_MESSAGES", 500))
+
+# 채팅방 목록 웹소켓이 같은 채팅방의 변경을 모으는 시간 (초), 그 사이의 변경은 마지막 상태만 보냄
+CHAT_LIST_UPDATE_INTERVAL = float(os.environ.get("CHAT_LIST_UPDATE_INTERVAL", 0.2))
+# 채팅방 목록 웹소켓 하나에 초당 보내는 최대 변경 수
+CHAT_LIST_MAX_PUSH_RATE = float(os.environ.get("CHAT_LIST_MAX_PUSH_RATE", 10))
+
+# 접속 상태 웹소켓이 heartbeat 를 보내는 주기 (초), heartbeat 가 PRESENCE_TTL 동안 없으면 그 연결은 끊긴 것으로 봄
+PRESENCE_HEARTBEAT_INTERVAL = int(os.environ.get("PRESENCE_HEARTBEAT_INTERVAL", 30))
+PRESENCE_TTL = int(os.environ.get("PRESENCE_TTL", PRESENCE_HEARTBEAT_INTERVAL * 3))
+# 접속 상태를 여러 명 조회할 때 MGET 하나에 담는 key 수
+PRESENCE_BULK_CHUNK_SIZE = int(os.environ.get("PRESENCE_BULK_CHUNK_SIZE", 1000))
+# 구독 중인 사용자들의 접속 상태 변경을 모아서 보내는 간격 (초), 그 사이에 바뀐 내용은 마지막 상태 하나로 합침
+PRESENCE_DELTA_INTERVAL = float(os.environ.get("PRESENCE_DELTA_INTERVAL", 0.5))
+# 웹소켓 하나가 구독할 수 있는 사용자 수
+PRESENCE_MAX_SUBSCRIPTIONS = int(os.environ.get("PRESENCE_MAX_SUBSCRIPTIONS", 500))
+
+# 토큰 인증에 쓰는 User 캐시, Redis 에는 USER_CACHE_TTL 초, 프로세스 메모리에는 USER_CACHE_LOCAL_TTL 초 동안 둠
+# 프로세스 메모리 캐시는 다른 프로세스에서 바꾼 내용을 알 수 없으므로 짧게 유지
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 300))
+USER_CACHE_LOCAL_TTL = float(os.environ.get("USER_CACHE_LOCAL_TTL", 5))
+USER_CACHE_LOCAL_MAX_SIZE = int(os.environ.get("USER_CACHE_LOCAL_MAX_SIZE", 10000))
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/1",
+        "LOCATION": REDIS_CONNECTIONS["cache"]["url"],
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
             "PASSWORD": REDIS_PASSWORD,
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": REDIS_CONNECTIONS["cache"]["max_connections"],
+                "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+            },
         },
     }
 }
 
+if REDIS_CONNECTIONS["cache"].get("sentinels"):
+    CACHES["default"]["LOCATION"] = f"redis://{REDIS_SENTINEL_MASTER}/{REDIS_CONNECTIONS['cache']['db']}"
+    CACHES["default"]["OPTIONS"]["SENTINELS"] = REDIS_SENTINELS
+    DJANGO_REDIS_CONNECTION_FACTORY = "django_redis.pool.SentinelConnectionFactory"
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -0,0 +1,63 @@
+import uuid
+from collections import Counter
+
+from asgiref.sync import async_to_sync
+from channels_redis.core import RedisChannelLayer
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from config.channel_layers import ShardedRedisChannelLayer
+
+HOSTS = [f"redis://redis-{i}:6379/0" for i in range(4)]
+GROUPS = [f"chat_room_{i}" for i in range(20000)]
+
+
+def get_shards(layer):
+    return {group: layer.hosts[layer.consistent_hash(group)]["address"] for group in GROUPS}
+
+
+class ShardedRedisChannelLayerTest(SimpleTestCase):
+    def test_single_host(self):
+        layer = ShardedRedisChannelLayer(hosts=HOSTS[:1])
+
+        self.assertEqual({layer.consistent_hash(group) for group in GROUPS[:100]}, {0})
+
+    def test_groups_are_balanced(self):
+        counts = Counter(get_shards(ShardedRedisChannelLayer(hosts=HOSTS[:3])).values())
+
+        for address in HOSTS[:3]:
+            self.assertAlmostEqual(counts[address] / len(GROUPS), 1 / 3, delta=0.05)
+
+    def test_host_order_does_not_matter(self):
+        self.assertEqual(get_shards(ShardedRedisChannelLayer(hosts=HOSTS[:3])), get_shards(ShardedRedisChannelLayer(hosts=HOSTS[2::-1])))
+
+    def test_adding_host_moves_few_groups(self):
+        def moved_ratio(layer_class):
+            before = get_shards(layer_class(hosts=HOSTS[:3]))
+            after = get_shards(layer_class(hosts=HOSTS))
+            return sum(before[group] != after[group] for group in GROUPS) / len(GROUPS)
+
+        # 링은 새 Redis 로 가는 1/4 정도만, crc32 구간 방식은 절반이 옮겨감
+        self.assertLess(moved_ratio(ShardedRedisChannelLayer), 0.3)
+        self.assertGreater(moved_ratio(RedisChannelLayer), 0.4)
+
+    def test_group_send_across_shards(self):
+        layer = ShardedRedisChannelLayer(hosts=[f"{settings.REDIS_URL}/4", f"{settings.REDIS_URL}/5"], prefix=f"test{uuid.uuid4().hex}")
+        groups = [f"chat_room_{i}" for i in range(10)]
+
+        async def run():
+            try:
+                channels = {}
+                for group in groups:
+                    channels[group] = await layer.new_channel()
+                    await layer.group_add(group, channels[group])
+
+                for group in groups:
+                    await layer.group_send(group, {"type": "chat_message", "group": group})
+
+                return [(await layer.receive(channels[group]))["group"] for group in groups]
+            finally:
+                await layer.flush()
+
+        self.assertEqual({layer.consistent_hash(group) for group in groups}, {0, 1})
+        self.assertEqual(async_to_sync(run)(), groups)
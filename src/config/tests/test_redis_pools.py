@@ -0,0 +1,50 @@
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+from redis.connection import parse_url
+from redis.sentinel import SentinelConnectionPool
+
+from config.redis_pools import check_health, create_client, get_async_redis, get_redis
+
+
+class RedisPoolRegistryTest(SimpleTestCase):
+    def test_get_redis_is_shared_and_bounded(self):
+        client = get_redis("chat")
+        connection = settings.REDIS_CONNECTIONS["chat"]
+
+        self.assertIs(get_redis("chat"), client)
+        self.assertIsInstance(client.connection_pool, redis.BlockingConnectionPool)
+        self.assertEqual(client.connection_pool.max_connections, connection["max_connections"])
+        self.assertEqual(client.connection_pool.connection_kwargs["db"], parse_url(connection["url"]).get("db", 0))
+        self.assertEqual(client.connection_pool.connection_kwargs["health_check_interval"], settings.REDIS_HEALTH_CHECK_INTERVAL)
+
+    def test_get_async_redis_per_event_loop(self):
+        async def get_client():
+            client = get_async_redis("chat")
+            self.assertIs(get_async_redis("chat"), client)
+            return client
+
+        first = async_to_sync(get_client)()
+        second = async_to_sync(get_client)()
+
+        self.assertIsInstance(first.connection_pool, aioredis.BlockingConnectionPool)
+        self.assertIsNot(first, second)
+
+    def test_unknown_connection(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_redis("unknown")
+
+    def test_sentinel_connection(self):
+        client = create_client(
+            {"sentinels": [("127.0.0.1", 26379)], "master_name": "mymaster", "db": 3, "password": None}, redis, max_connections=10
+        )
+
+        self.assertIsInstance(client.connection_pool, SentinelConnectionPool)
+        self.assertEqual(client.connection_pool.max_connections, 10)
+        self.assertEqual(client.connection_pool.connection_kwargs["db"], 3)
+
+    def test_check_health(self):
+        self.assertEqual(check_health(["chat"])["chat"][0], True)
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Count, Q
+
+from mates.models import MateStats
 
 
 class GameRequestManager(models.Manager):
@@ -10,7 +13,10 @@ class GameRequestManager(models.Manager):
         )
 
         game_request.full_clean()
-        game_request.save()
+
+        with transaction.atomic():
+            game_request.save()
+            MateStats.objects.increase_request_count(mate_id=mate_id, game_id=game_request.game_id)
 
         return game_request
 
@@ -38,6 +44,32 @@ class GameRequestManager(models.Manager):
         except self.model.DoesNotExist:
             raise self.model.DoesNotExist
 
+    def get_mate_stats(self, mate_ids):
+        # 여러 메이트의 의뢰 수 / 리뷰 수 / 평균 평점을 (mate, game) 단위 집계 쿼리 한 번으로 가져옴
+        rows = (
+            self.filter(mate_id__in=mate_ids)
+            .values("mate_id", "game_id")
+            .annotate(
+                game_request_count=Count("id"),
+                review_count=Count("id", filter=Q(review_status=True)),
+                average_rating=Avg("review__rating", filter=Q(review_status=True)),
+            )
+            .order_by()
+        )
+
+        mate_stats = {mate_id: {"total_request_count": 0, "games": {}} for mate_id in mate_ids}
+
+        for row in rows:
+            stats = mate_stats[row["mate_id"]]
+            stats["total_request_count"] += row["game_request_count"]
+            stats["games"][row["game_id"]] = {
+                "game_request_count": row["game_request_count"],
+                "review_count": row["review_count"],
+                "average_rating": round(row["average_rating"], 2) if row["average_rating"] is not None else 0,
+            }
+
+        return mate_stats
+
     def accept(self, game_request):
         game_request.status = True
         game_request.save()
@@ -45,11 +77,20 @@ class GameRequestManager(models.Manager):
         return game_request
 
     def reject(self, game_request):
-        game_request.delete()
+        self.delete_game_request(game_request)
 
         return None
 
     def cancel(self, game_request):
-        game_request.delete()
+        self.delete_game_request(game_request)
 
         return None
+
+    def delete_game_request(self, game_request):
+        with transaction.atomic():
+            # 리뷰는 의뢰와 함께 CASCADE 로 지워지므로 지우기 전에 평점을 읽어서 집계에서도 빼줌
+            rating = self.filter(id=game_request.id, review__isnull=False).values_list("review__rating", flat=True).first()
+            game_request.delete()
+            MateStats.objects.decrease_request_count(mate_id=game_request.mate_id, game_id=game_request.game_id)
+            if rating is not None:
+                MateStats.objects.remove_review(mate_id=game_request.mate_id, game_id=game_request.game_id, rating=rating)
@@ -2,6 +2,10 @@ from rest_framework import serializers
 
 from game_requests.models import GameRequest
 from games.models import Game
+from users.serializers.presence_serializer import (
+    PresenceListSerializer,
+    PresenceSerializerMixin,
+)
 
 
 class GameRequestCreateSerializer(serializers.ModelSerializer):
@@ -15,13 +19,13 @@ class GameRequestCreateSerializer(serializers.ModelSerializer):
         fields = ["game_id", "price", "amount"]
 
 
-class GameRequestOrderedSerializer(serializers.ModelSerializer):
+class GameRequestOrderedSerializer(PresenceSerializerMixin, serializers.ModelSerializer):
     game_request_id = serializers.IntegerField(source="id")
     mate_id = serializers.IntegerField(source="mate.id")
     mate_nickname = serializers.CharField(source="mate.nickname")
     mate_profile_image = serializers.ImageField(source="mate.profile_image")
     mate_gender = serializers.CharField(source="mate.gender")
-    mate_online = serializers.BooleanField(source="mate.is_online")
+    mate_online = serializers.SerializerMethodField()
     status = serializers.BooleanField()
     request_date = serializers.DateTimeField(source="created_at")
     request_amount = serializers.IntegerField(source="amount")
@@ -42,15 +46,22 @@ class GameRequestOrderedSerializer(serializers.ModelSerializer):
             "request_price",
             "review_status",
         ]
+        list_serializer_class = PresenceListSerializer
 
+    def get_presence_user_id(self, obj):
+        return obj.mate_id
 
-class GameRequestReceivedSerializer(serializers.ModelSerializer):
+    def get_mate_online(self, obj):
+        return self.get_online_status(obj)
+
+
+class GameRequestReceivedSerializer(PresenceSerializerMixin, serializers.ModelSerializer):
     game_request_id = serializers.IntegerField(source="id")
     user_id = serializers.IntegerField(source="user.id")
     user_nickname = serializers.CharField(source="user.nickname")
     user_profile_image = serializers.ImageField(source="user.profile_image")
     user_gender = serializers.CharField(source="user.gender")
-    user_online = serializers.BooleanField(source="user.is_online")
+    user_online = serializers.SerializerMethodField()
     status = serializers.BooleanField()
     request_date = serializers.DateTimeField(source="created_at")
     request_amount = serializers.IntegerField(source="amount")
@@ -71,6 +82,13 @@ class GameRequestReceivedSerializer(serializers.ModelSerializer):
             "request_price",
             "review_status",
         ]
+        list_serializer_class = PresenceListSerializer
+
+    def get_presence_user_id(self, obj):
+        return obj.user_id
+
+    def get_user_online(self, obj):
+        return self.get_online_status(obj)
 
 
 class GameRequestAcceptSerializer(serializers.Serializer):
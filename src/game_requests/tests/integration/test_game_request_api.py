@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.core.exceptions import ObjectDoesNotExist
 from django.urls import reverse
 from rest_framework import status
@@ -148,6 +150,16 @@ class GameRequestAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["results"][0]["user_nickname"], self.user.nickname)
 
+    @patch("users.serializers.presence_serializer.PresenceService.get_online_statuses")
+    def test_ordered_game_requests_mate_online_from_presence(self, mock_get_online_statuses):
+        mock_get_online_statuses.return_value = {self.mate.id: False}
+
+        response = self.client.get(self.url_ordered)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["results"][0]["mate_online"])
+        mock_get_online_statuses.assert_called_once_with([self.mate.id])
+
     def test_ordered_game_requests_no_requests(self):
         response = self.client.get(self.url_ordered)
 
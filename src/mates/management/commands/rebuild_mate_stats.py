@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from game_requests.models import GameRequest
+from mates.models import MateGameStats, MateStats
+
+
+class Command(BaseCommand):
+    help = "게임 의뢰 / 리뷰 데이터로 메이트 평점 집계 테이블(mate_stats, mate_game_stats)을 다시 계산합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        rows = (
+            GameRequest.objects.values("mate_id", "game_id")
+            .annotate(request_count=Count("id"), review_count=Count("review"), rating_sum=Sum("review__rating"))
+            .order_by()
+        )
+
+        mate_stats = {}
+        mate_game_stats = []
+
+        for row in rows:
+            rating_sum = row["rating_sum"] or 0
+            mate_game_stats.append(
+                MateGameStats(
+                    user_id=row["mate_id"],
+                    game_id=row["game_id"],
+                    request_count=row["request_count"],
+                    review_count=row["review_count"],
+                    rating_sum=rating_sum,
+                    average_rating=rating_sum / row["review_count"] if row["review_count"] else 0,
+                )
+            )
+
+            stats = mate_stats.setdefault(row["mate_id"], MateStats(user_id=row["mate_id"]))
+            stats.request_count += row["request_count"]
+            stats.review_count += row["review_count"]
+            stats.rating_sum += rating_sum
+
+        for stats in mate_stats.values():
+            stats.average_rating = stats.rating_sum / stats.review_count if stats.review_count else 0
+
+        with transaction.atomic():
+            MateGameStats.objects.all().delete()
+            MateStats.objects.all().delete()
+            MateStats.objects.bulk_create(mate_stats.values(), batch_size=batch_size)
+            MateGameStats.objects.bulk_create(mate_game_stats, batch_size=batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"메이트 {len(mate_stats)}명, 메이트-게임 {len(mate_game_stats)}건의 집계를 다시 계산했습니다.")
+        )
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Case, F, Value, When
 
 from users.models import User
 
@@ -15,7 +16,7 @@ class MateGameInfoManager(models.Manager):
 
         user = User.objects.get_user_by_id(user_id)
         user.is_mate = True
-        user.save()
+        user.save(update_fields=["is_mate"])
 
         return mategameinfo
 
@@ -24,3 +25,47 @@ class MateGameInfoManager(models.Manager):
             return self.model.objects.get(user_id=mate_id, game_id=game_id)
         except self.model.DoesNotExist:
             return None
+
+
+class MateStatsManager(models.Manager):
+    """
+    메이트 평점 / 의뢰 수 집계 테이블(MateStats, MateGameStats)을 증분으로 갱신
+    호출하는 쪽의 트랜잭션 안에서 의뢰 / 리뷰 저장과 함께 실행되어야 함
+    """
+
+    def get_stats_querysets(self, mate_id, game_id):
+        from mates.models import MateGameStats
+
+        self.get_or_create(user_id=mate_id)
+        MateGameStats.objects.get_or_create(user_id=mate_id, game_id=game_id)
+
+        return [self.filter(user_id=mate_id), MateGameStats.objects.filter(user_id=mate_id, game_id=game_id)]
+
+    def increase_request_count(self, mate_id, game_id):
+        for queryset in self.get_stats_querysets(mate_id, game_id):
+            queryset.update(request_count=F("request_count") + 1)
+
+    def decrease_request_count(self, mate_id, game_id):
+        for queryset in self.get_stats_querysets(mate_id, game_id):
+            queryset.filter(request_count__gt=0).update(request_count=F("request_count") - 1)
+
+    def add_review(self, mate_id, game_id, rating):
+        # UPDATE 문 안의 F() 는 갱신 전 값을 참조하므로 평균도 한 문장으로 계산 가능
+        for queryset in self.get_stats_querysets(mate_id, game_id):
+            queryset.update(
+                review_count=F("review_count") + 1,
+                rating_sum=F("rating_sum") + rating,
+                average_rating=(F("rating_sum") + rating) / (F("review_count") + 1),
+            )
+
+    def remove_review(self, mate_id, game_id, rating):
+        # add_review 의 반대, 마지막 리뷰가 빠지면 평균은 0
+        for queryset in self.get_stats_querysets(mate_id, game_id):
+            queryset.filter(review_count__gt=0).update(
+                review_count=F("review_count") - 1,
+                rating_sum=F("rating_sum") - rating,
+                average_rating=Case(
+                    When(review_count__gt=1, then=(F("rating_sum") - rating) / (F("review_count") - 1)),
+                    default=Value(0.0),
+                ),
+            )
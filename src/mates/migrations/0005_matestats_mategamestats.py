@@ -0,0 +1,65 @@
+# Generated by Django 5.1.2 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("games", "0003_alter_game_name"),
+        ("mates", "0004_alter_mategameinfo_image"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MateStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.FloatField(default=0)),
+                ("average_rating", models.FloatField(db_index=True, default=0)),
+                ("request_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        db_column="user_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mate_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "mate_stats",
+            },
+        ),
+        migrations.CreateModel(
+            name="MateGameStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.FloatField(default=0)),
+                ("average_rating", models.FloatField(db_index=True, default=0)),
+                ("request_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("game", models.ForeignKey(db_column="game_id", on_delete=django.db.models.deletion.CASCADE, to="games.game")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_column="user_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mate_game_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "mate_game_stats",
+                "unique_together": {("user", "game")},
+            },
+        ),
+    ]
@@ -1 +1,2 @@
 from mates.models.mate_model import MateGameInfo
+from mates.models.mate_stats_model import MateGameStats, MateStats
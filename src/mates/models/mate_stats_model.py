@@ -0,0 +1,34 @@
+from django.db import models
+
+from games.models import Game
+from mates.managers import MateStatsManager
+from users.models.user_model import User
+
+
+class BaseMateStats(models.Model):
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.FloatField(default=0)
+    average_rating = models.FloatField(default=0, db_index=True)  # 정렬용 (rating_sum / review_count)
+    request_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class MateStats(BaseMateStats):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, db_column="user_id", related_name="mate_stats")
+
+    objects = MateStatsManager()
+
+    class Meta:
+        db_table = "mate_stats"
+
+
+class MateGameStats(BaseMateStats):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_column="user_id", related_name="mate_game_stats")
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, db_column="game_id")
+
+    class Meta:
+        db_table = "mate_game_stats"
+        unique_together = (("user", "game"),)
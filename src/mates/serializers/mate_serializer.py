@@ -43,7 +43,21 @@ class MateGameInfoSerializer(serializers.ModelSerializer):
             "game_request_count",
         ]
 
+    def get_game_stats(self, obj):
+        # UserMateListSerializer 가 미리 집계해둔 값이 있으면 그것을 사용
+        game_stats = self.context.get("game_stats")
+
+        if game_stats is None:
+            return None
+
+        return game_stats.get(obj.game_id, {"review_count": 0, "average_rating": 0, "game_request_count": 0})
+
     def get_review_count(self, obj):
+        game_stats = self.get_game_stats(obj)
+
+        if game_stats is not None:
+            return game_stats["review_count"]
+
         mate_id = self.context.get("mate_id")
 
         if mate_id:
@@ -52,6 +66,11 @@ class MateGameInfoSerializer(serializers.ModelSerializer):
         return 0
 
     def get_average_rating(self, obj):
+        game_stats = self.get_game_stats(obj)
+
+        if game_stats is not None:
+            return game_stats["average_rating"]
+
         mate_id = self.context.get("mate_id")
 
         if mate_id:
@@ -67,6 +86,11 @@ class MateGameInfoSerializer(serializers.ModelSerializer):
         return 0
 
     def get_game_request_count(self, obj):
+        game_stats = self.get_game_stats(obj)
+
+        if game_stats is not None:
+            return game_stats["game_request_count"]
+
         mate_id = self.context.get("mate_id")
 
         if mate_id:
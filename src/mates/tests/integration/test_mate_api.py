@@ -1,13 +1,17 @@
 from unittest.mock import patch
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from game_requests.models import GameRequest
 from games.models import Game
 from mates.exceptions import InvalidLevelError
-from mates.models import MateGameInfo
+from mates.models import MateGameInfo, MateStats
+from reviews.models import Review
 from users.models import User
 
 
@@ -146,6 +150,13 @@ class MateGameInfoListViewTest(APITestCase):
         response = self.client.get(self.url, {"sort": "rating_desc"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_mate_game_info_list_sort_by_rating_desc_uses_mate_stats(self):
+        MateStats.objects.add_review(mate_id=self.user1.id, game_id=self.game.id, rating=2.0)
+        MateStats.objects.add_review(mate_id=self.user2.id, game_id=self.game.id, rating=5.0)
+
+        response = self.client.get(self.url, {"sort": "rating_desc"})
+        self.assertEqual([mate["id"] for mate in response.data["results"]], [self.user2.id, self.user1.id])
+
     def test_mate_game_info_list_sort_by_price_asc(self):
         response = self.client.get(self.url, {"sort": "price_asc"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -153,3 +164,45 @@ class MateGameInfoListViewTest(APITestCase):
     def test_mate_game_info_list_sort_by_price_desc(self):
         response = self.client.get(self.url, {"sort": "price_desc"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class MateGameInfoListQueryCountTest(APITestCase):
+    # 페이지 크기와 상관없이 한 페이지를 가져오는 데 드는 쿼리 수 상한
+    MAX_QUERIES_PER_PAGE = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user(nickname="orderer", email="orderer@example.com", social_provider="google")
+        self.url = reverse("mate-list")
+
+        for i in range(30):
+            mate = User.objects.create_user(nickname=f"mate{i}", email=f"mate{i}@example.com", social_provider="google")
+            MateGameInfo.objects.create(user_id=mate.id, game_id=1, description="lol", level="챌린저", request_price=500)
+            MateGameInfo.objects.create(user_id=mate.id, game_id=2, description="overwatch", level="챔피언", request_price=700)
+
+            game_request = GameRequest.objects.create(
+                user_id=self.user.id, mate_id=mate.id, game_id=1, price=500, status=True, review_status=True
+            )
+            Review.objects.create(game_request=game_request, rating=4.5, content="good")
+            GameRequest.objects.create(user_id=self.user.id, mate_id=mate.id, game_id=2, price=700)
+
+    def test_mate_list_page_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 30)
+        self.assertLessEqual(len(queries), self.MAX_QUERIES_PER_PAGE)
+
+    def test_mate_list_batched_stats(self):
+        response = self.client.get(self.url)
+
+        mate = response.data["results"][0]
+        game_infos = {game_info["game_id"]: game_info for game_info in mate["mate_game_info"]}
+
+        self.assertEqual(mate["total_request_count"], 2)
+        self.assertEqual(game_infos[1]["review_count"], 1)
+        self.assertEqual(game_infos[1]["average_rating"], 4.5)
+        self.assertEqual(game_infos[1]["game_request_count"], 1)
+        self.assertEqual(game_infos[2]["review_count"], 0)
+        self.assertEqual(game_infos[2]["average_rating"], 0)
+        self.assertEqual(game_infos[2]["game_request_count"], 1)
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from game_requests.models import GameRequest
+from games.models import Game
+from mates.models import MateGameStats, MateStats
+from reviews.models import Review
+from users.models import User
+
+
+class MateStatsManagerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(nickname="user", email="user@example.com", social_provider="google")
+        self.mate = User.objects.create_user(nickname="mate", email="mate@example.com", social_provider="google")
+        self.game = Game.objects.get(id=1)
+
+    def create_game_request(self):
+        return GameRequest.objects.create(user_id=self.user.id, mate_id=self.mate.id, game_id=self.game.id, price=1000)
+
+    def test_create_game_request_increases_request_count(self):
+        self.create_game_request()
+        self.create_game_request()
+
+        self.assertEqual(MateStats.objects.get(user=self.mate).request_count, 2)
+        self.assertEqual(MateGameStats.objects.get(user=self.mate, game=self.game).request_count, 2)
+
+    def test_reject_and_cancel_decrease_request_count(self):
+        GameRequest.objects.reject(self.create_game_request())
+        GameRequest.objects.cancel(self.create_game_request())
+
+        self.assertEqual(MateStats.objects.get(user=self.mate).request_count, 0)
+        self.assertEqual(MateGameStats.objects.get(user=self.mate, game=self.game).request_count, 0)
+
+    def test_add_review_updates_average_rating(self):
+        MateStats.objects.add_review(mate_id=self.mate.id, game_id=self.game.id, rating=5.0)
+        MateStats.objects.add_review(mate_id=self.mate.id, game_id=self.game.id, rating=2.0)
+
+        mate_stats = MateStats.objects.get(user=self.mate)
+        self.assertEqual(mate_stats.review_count, 2)
+        self.assertEqual(mate_stats.rating_sum, 7.0)
+        self.assertEqual(mate_stats.average_rating, 3.5)
+
+    def test_delete_reviewed_game_request_removes_review(self):
+        for rating in (5.0, 2.0):
+            game_request = self.create_game_request()
+            Review.objects.create(game_request=game_request, rating=rating, content="good")
+            MateStats.objects.add_review(mate_id=self.mate.id, game_id=self.game.id, rating=rating)
+
+        GameRequest.objects.cancel(game_request)
+
+        for stats in (MateStats.objects.get(user=self.mate), MateGameStats.objects.get(user=self.mate, game=self.game)):
+            self.assertEqual((stats.request_count, stats.review_count), (1, 1))
+            self.assertEqual((stats.rating_sum, stats.average_rating), (5.0, 5.0))
+
+        # 마지막 리뷰가 빠지면 평균도 0
+        GameRequest.objects.cancel(GameRequest.objects.get(mate=self.mate))
+
+        mate_stats = MateStats.objects.get(user=self.mate)
+        self.assertEqual((mate_stats.review_count, mate_stats.rating_sum, mate_stats.average_rating), (0, 0, 0))
+
+    def test_rebuild_mate_stats_command(self):
+        game_request = self.create_game_request()
+        Review.objects.create(game_request=game_request, rating=4.0, content="good")
+        self.create_game_request()
+        MateStats.objects.all().update(request_count=100, review_count=0, average_rating=0)
+
+        call_command("rebuild_mate_stats", stdout=StringIO())
+
+        mate_stats = MateStats.objects.get(user=self.mate)
+        self.assertEqual(mate_stats.request_count, 2)
+        self.assertEqual(mate_stats.review_count, 1)
+        self.assertEqual(mate_stats.average_rating, 4.0)
+        self.assertEqual(MateGameStats.objects.get(user=self.mate, game=self.game).request_count, 2)
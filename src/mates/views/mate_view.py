@@ -1,22 +1,12 @@
 from multiprocessing import Value
 
 from django.core.exceptions import ValidationError
-from django.db.models import (
-    Avg,
-    BooleanField,
-    Case,
-    FloatField,
-    IntegerField,
-    OuterRef,
-    Subquery,
-    When,
-)
+from django.db.models import F
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from game_requests.models import GameRequest
 from mates.exceptions import InvalidLevelError
 from mates.models import MateGameInfo
 from mates.serializers.mate_serializer import RegisterMateSerializer
@@ -82,28 +72,8 @@ class MateGameInfoListView(generics.ListAPIView):
             queryset = queryset.order_by("-mategameinfo__created_at")
 
         elif sort == "rating_desc":
-            # 서브쿼리를 통해 평균 평점 계산
-            avg_rating_subquery = (
-                GameRequest.objects.filter(mate=OuterRef("pk"), review__isnull=False)
-                .values("mate")
-                .annotate(avg_rating=Avg("review__rating"))
-                .values("avg_rating")
-            )
-
-            # 평균 평점에 따른 정렬 처리
-            queryset = (
-                queryset.annotate(
-                    avg_rating=Subquery(avg_rating_subquery[:1]),
-                )
-                .annotate(
-                    avg_rating=Case(
-                        When(avg_rating__isnull=True, then=0),  # 평균 평점이 없으면 0으로 설정
-                        default="avg_rating",
-                        output_field=FloatField(),
-                    )
-                )
-                .order_by("-avg_rating")
-            )
+            # 집계 테이블(mate_stats)의 평균 평점 인덱스로 정렬, 리뷰가 없는 메이트는 뒤로
+            queryset = queryset.order_by(F("mate_stats__average_rating").desc(nulls_last=True))
 
         elif sort == "price_asc":
             queryset = queryset.order_by("mategameinfo__request_price")
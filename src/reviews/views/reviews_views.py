@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import status
 from rest_framework.generics import ListCreateAPIView
 from rest_framework.permissions import IsAuthenticated
@@ -5,6 +6,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from game_requests.models import GameRequest
+from mates.models import MateStats
 from reviews.models import Review
 from reviews.serializers.serializers import (
     AllReviewSerializer,
@@ -50,11 +52,15 @@ class GameReviewCreateAPIView(APIView):
         # 시리얼라이저 인스턴스 생성
         serializer = AllReviewSerializer(data=data, context={"request": request})
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                review = serializer.save()
 
-            # 리뷰 작성 후 `review_status`를 True로 업데이트합니다.
-            game_request.review_status = True
-            game_request.save(update_fields=["review_status"])
+                # 리뷰 작성 후 `review_status`를 True로 업데이트합니다.
+                game_request.review_status = True
+                game_request.save(update_fields=["review_status"])
+
+                # 메이트 평점 집계 테이블 갱신
+                MateStats.objects.add_review(mate_id=game_request.mate_id, game_id=game_request.game_id, rating=review.rating)
 
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
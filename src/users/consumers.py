@@ -1,50 +1,155 @@
-from asgiref.sync import sync_to_async
-from channels.generic.websocket import AsyncWebsocketConsumer
-from django_redis import get_redis_connection
+import asyncio
+import logging
+import random
+import uuid
 
-from users.exceptions import (
-    InvalidAuthorizationHeader,
-    MissingAuthorizationHeader,
-    TokenMissing,
-    UserNotFound,
-)
-from users.services.user_service import UserService
+import redis
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
 
+from users.services.presence_service import PresenceService
 
-class StatusConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger("channels")
 
-    async def connect(self):
-        self.redis_instance = await sync_to_async(get_redis_connection)("default")
 
-        access_token = self.scope["query_string"].decode("utf-8").split("token=")[-1]
+class StatusConsumer(AsyncJsonWebsocketConsumer):
+    """
+    연결되어 있는 동안 사용자를 온라인으로 유지하고, 구독한 사용자들의 접속 상태 변경을 보냄
 
-        try:
-            self.user = await self.get_user_from_access_token(access_token)
+    {"type": "subscribe", "user_ids": [1, 2]} -> {"type": "presence", "statuses": {"1": true, "2": false}} (현재 상태)
+    이후 구독한 사용자의 상태가 바뀌면 PRESENCE_DELTA_INTERVAL 동안 모아서 바뀐 사용자만 같은 형식으로 보냄
+    {"type": "unsubscribe", "user_ids": [1]} 로 구독 해제
+    """
 
-            if not self.user.is_authenticated:
-                await self.close()
+    async def connect(self):
+        self.connection_id = uuid.uuid4().hex
+        self.heartbeat_task = None
+        self.flush_task = None
+        self.subscribed_user_ids = set()
+        # 이 웹소켓에 마지막으로 보낸 상태와 아직 보내지 않은 변경분 (user_id -> 온라인 여부)
+        self.sent_statuses = {}
+        self.pending_statuses = {}
 
-        except (MissingAuthorizationHeader, InvalidAuthorizationHeader, TokenMissing, UserNotFound):
-            await self.close()
+        # 토큰 검증은 JWTAuthMiddleware 에서 하고, 실패하면 consumer 까지 오지 않음
+        self.user = self.scope["user"]
 
-        await self.update_user_status(self.user, True)
+        # 첫 번째 연결일 때만 오프라인 -> 온라인으로 바뀐 것
+        if await PresenceService.connect(self.user.id, self.connection_id) == 1:
+            await self.publish_status(True)
+        self.heartbeat_task = asyncio.create_task(self.send_heartbeats())
 
         await self.accept()
 
     async def disconnect(self, close_code):
-        if hasattr(self, "user") and self.user.is_authenticated:
-            await self.delete_user_status(self.user)
+        for task in (getattr(self, "heartbeat_task", None), getattr(self, "flush_task", None)):
+            if task:
+                task.cancel()
+
+        if getattr(self, "subscribed_user_ids", None):
+            await self.unsubscribe(list(self.subscribed_user_ids))
+
+        if hasattr(self, "user"):
+            # 다른 탭 / 기기의 연결이 남아 있으면 계속 온라인
+            if await PresenceService.disconnect(self.user.id, self.connection_id) == 0:
+                await self.publish_status(False)
+
+    async def receive_json(self, content):
+        message_type = content.get("type")
+        user_ids = content.get("user_ids")
+
+        if message_type not in ("subscribe", "unsubscribe"):
+            await self.send_json({"error": "type 은 subscribe 또는 unsubscribe 이어야 합니다."})
+            return
+
+        if not isinstance(user_ids, list) or not all(type(user_id) is int for user_id in user_ids):
+            await self.send_json({"error": "user_ids 는 사용자 id 목록이어야 합니다."})
+            return
+
+        if message_type == "subscribe":
+            await self.subscribe(user_ids)
+        else:
+            await self.unsubscribe(user_ids)
+
+    async def subscribe(self, user_ids):
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self.subscribed_user_ids]
+
+        if len(self.subscribed_user_ids) + len(user_ids) > settings.PRESENCE_MAX_SUBSCRIPTIONS:
+            await self.send_json({"error": f"접속 상태는 {settings.PRESENCE_MAX_SUBSCRIPTIONS}명까지 구독할 수 있습니다."})
+            return
+
+        if not user_ids:
+            return
+
+        self.subscribed_user_ids.update(user_ids)
+        await asyncio.gather(
+            *(self.channel_layer.group_add(PresenceService.get_group_name(user_id), self.channel_name) for user_id in user_ids)
+        )
 
-        await self.close()
+        # 그룹에 들어간 뒤에 현재 상태를 읽으므로 그 사이에 바뀐 상태는 presence_update 로 다시 들어옴
+        statuses = await PresenceService.aget_online_statuses(user_ids)
+        self.sent_statuses.update(statuses)
+        await self.send_statuses(statuses)
 
-    @sync_to_async
-    def get_user_from_access_token(self, access_token):
-        return UserService.get_user_from_access_token(access_token)
+    async def unsubscribe(self, user_ids):
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id in self.subscribed_user_ids]
 
-    @sync_to_async
-    def update_user_status(self, user, status):
-        self.redis_instance.set(f"user:{user.id}:is_online", str(status))
+        for user_id in user_ids:
+            self.subscribed_user_ids.discard(user_id)
+            self.sent_statuses.pop(user_id, None)
+            self.pending_statuses.pop(user_id, None)
 
-    @sync_to_async
-    def delete_user_status(self, user):
-        self.redis_instance.delete(f"user:{user.id}:is_online")
+        await asyncio.gather(
+            *(self.channel_layer.group_discard(PresenceService.get_group_name(user_id), self.channel_name) for user_id in user_ids)
+        )
+
+    async def presence_update(self, event):
+        if event["user_id"] not in self.subscribed_user_ids:
+            return
+
+        self.queue_statuses({event["user_id"]: event["is_online"]})
+
+    def queue_statuses(self, statuses):
+        # 같은 사용자의 변경은 마지막 상태만 남기고, PRESENCE_DELTA_INTERVAL 에 한 번만 보냄
+        self.pending_statuses.update(statuses)
+
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush_statuses())
+
+    async def flush_statuses(self):
+        await asyncio.sleep(settings.PRESENCE_DELTA_INTERVAL)
+
+        pending_statuses, self.pending_statuses = self.pending_statuses, {}
+        # 온라인 -> 오프라인 -> 온라인 처럼 결국 보낸 상태와 같아진 사용자는 보내지 않음
+        statuses = {
+            user_id: is_online
+            for user_id, is_online in pending_statuses.items()
+            if user_id in self.subscribed_user_ids and self.sent_statuses.get(user_id) != is_online
+        }
+
+        if statuses:
+            self.sent_statuses.update(statuses)
+            await self.send_statuses(statuses)
+
+    async def send_statuses(self, statuses):
+        await self.send_json({"type": "presence", "statuses": statuses})
+
+    async def send_heartbeats(self):
+        # 여러 연결의 heartbeat 가 한꺼번에 몰리지 않도록 주기를 조금씩 흩뜨림
+        while True:
+            await asyncio.sleep(settings.PRESENCE_HEARTBEAT_INTERVAL * random.uniform(0.8, 1.0))
+            try:
+                await PresenceService.heartbeat(self.user.id, self.connection_id)
+
+                # heartbeat 가 끊겨 만료된 사용자는 알림이 오지 않으므로 구독 중인 상태를 주기적으로 다시 읽어서 맞춤
+                if self.subscribed_user_ids:
+                    self.queue_statuses(await PresenceService.aget_online_statuses(list(self.subscribed_user_ids)))
+            except redis.RedisError as e:
+                # 한 번 실패해도 PRESENCE_TTL 안에 다음 heartbeat 가 성공하면 온라인 유지
+                logger.error(f"Redis error in send_heartbeats: {str(e)}")
+
+    async def publish_status(self, is_online):
+        try:
+            await PresenceService.publish_status(self.user.id, is_online)
+        except redis.RedisError as e:
+            # 알림을 놓친 구독자는 다음 heartbeat 때 상태를 다시 읽어서 맞춤
+            logger.error(f"Redis error in publish_status: {str(e)}")
@@ -0,0 +1,114 @@
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from redis import Redis
+
+from config.redis_pools import get_redis
+from users.models import User
+from users.serializers.user_serializer import UserProfileSerializer
+from users.services.presence_service import UPDATE_PRESENCE_SCRIPT, PresenceService
+
+BENCHMARK_USER_ID_OFFSET = 10**9  # 실제 사용자 키와 겹치지 않도록 큰 id 사용
+
+
+class Command(BaseCommand):
+    help = (
+        "사용자 목록 직렬화 시 is_online 조회에 드는 Redis 왕복 횟수를 개별 GET 방식과 MGET 방식으로 비교하고, "
+        "동시 연결 수만큼 연결 / heartbeat / 전체 조회 / 연결 해제에 드는 시간과 메모리를 측정합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[30, 100])
+        parser.add_argument("--connections", type=int, default=100000, help="동시 웹소켓 연결 수 (사용자 2명 중 1명은 탭 2개)")
+        parser.add_argument("--pipeline-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.measure_serializers(options["sizes"])
+        self.measure_connections(options["connections"], options["pipeline_size"])
+
+    def measure_serializers(self, sizes):
+        redis_instance = get_redis("presence")
+
+        for size in sizes:
+            users = [User(id=BENCHMARK_USER_ID_OFFSET + i, nickname=f"bench{i}") for i in range(size)]
+            keys = [PresenceService.get_key(user.id) for user in users]
+            redis_instance.mset({key: "True" for key in keys[::2]})
+
+            try:
+                per_row = self.measure(lambda: [UserProfileSerializer(user).data for user in users])
+                batched = self.measure(lambda: UserProfileSerializer(users, many=True).data)
+            finally:
+                redis_instance.delete(*keys)
+
+            self.stdout.write(
+                f"users={size:<5} "
+                f"per-row: {per_row['round_trips']} round trips, {per_row['elapsed_ms']:.2f} ms | "
+                f"batched: {batched['round_trips']} round trips, {batched['elapsed_ms']:.2f} ms"
+            )
+
+    def measure_connections(self, count, pipeline_size):
+        redis_instance = get_redis("presence")
+        script = redis_instance.register_script(UPDATE_PRESENCE_SCRIPT)
+        # 연결 id, 사용자 id
+        connections = [(f"bench{i}", BENCHMARK_USER_ID_OFFSET + i * 2 // 3) for i in range(count)]
+        user_ids = list(dict.fromkeys(user_id for _, user_id in connections))
+        used_memory = redis_instance.info("memory")["used_memory"]
+
+        def run_script(ttl):
+            started_at = time.perf_counter()
+            for i in range(0, count, pipeline_size):
+                pipeline = redis_instance.pipeline(transaction=False)
+                for connection_id, user_id in connections[i : i + pipeline_size]:
+                    script(client=pipeline, **PresenceService.get_script_args(user_id, connection_id, ttl))
+                pipeline.execute()
+            return time.perf_counter() - started_at
+
+        try:
+            connect_elapsed = run_script(settings.PRESENCE_TTL)
+            memory = redis_instance.info("memory")["used_memory"] - used_memory
+            heartbeat_elapsed = run_script(settings.PRESENCE_TTL)
+
+            started_at = time.perf_counter()
+            statuses = PresenceService.get_online_statuses(user_ids)
+            bulk_elapsed = time.perf_counter() - started_at
+            online = sum(statuses.values())
+
+            disconnect_elapsed = run_script(0)
+            offline = not any(PresenceService.get_online_statuses(user_ids).values())
+        finally:
+            for i in range(0, len(user_ids), pipeline_size):
+                redis_instance.delete(
+                    *[
+                        key
+                        for user_id in user_ids[i : i + pipeline_size]
+                        for key in (PresenceService.get_key(user_id), PresenceService.get_connections_key(user_id))
+                    ]
+                )
+
+        self.stdout.write(f"connections={count} users={len(user_ids)} online={online} all offline after disconnect={offline}")
+        self.stdout.write(f"connect:    {count / connect_elapsed:.0f} ops/sec ({memory / count:.0f} bytes/connection)")
+        self.stdout.write(
+            f"heartbeat:  {count / heartbeat_elapsed:.0f} ops/sec "
+            f"(interval {settings.PRESENCE_HEARTBEAT_INTERVAL}s -> {count / settings.PRESENCE_HEARTBEAT_INTERVAL:.0f} ops/sec needed)"
+        )
+        self.stdout.write(f"bulk read:  {bulk_elapsed * 1000:.2f} ms for {len(user_ids)} users")
+        self.stdout.write(f"disconnect: {count / disconnect_elapsed:.0f} ops/sec")
+
+    @staticmethod
+    def measure(func):
+        round_trips = 0
+        execute_command = Redis.execute_command
+
+        def counting_execute_command(self, *args, **options):
+            nonlocal round_trips
+            round_trips += 1
+            return execute_command(self, *args, **options)
+
+        with patch.object(Redis, "execute_command", counting_execute_command):
+            started_at = time.perf_counter()
+            func()
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+        return {"round_trips": round_trips, "elapsed_ms": elapsed_ms}
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db.backends.utils import CursorWrapper
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.redis_pools import get_redis
+from users.middleware import JWTAuthMiddleware, ScopeUser
+from users.models import User
+from users.services.presence_service import PresenceService
+from users.services.user_cache_service import UserCacheService, local_user_cache
+from users.urls import user_status_urlpatterns
+
+
+class DatabaseAuthMiddleware(JWTAuthMiddleware):
+    # 변경 전처럼 연결마다 DB 에서 사용자를 읽는 방식 (비교용)
+    async def get_user(self, scope):
+        user = await sync_to_async(User.objects.get_user_by_id)(AccessToken(self.get_token(scope))["user_id"])
+        return ScopeUser(user.id, user.nickname)
+
+
+class Command(BaseCommand):
+    help = "ws/status/ 웹소켓 연결(인증 + StatusConsumer 연결 / 해제)의 초당 처리 수와 연결당 DB 쿼리 수를 측정합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--connects", type=int, default=10000)
+        parser.add_argument("--concurrency", type=int, default=100)
+
+    def handle(self, *args, **options):
+        users = User.objects.bulk_create(
+            [User(nickname=f"bench_ws{i}", email=f"bench_ws{i}@example.com", social_provider="google") for i in range(options["users"])]
+        )
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+
+        try:
+            self.clear_cache(users)
+            scenarios = [
+                ("db lookup (before)", DatabaseAuthMiddleware, tokens),
+                ("middleware, cold cache", JWTAuthMiddleware, tokens),
+                ("middleware, warm cache", JWTAuthMiddleware, tokens),
+                ("middleware, rejected", JWTAuthMiddleware, ["invalid"]),
+            ]
+
+            for name, middleware, scenario_tokens in scenarios:
+                result = asyncio.run(self.run(middleware, scenario_tokens, options["connects"], options["concurrency"]))
+                self.stdout.write(
+                    f"{name:<24} {result['connects_per_sec']:>8.0f} connects/sec ({result['connects_per_sec'] * 60:>9.0f}/min) "
+                    f"db_queries/connect={result['queries'] / options['connects']:.3f} rejected={result['rejected']}"
+                )
+        finally:
+            self.clear_cache(users)
+            redis_instance = get_redis("presence")
+            redis_instance.delete(*[PresenceService.get_connections_key(user.id) for user in users])
+            redis_instance.delete(*[PresenceService.get_key(user.id) for user in users])
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    @staticmethod
+    def clear_cache(users):
+        local_user_cache.clear()
+        get_redis("cache").delete(*[UserCacheService.get_key(user.id) for user in users])
+
+    async def run(self, middleware, tokens, connects, concurrency):
+        application = middleware(URLRouter(user_status_urlpatterns))
+        counts = {"queries": 0, "rejected": 0}
+        semaphore = asyncio.Semaphore(concurrency)
+        execute = CursorWrapper.execute
+
+        def counting_execute(cursor, sql, params=None):
+            counts["queries"] += 1
+            return execute(cursor, sql, params)
+
+        async def connect(token):
+            async with semaphore:
+                communicator = WebsocketCommunicator(application, f"/ws/status/?token={token}")
+                connected, _ = await communicator.connect(timeout=10)
+                if connected:
+                    await communicator.disconnect()
+                else:
+                    counts["rejected"] += 1
+
+        with mock.patch.object(CursorWrapper, "execute", counting_execute):
+            started_at = time.perf_counter()
+            await asyncio.gather(*(connect(tokens[i % len(tokens)]) for i in range(connects)))
+            elapsed = time.perf_counter() - started_at
+
+        return {"connects_per_sec": connects / elapsed, **counts}
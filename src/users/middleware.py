@@ -0,0 +1,90 @@
+import logging
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.exceptions import UserNotFound
+from users.services.user_cache_service import UserCacheService
+
+logger = logging.getLogger("channels")
+
+# 인증에 실패한 웹소켓 연결을 닫을 때 쓰는 코드 (accept 전이므로 클라이언트는 403 응답을 받음)
+WEBSOCKET_UNAUTHORIZED_CLOSE_CODE = 4401
+
+
+class ScopeUser:
+    """
+    웹소켓 scope["user"] 에 넣는 가벼운 사용자 (consumer 는 id 와 nickname 만 씀)
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    __slots__ = ("id", "nickname")
+
+    def __init__(self, id, nickname):
+        self.id = id
+        self.nickname = nickname
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.nickname
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    ws://.../?token=<access token> 의 토큰을 연결마다 한 번 검증하고 scope["user"] 에 ScopeUser 를 넣음
+    토큰이 없거나 유효하지 않으면 consumer 를 만들지 않고 바로 연결을 거절하므로 DB / Redis 작업이 없음
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "websocket":
+            return await super().__call__(scope, receive, send)
+
+        user = await self.get_user(scope)
+
+        if user is None:
+            return await self.reject(receive, send)
+
+        return await super().__call__(dict(scope, user=user), receive, send)
+
+    @staticmethod
+    def get_token(scope):
+        tokens = parse_qs(scope.get("query_string", b"").decode("utf-8")).get("token")
+
+        return tokens[-1] if tokens else None
+
+    async def get_user(self, scope):
+        access_token = self.get_token(scope)
+
+        if not access_token:
+            return None
+
+        try:
+            user_id = AccessToken(access_token)[api_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return None
+
+        try:
+            user = await UserCacheService.aget_user(user_id)
+        except UserNotFound:
+            return None
+
+        if not user.is_active:
+            return None
+
+        return ScopeUser(user.id, user.nickname)
+
+    @staticmethod
+    async def reject(receive, send):
+        # accept 전에 close 를 보내면 핸드셰이크가 거절됨
+        message = await receive()
+
+        if message["type"] == "websocket.connect":
+            await send({"type": "websocket.close", "code": WEBSOCKET_UNAUTHORIZED_CLOSE_CODE})
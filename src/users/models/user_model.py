@@ -32,6 +32,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         null=True,
         blank=True,
     )
+    # 실제 접속 상태는 PresenceService (Redis) 에서 읽음, 이 필드는 API 응답에 쓰지 않음
     is_online = models.BooleanField(default=True)
     is_mate = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -0,0 +1,34 @@
+from django.db import models
+from rest_framework import serializers
+
+from users.services.presence_service import PresenceService
+
+
+class PresenceListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # 페이지에 포함된 사용자들의 접속 상태를 한 번에 조회해서 context 로 넘김
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+
+        if "online_statuses" not in self.context:
+            self.context["online_statuses"] = PresenceService.get_online_statuses([self.child.get_presence_user_id(item) for item in items])
+
+        return super().to_representation(items)
+
+
+class PresenceSerializerMixin:
+    """
+    접속 상태는 User.is_online (DB) 이 아니라 PresenceService 에서 읽음
+    many=True 로 쓰면 PresenceListSerializer 가 미리 조회한 online_statuses 를, 아니면 한 명만 조회함
+    """
+
+    def get_presence_user_id(self, obj):
+        return obj.id
+
+    def get_online_status(self, obj):
+        user_id = self.get_presence_user_id(obj)
+        online_statuses = self.context.get("online_statuses")
+
+        if online_statuses is not None:
+            return online_statuses.get(user_id, False)
+
+        return PresenceService.is_online(user_id)
@@ -1,12 +1,17 @@
-from django_redis import get_redis_connection
+from django.db import models
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
 from game_requests.models import GameRequest
 from mates.serializers.mate_serializer import MateGameInfoSerializer
 from users.models import User
+from users.serializers.presence_serializer import (
+    PresenceListSerializer,
+    PresenceSerializerMixin,
+)
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(PresenceSerializerMixin, serializers.ModelSerializer):
     is_online = serializers.SerializerMethodField()
 
     class Meta:
@@ -32,19 +37,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "social_provider",
             "is_mate",
         ]
+        list_serializer_class = PresenceListSerializer
 
     def get_is_online(self, user):
-        redis_instance = get_redis_connection("default")
+        return self.get_online_status(user)
 
-        is_online = redis_instance.get(f"user:{user.id}:is_online")
 
-        if not is_online:
-            return False
+class UserMateListSerializer(PresenceListSerializer):
+    def to_representation(self, data):
+        # 페이지에 포함된 메이트들의 통계를 한 번에 집계해서 context 로 넘김
+        users = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
 
-        return is_online.decode("utf-8").lower() == "true"
+        if "mate_stats" not in self.context:
+            prefetch_related_objects(users, "mategameinfo_set")
+            self.context["mate_stats"] = GameRequest.objects.get_mate_stats([user.id for user in users])
 
+        return super().to_representation(users)
 
-class UserMateSerializer(serializers.ModelSerializer):
+
+class UserMateSerializer(PresenceSerializerMixin, serializers.ModelSerializer):
     mate_game_info = serializers.SerializerMethodField()
     is_online = serializers.SerializerMethodField()
     total_request_count = serializers.SerializerMethodField()
@@ -71,20 +82,29 @@ class UserMateSerializer(serializers.ModelSerializer):
             "social_provider",
             "is_mate",
         ]
+        list_serializer_class = UserMateListSerializer
+
+    def get_mate_stats(self, obj):
+        mate_stats = self.context.get("mate_stats")
+
+        if mate_stats is None:
+            return None
+
+        return mate_stats.get(obj.id, {"total_request_count": 0, "games": {}})
 
     def get_mate_game_info(self, obj):
         mate_game_info = obj.mategameinfo_set.all()
-        return MateGameInfoSerializer(mate_game_info, many=True, context={"mate_id": obj.id}).data
+        mate_stats = self.get_mate_stats(obj)
+        context = {"mate_id": obj.id, "game_stats": mate_stats["games"] if mate_stats is not None else None}
+        return MateGameInfoSerializer(mate_game_info, many=True, context=context).data
 
     def get_total_request_count(self, obj):
-        return GameRequest.objects.get_game_request_total_count(mate_id=obj.id)
+        mate_stats = self.get_mate_stats(obj)
 
-    def get_is_online(self, user):
-        redis_instance = get_redis_connection("default")
-
-        is_online = redis_instance.get(f"user:{user.id}:is_online")
+        if mate_stats is not None:
+            return mate_stats["total_request_count"]
 
-        if not is_online:
-            return False
+        return GameRequest.objects.get_game_request_total_count(mate_id=obj.id)
 
-        return is_online.decode("utf-8").lower() == "true"
+    def get_is_online(self, user):
+        return self.get_online_status(user)
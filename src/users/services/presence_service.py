@@ -0,0 +1,162 @@
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from config.redis_pools import get_async_redis, get_redis
+
+# 사용자 하나가 여러 탭 / 기기로 접속할 수 있으므로 접속(웹소켓 연결)마다 만료 시각을 따로 관리함
+# presence:{user_id} zset (연결 id -> 만료 시각 ms) 의 살아있는 연결 수가 곧 참조 카운트
+# user:{user_id}:is_online 은 읽기용 key 로, 가장 늦게 만료되는 연결의 만료 시각에 같이 만료됨
+# -> 프로세스가 죽어서 disconnect 를 못 하더라도 heartbeat 가 끊기면 PRESENCE_TTL 뒤에 오프라인이 됨
+
+# KEYS: 연결 zset, 접속 상태 key
+# ARGV: 연결 id (비어 있으면 만료된 연결 정리만 함), 현재 시각 ms, 연결 만료 시각 ms (0 이면 연결 제거)
+# 남은 연결 수 반환
+UPDATE_PRESENCE_SCRIPT = """
+local now = tonumber(ARGV[2])
+local expires_at = tonumber(ARGV[3])
+
+if ARGV[1] ~= '' then
+    if expires_at > 0 then
+        redis.call('ZADD', KEYS[1], expires_at, ARGV[1])
+    else
+        redis.call('ZREM', KEYS[1], ARGV[1])
+    end
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+
+local latest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+if #latest == 0 then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return 0
+end
+
+redis.call('PEXPIREAT', KEYS[1], latest[2])
+redis.call('SET', KEYS[2], 'True', 'PXAT', latest[2])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+
+class PresenceService:
+    @staticmethod
+    def get_key(user_id):
+        return f"user:{user_id}:is_online"
+
+    @staticmethod
+    def get_connections_key(user_id):
+        return f"presence:{user_id}"
+
+    @staticmethod
+    def get_group_name(user_id):
+        # 이 사용자의 접속 상태를 구독하는 웹소켓들의 채널 그룹
+        return f"presence_{user_id}"
+
+    @staticmethod
+    def parse_status(value):
+        if not value:
+            return False
+
+        return value.decode("utf-8").lower() == "true"
+
+    @staticmethod
+    def get_script_args(user_id, connection_id, ttl):
+        now_ms = int(time.time() * 1000)
+        expires_at = now_ms + ttl * 1000 if ttl else 0
+
+        return {
+            "keys": [PresenceService.get_connections_key(user_id), PresenceService.get_key(user_id)],
+            "args": [connection_id or "", now_ms, expires_at],
+        }
+
+    @staticmethod
+    async def connect(user_id, connection_id):
+        """
+        연결을 추가하고 사용자의 연결 수 반환, 이후 PRESENCE_HEARTBEAT_INTERVAL 마다 heartbeat 를 보내야 온라인으로 유지됨
+        """
+        script = get_async_redis("presence").register_script(UPDATE_PRESENCE_SCRIPT)
+
+        return await script(**PresenceService.get_script_args(user_id, connection_id, settings.PRESENCE_TTL))
+
+    @staticmethod
+    async def heartbeat(user_id, connection_id):
+        # 연결의 만료 시각을 늘림 (연결 추가와 같은 동작)
+        return await PresenceService.connect(user_id, connection_id)
+
+    @staticmethod
+    async def disconnect(user_id, connection_id):
+        """
+        연결을 제거하고 남은 연결 수 반환, 0 이 되면 오프라인
+        """
+        script = get_async_redis("presence").register_script(UPDATE_PRESENCE_SCRIPT)
+
+        return await script(**PresenceService.get_script_args(user_id, connection_id, 0))
+
+    @staticmethod
+    def get_connection_count(user_id):
+        # 만료된 연결을 정리한 뒤 살아있는 연결 수 반환
+        script = get_redis("presence").register_script(UPDATE_PRESENCE_SCRIPT)
+
+        return script(**PresenceService.get_script_args(user_id, None, 0))
+
+    @staticmethod
+    def is_online(user_id):
+        redis_instance = get_redis("presence")
+
+        return PresenceService.parse_status(redis_instance.get(PresenceService.get_key(user_id)))
+
+    @staticmethod
+    def get_key_chunks(user_ids):
+        keys = [PresenceService.get_key(user_id) for user_id in user_ids]
+        chunk_size = settings.PRESENCE_BULK_CHUNK_SIZE
+
+        return [keys[i : i + chunk_size] for i in range(0, len(keys), chunk_size)]
+
+    @staticmethod
+    def get_online_statuses(user_ids):
+        """
+        여러 사용자의 접속 상태를 {user_id: bool} 로 반환
+        PRESENCE_BULK_CHUNK_SIZE 개씩 나눈 MGET 을 pipeline 으로 묶어서 사용자 수와 관계없이 Redis 왕복 한 번으로 조회
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+
+        if not user_ids:
+            return {}
+
+        redis_instance = get_redis("presence")
+        key_chunks = PresenceService.get_key_chunks(user_ids)
+
+        if len(key_chunks) == 1:
+            values = redis_instance.mget(key_chunks[0])
+        else:
+            pipeline = redis_instance.pipeline(transaction=False)
+            for keys in key_chunks:
+                pipeline.mget(keys)
+            values = [value for chunk in pipeline.execute() for value in chunk]
+
+        return {user_id: PresenceService.parse_status(value) for user_id, value in zip(user_ids, values)}
+
+    @staticmethod
+    async def aget_online_statuses(user_ids):
+        # get_online_statuses 의 async 버전 (웹소켓 consumer 용)
+        user_ids = list(dict.fromkeys(user_ids))
+
+        if not user_ids:
+            return {}
+
+        pipeline = get_async_redis("presence").pipeline(transaction=False)
+        for keys in PresenceService.get_key_chunks(user_ids):
+            pipeline.mget(keys)
+        values = [value for chunk in await pipeline.execute() for value in chunk]
+
+        return {user_id: PresenceService.parse_status(value) for user_id, value in zip(user_ids, values)}
+
+    @staticmethod
+    async def publish_status(user_id, is_online):
+        """
+        접속 상태가 바뀌었음을 구독 중인 웹소켓들에 알림 (StatusConsumer.presence_update 에서 받음)
+        """
+        await get_channel_layer().group_send(
+            PresenceService.get_group_name(user_id),
+            {"type": "presence_update", "user_id": user_id, "is_online": is_online},
+        )
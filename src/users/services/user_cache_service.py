@@ -0,0 +1,161 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from config.redis_pools import get_async_redis, get_redis
+from users.models.user_model import User
+
+logger = logging.getLogger(__name__)
+
+# 캐시에 두는 필드 (인증과 대부분의 view 가 쓰는 값만, 비밀번호 hash 등은 Redis 에 두지 않음)
+USER_CACHE_FIELDS = ("id", "nickname", "email", "social_provider", "is_mate", "is_active", "is_staff", "is_superuser")
+
+
+class LocalUserCache:
+    """
+    프로세스 안에서만 쓰는 LRU (user_id -> (json 으로 직렬화한 User 필드, 만료 시각))
+    USER_CACHE_LOCAL_MAX_SIZE 개를 넘으면 가장 오래 안 쓴 사용자부터 버림
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+
+            if entry is None:
+                return None
+
+            if entry[1] < time.monotonic():
+                del self.entries[user_id]
+                return None
+
+            self.entries.move_to_end(user_id)
+            return entry[0]
+
+    def set(self, user_id, data):
+        with self.lock:
+            self.entries[user_id] = (data, time.monotonic() + settings.USER_CACHE_LOCAL_TTL)
+            self.entries.move_to_end(user_id)
+
+            while len(self.entries) > settings.USER_CACHE_LOCAL_MAX_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_user_cache = LocalUserCache()
+
+
+class UserCacheService:
+    """
+    토큰의 user_id 로 User 를 찾을 때 프로세스 LRU -> Redis ("cache" 연결) -> DB 순서로 조회
+    배포 직후처럼 프로세스 LRU 가 비어 있어도 Redis 에서 찾으므로 재접속이 몰려도 DB 조회는 늘지 않음
+    User 가 저장 / 삭제되거나 refresh token 이 blacklist 되면 invalidate (users/signals.py)
+    다른 프로세스의 LRU 에는 최대 USER_CACHE_LOCAL_TTL 초 동안 이전 값이 남을 수 있음
+    """
+
+    @staticmethod
+    def get_key(user_id):
+        return f"auth_user:{user_id}"
+
+    @staticmethod
+    def dump(user):
+        return json.dumps({name: getattr(user, name) for name in USER_CACHE_FIELDS}).encode("utf-8")
+
+    @staticmethod
+    def load(data):
+        """
+        캐시한 필드만 채운 User 를 만듦, 나머지 필드는 deferred 라서 접근하면 DB 에서 읽고,
+        save() 도 캐시한 필드만 UPDATE 함 (호출한 쪽이 수정해도 캐시된 값이 바뀌지 않도록 매번 새 인스턴스)
+        캐시한 값은 최대 USER_CACHE_TTL 초 전의 값이므로 사용자 정보를 수정할 때는 DB 에서 다시 읽어야 함
+        """
+        fields = json.loads(data)
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in fields]
+
+        return User.from_db(DEFAULT_DB_ALIAS, field_names, [fields[name] for name in field_names])
+
+    @staticmethod
+    def get_user(user_id):
+        """
+        캐시한 필드만 채운 User 반환, 없으면 UserNotFound
+        """
+        data = local_user_cache.get(user_id)
+
+        if data is None:
+            try:
+                data = get_redis("cache").get(UserCacheService.get_key(user_id))
+            except redis.RedisError as e:
+                logger.error(f"Redis error in get_user: {str(e)}")
+
+            if data is None:
+                return UserCacheService.set_user(User.objects.get_user_by_id(user_id))
+
+            local_user_cache.set(user_id, data)
+
+        return UserCacheService.load(data)
+
+    @staticmethod
+    async def aget_user(user_id):
+        # get_user 의 async 버전, 캐시에 있으면 DB 스레드 풀을 거치지 않음
+        data = local_user_cache.get(user_id)
+
+        if data is None:
+            try:
+                data = await get_async_redis("cache").get(UserCacheService.get_key(user_id))
+            except redis.RedisError as e:
+                logger.error(f"Redis error in aget_user: {str(e)}")
+
+            if data is None:
+                data = UserCacheService.set_local_user(await database_sync_to_async(User.objects.get_user_by_id)(user_id))
+                try:
+                    await get_async_redis("cache").set(UserCacheService.get_key(user_id), data, ex=settings.USER_CACHE_TTL)
+                except redis.RedisError as e:
+                    logger.error(f"Redis error in aget_user: {str(e)}")
+                return UserCacheService.load(data)
+
+            local_user_cache.set(user_id, data)
+
+        return UserCacheService.load(data)
+
+    @staticmethod
+    def set_local_user(user):
+        data = UserCacheService.dump(user)
+        local_user_cache.set(user.id, data)
+
+        return data
+
+    @staticmethod
+    def set_user(user):
+        data = UserCacheService.set_local_user(user)
+
+        try:
+            get_redis("cache").set(UserCacheService.get_key(user.id), data, ex=settings.USER_CACHE_TTL)
+        except redis.RedisError as e:
+            logger.error(f"Redis error in set_user: {str(e)}")
+
+        return UserCacheService.load(data)
+
+    @staticmethod
+    def invalidate(user_id):
+        local_user_cache.delete(user_id)
+
+        try:
+            get_redis("cache").delete(UserCacheService.get_key(user_id))
+        except redis.RedisError as e:
+            logger.error(f"Redis error in invalidate: {str(e)}")
@@ -7,7 +7,7 @@ from users.exceptions import (
     TokenMissing,
     UserNotFound,
 )
-from users.models.user_model import User
+from users.services.user_cache_service import UserCacheService
 
 
 class UserService:
@@ -28,7 +28,7 @@ class UserService:
             token = AccessToken(access_token)
             user_id = token.get("user_id")
 
-            user = User.objects.get_user_by_id(user_id)
+            user = UserCacheService.get_user(user_id)
 
             return user
 
@@ -41,7 +41,7 @@ class UserService:
             token = AccessToken(access_token)
             user_id = token.get("user_id")
 
-            user = User.objects.get_user_by_id(user_id)
+            user = UserCacheService.get_user(user_id)
 
             return user
 
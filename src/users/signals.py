@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from users.models import User
+from users.services.user_cache_service import UserCacheService
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    # 새로 만든 사용자도 지움 (같은 id 로 캐시된 이전 값이 남아 있을 수 있음)
+    UserCacheService.invalidate(instance.id)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_user_cache_on_blacklist(sender, instance, created, **kwargs):
+    if created and instance.token.user_id is not None:
+        UserCacheService.invalidate(instance.token.user_id)
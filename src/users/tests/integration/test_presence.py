@@ -0,0 +1,191 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.redis_pools import get_redis
+from users.middleware import JWTAuthMiddleware
+from users.models import User
+from users.services.presence_service import PresenceService
+from users.urls import user_status_urlpatterns
+
+TEST_USER_ID_OFFSET = 10**9  # 실제 사용자 key 와 겹치지 않도록 큰 id 사용
+
+
+class PresenceTest(SimpleTestCase):
+    def setUp(self):
+        self.redis_instance = get_redis("presence")
+        self.user_ids = [TEST_USER_ID_OFFSET + i for i in range(5)]
+
+    def tearDown(self):
+        for user_id in self.user_ids:
+            self.redis_instance.delete(PresenceService.get_key(user_id), PresenceService.get_connections_key(user_id))
+
+    def test_online_until_last_connection_closes(self):
+        user_id = self.user_ids[0]
+
+        self.assertEqual(async_to_sync(PresenceService.connect)(user_id, "tab1"), 1)
+        self.assertEqual(async_to_sync(PresenceService.connect)(user_id, "tab2"), 2)
+
+        self.assertEqual(async_to_sync(PresenceService.disconnect)(user_id, "tab1"), 1)
+        self.assertTrue(PresenceService.is_online(user_id))
+
+        self.assertEqual(async_to_sync(PresenceService.disconnect)(user_id, "tab2"), 0)
+        self.assertFalse(PresenceService.is_online(user_id))
+        self.assertFalse(self.redis_instance.exists(PresenceService.get_connections_key(user_id)))
+
+    def test_status_expires_with_connection(self):
+        user_id = self.user_ids[0]
+
+        async_to_sync(PresenceService.connect)(user_id, "tab1")
+
+        ttl = self.redis_instance.pttl(PresenceService.get_key(user_id))
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, settings.PRESENCE_TTL * 1000)
+
+    def test_crashed_connection_does_not_keep_user_online(self):
+        user_id = self.user_ids[0]
+        async_to_sync(PresenceService.connect)(user_id, "crashed")
+        async_to_sync(PresenceService.connect)(user_id, "tab")
+
+        # heartbeat 가 끊긴 연결 (만료 시각이 지남)
+        self.redis_instance.zadd(PresenceService.get_connections_key(user_id), {"crashed": int(time.time() * 1000) - 1})
+
+        self.assertEqual(PresenceService.get_connection_count(user_id), 1)
+        self.assertEqual(async_to_sync(PresenceService.disconnect)(user_id, "tab"), 0)
+        self.assertFalse(PresenceService.is_online(user_id))
+
+    def test_heartbeat_extends_connection(self):
+        user_id = self.user_ids[0]
+        async_to_sync(PresenceService.connect)(user_id, "tab")
+        self.redis_instance.pexpire(PresenceService.get_key(user_id), 10)
+
+        async_to_sync(PresenceService.heartbeat)(user_id, "tab")
+
+        self.assertGreater(self.redis_instance.pttl(PresenceService.get_key(user_id)), 10)
+
+    @override_settings(PRESENCE_BULK_CHUNK_SIZE=2)
+    def test_get_online_statuses_in_chunks(self):
+        for user_id in self.user_ids[::2]:
+            async_to_sync(PresenceService.connect)(user_id, "tab")
+
+        statuses = PresenceService.get_online_statuses(self.user_ids)
+
+        self.assertEqual(statuses, {user_id: i % 2 == 0 for i, user_id in enumerate(self.user_ids)})
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}, PRESENCE_DELTA_INTERVAL=0.05)
+class PresenceSubscriptionTest(TransactionTestCase):
+    # consumer 가 메시지를 처리할 때마다 오래된 DB 연결을 닫으므로 TestCase 의 트랜잭션을 쓸 수 없음
+    serialized_rollback = True
+
+    def setUp(self):
+        channel_layers.backends.clear()
+        self.watcher = User.objects.create_user(nickname="watcher", email="watcher@example.com", social_provider="google")
+        self.mate = User.objects.create_user(nickname="mate", email="mate@example.com", social_provider="google")
+        self.tokens = {user.id: str(AccessToken.for_user(user)) for user in (self.watcher, self.mate)}
+
+    def tearDown(self):
+        channel_layers.backends.clear()
+        for user in (self.watcher, self.mate):
+            get_redis("presence").delete(PresenceService.get_key(user.id), PresenceService.get_connections_key(user.id))
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(
+            JWTAuthMiddleware(URLRouter(user_status_urlpatterns)), f"/ws/status/?token={self.tokens[user.id]}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def subscribe(self, communicator, user_ids):
+        await communicator.send_json_to({"type": "subscribe", "user_ids": user_ids})
+        return await communicator.receive_json_from()
+
+    def test_subscribe_sends_current_statuses(self):
+        async def run():
+            mate = await self.connect(self.mate)
+            watcher = await self.connect(self.watcher)
+
+            response = await self.subscribe(watcher, [self.mate.id, self.watcher.id])
+
+            self.assertEqual(response, {"type": "presence", "statuses": {str(self.mate.id): True, str(self.watcher.id): True}})
+            await watcher.disconnect()
+            await mate.disconnect()
+
+        async_to_sync(run)()
+
+    def test_offline_only_after_last_connection_closes(self):
+        async def run():
+            watcher = await self.connect(self.watcher)
+            self.assertEqual(await self.subscribe(watcher, [self.mate.id]), {"type": "presence", "statuses": {str(self.mate.id): False}})
+
+            tab1 = await self.connect(self.mate)
+            tab2 = await self.connect(self.mate)
+            self.assertEqual(await watcher.receive_json_from(), {"type": "presence", "statuses": {str(self.mate.id): True}})
+
+            await tab1.disconnect()
+            self.assertTrue(await watcher.receive_nothing(0.2))
+
+            await tab2.disconnect()
+            self.assertEqual(await watcher.receive_json_from(), {"type": "presence", "statuses": {str(self.mate.id): False}})
+            await watcher.disconnect()
+
+        async_to_sync(run)()
+
+    @override_settings(PRESENCE_DELTA_INTERVAL=0.5)
+    def test_changes_within_interval_are_coalesced(self):
+        async def run():
+            watcher = await self.connect(self.watcher)
+            await self.subscribe(watcher, [self.mate.id])
+
+            # 온라인 -> 오프라인이 한 간격 안에 일어나면 마지막으로 보낸 상태(오프라인)와 같으므로 보내지 않음
+            mate = await self.connect(self.mate)
+            await mate.disconnect()
+
+            self.assertTrue(await watcher.receive_nothing(0.8))
+            await watcher.disconnect()
+
+        async_to_sync(run)()
+
+    def test_unsubscribe_stops_updates(self):
+        async def run():
+            watcher = await self.connect(self.watcher)
+            await self.subscribe(watcher, [self.mate.id])
+            await watcher.send_json_to({"type": "unsubscribe", "user_ids": [self.mate.id]})
+
+            mate = await self.connect(self.mate)
+
+            self.assertTrue(await watcher.receive_nothing(0.2))
+            await mate.disconnect()
+            await watcher.disconnect()
+
+        async_to_sync(run)()
+
+    @override_settings(PRESENCE_MAX_SUBSCRIPTIONS=1)
+    def test_subscribe_limit(self):
+        async def run():
+            watcher = await self.connect(self.watcher)
+
+            response = await self.subscribe(watcher, [self.mate.id, self.watcher.id])
+
+            self.assertIn("error", response)
+            await watcher.disconnect()
+
+        async_to_sync(run)()
+
+    def test_invalid_message(self):
+        async def run():
+            watcher = await self.connect(self.watcher)
+
+            await watcher.send_json_to({"type": "subscribe", "user_ids": "1,2"})
+
+            self.assertIn("error", await watcher.receive_json_from())
+            await watcher.disconnect()
+
+        async_to_sync(run)()
@@ -5,6 +5,7 @@ from rest_framework.test import APIClient
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from users.models import User
+from users.services.user_cache_service import UserCacheService
 
 
 class UserProfileAPIViewTestCase(TestCase):
@@ -49,6 +50,9 @@ class UserMeAPIViewTestCase(TestCase):
         self.access_token = str(TokenObtainPairSerializer.get_token(self.user).access_token)
         self.url = reverse("user-me")
 
+    def tearDown(self):
+        UserCacheService.invalidate(self.user.id)
+
     def test_get_own_profile(self):
         self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.access_token)
         response = self.client.get(self.url)
@@ -68,6 +72,18 @@ class UserMeAPIViewTestCase(TestCase):
         self.assertEqual(response.data["nickname"], "up")
         self.assertEqual(response.data["description"], "This is an updated description")
 
+    def test_update_profile_with_stale_cached_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.access_token)
+        self.client.get(self.url)
+        # 캐시를 지우지 않는 다른 경로의 수정 (캐시한 User 는 이전 값)
+        User.objects.filter(id=self.user.id).update(description="다른 곳에서 수정")
+
+        response = self.client.patch(self.url, {"nickname": "up"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.nickname, self.user.description), ("up", "다른 곳에서 수정"))
+
     def test_update_profile_invalid_data(self):
         self.client.credentials(HTTP_AUTHORIZATION="Bearer " + self.access_token)
         data = {"email": "invalid_email"}
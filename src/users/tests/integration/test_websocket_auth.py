@@ -0,0 +1,83 @@
+from asgiref.sync import async_to_sync
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from config.redis_pools import get_redis
+from users.middleware import (
+    WEBSOCKET_UNAUTHORIZED_CLOSE_CODE,
+    JWTAuthMiddleware,
+    ScopeUser,
+)
+from users.models import User
+from users.services.user_cache_service import UserCacheService, local_user_cache
+
+
+class ScopeUserConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        await self.accept()
+        user = self.scope["user"]
+        await self.send_json({"type": type(user).__name__, "id": user.id, "nickname": user.nickname})
+
+
+class JWTAuthMiddlewareTest(TransactionTestCase):
+    # 미들웨어가 DB 를 조회할 때 오래된 DB 연결을 닫으므로 TestCase 의 트랜잭션을 쓸 수 없음
+    serialized_rollback = True
+
+    def setUp(self):
+        self.user = User.objects.create_user(nickname="socketuser", email="socket@example.com", social_provider="google")
+        self.application = JWTAuthMiddleware(ScopeUserConsumer.as_asgi())
+
+    def tearDown(self):
+        local_user_cache.clear()
+        get_redis("cache").delete(UserCacheService.get_key(self.user.id))
+
+    def connect(self, query_string):
+        async def run():
+            communicator = WebsocketCommunicator(self.application, f"/ws/test/?{query_string}")
+            connected, code = await communicator.connect()
+            response = await communicator.receive_json_from() if connected else None
+            await communicator.disconnect()
+            return connected, code, response
+
+        return async_to_sync(run)()
+
+    def test_valid_token_puts_scope_user(self):
+        connected, _, response = self.connect(f"token={AccessToken.for_user(self.user)}")
+
+        self.assertTrue(connected)
+        self.assertEqual(response, {"type": ScopeUser.__name__, "id": self.user.id, "nickname": "socketuser"})
+
+    def test_cached_user_needs_no_query(self):
+        token = AccessToken.for_user(self.user)
+        self.connect(f"token={token}")
+
+        with self.assertNumQueries(0):
+            connected, _, _ = self.connect(f"token={token}")
+
+        self.assertTrue(connected)
+
+    def test_rejects_without_query(self):
+        for query_string in ["", "token=", "token=invalid", f"token={RefreshToken.for_user(self.user)}"]:
+            with self.subTest(query_string=query_string[:20]), self.assertNumQueries(0):
+                connected, code, _ = self.connect(query_string)
+
+                self.assertFalse(connected)
+                self.assertEqual(code, WEBSOCKET_UNAUTHORIZED_CLOSE_CODE)
+
+    def test_rejects_deleted_user(self):
+        token = AccessToken.for_user(self.user)
+        self.user.delete()
+
+        connected, _, _ = self.connect(f"token={token}")
+
+        self.assertFalse(connected)
+
+    def test_rejects_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        connected, _, _ = self.connect(f"token={AccessToken.for_user(self.user)}")
+
+        self.assertFalse(connected)
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from users.models.user_model import User
+from users.serializers.user_serializer import UserProfileSerializer
+from users.services.presence_service import PresenceService
+
+
+class PresenceServiceTest(TestCase):
+    @patch("users.services.presence_service.get_redis")
+    def test_get_online_statuses_uses_single_mget(self, mock_redis):
+        mock_redis.return_value.mget.return_value = [b"True", None, b"False"]
+
+        statuses = PresenceService.get_online_statuses([1, 2, 3])
+
+        self.assertEqual(statuses, {1: True, 2: False, 3: False})
+        mock_redis.return_value.mget.assert_called_once_with(["user:1:is_online", "user:2:is_online", "user:3:is_online"])
+        mock_redis.return_value.get.assert_not_called()
+
+    @patch("users.services.presence_service.get_redis")
+    def test_get_online_statuses_empty(self, mock_redis):
+        self.assertEqual(PresenceService.get_online_statuses([]), {})
+        mock_redis.return_value.mget.assert_not_called()
+
+    @patch("users.services.presence_service.get_redis")
+    def test_list_serializer_resolves_page_with_one_round_trip(self, mock_redis):
+        users = [User(id=i, nickname=f"user{i}") for i in range(1, 31)]
+        mock_redis.return_value.mget.return_value = [b"True"] * 30
+
+        data = UserProfileSerializer(users, many=True).data
+
+        self.assertTrue(all(user["is_online"] for user in data))
+        mock_redis.return_value.mget.assert_called_once()
+        mock_redis.return_value.get.assert_not_called()
@@ -0,0 +1,131 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from config.redis_pools import get_redis
+from users.authentication import CachedJWTAuthentication
+from users.exceptions import UserNotFound
+from users.models.user_model import User
+from users.services.user_cache_service import (
+    USER_CACHE_FIELDS,
+    UserCacheService,
+    local_user_cache,
+)
+
+
+class UserCacheServiceTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="cache@example.com", nickname="cacheuser", social_provider="google")
+
+    def tearDown(self):
+        local_user_cache.clear()
+        get_redis("cache").delete(UserCacheService.get_key(self.user.id))
+
+    def test_get_user_reads_database_once(self):
+        with self.assertNumQueries(1):
+            UserCacheService.get_user(self.user.id)
+
+        # 프로세스 LRU 가 비어 있어도 (배포 직후 등) Redis 에서 찾음
+        local_user_cache.clear()
+        with self.assertNumQueries(0):
+            user = UserCacheService.get_user(self.user.id)
+
+        self.assertEqual(user.nickname, "cacheuser")
+
+    def test_aget_user_from_cache(self):
+        UserCacheService.get_user(self.user.id)
+        local_user_cache.clear()
+
+        with self.assertNumQueries(0):
+            user = async_to_sync(UserCacheService.aget_user)(self.user.id)
+
+        self.assertEqual(user.id, self.user.id)
+
+    def test_returns_new_instance(self):
+        UserCacheService.get_user(self.user.id).nickname = "changed"
+
+        self.assertEqual(UserCacheService.get_user(self.user.id).nickname, "cacheuser")
+
+    def test_caches_only_auth_fields(self):
+        self.user.set_password("secret")
+        self.user.description = "소개"
+        self.user.save()
+        UserCacheService.get_user(self.user.id)
+
+        data = json.loads(get_redis("cache").get(UserCacheService.get_key(self.user.id)))
+        self.assertEqual(set(data), set(USER_CACHE_FIELDS))
+
+        # 캐시하지 않은 필드는 접근할 때 DB 에서 읽음
+        user = UserCacheService.get_user(self.user.id)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.description, "소개")
+
+    def test_stale_cached_user_does_not_overwrite_other_fields(self):
+        cached_user = UserCacheService.get_user(self.user.id)
+        User.objects.filter(id=self.user.id).update(description="다른 프로세스에서 수정")
+
+        cached_user.is_mate = True
+        cached_user.save()
+
+        # 캐시에서 만든 User 는 캐시한 필드만 UPDATE 함
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.description, self.user.is_mate), ("다른 프로세스에서 수정", True))
+
+    def test_invalidated_on_save(self):
+        UserCacheService.get_user(self.user.id)
+
+        self.user.nickname = "renamed"
+        self.user.save()
+
+        self.assertEqual(UserCacheService.get_user(self.user.id).nickname, "renamed")
+
+    def test_invalidated_on_delete(self):
+        UserCacheService.get_user(self.user.id)
+        user_id = self.user.id
+
+        self.user.delete()
+
+        with self.assertRaises(UserNotFound):
+            UserCacheService.get_user(user_id)
+
+    def test_invalidated_on_blacklist(self):
+        UserCacheService.get_user(self.user.id)
+
+        RefreshToken.for_user(self.user).blacklist()
+
+        self.assertIsNone(local_user_cache.get(self.user.id))
+        self.assertFalse(get_redis("cache").exists(UserCacheService.get_key(self.user.id)))
+
+    @override_settings(USER_CACHE_LOCAL_MAX_SIZE=2)
+    def test_local_cache_is_bounded(self):
+        for user_id in range(1, 4):
+            local_user_cache.set(user_id, b"user")
+
+        self.assertEqual(list(local_user_cache.entries), [2, 3])
+
+    @override_settings(USER_CACHE_LOCAL_TTL=0)
+    def test_local_cache_expires(self):
+        local_user_cache.set(1, b"user")
+
+        self.assertIsNone(local_user_cache.get(1))
+
+    def test_authentication_uses_cache(self):
+        authentication = CachedJWTAuthentication()
+        token = authentication.get_validated_token(str(AccessToken.for_user(self.user)))
+        authentication.get_user(token)
+
+        with self.assertNumQueries(0):
+            user = authentication.get_user(token)
+
+        self.assertEqual(user, self.user)
+
+    def test_authentication_rejects_inactive_user(self):
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        authentication = CachedJWTAuthentication()
+        token = authentication.get_validated_token(str(AccessToken.for_user(self.user)))
+
+        with self.assertRaises(AuthenticationFailed):
+            authentication.get_user(token)
@@ -136,7 +136,8 @@ class UserMeAPIView(APIView):
         },
     )
     def get(self, request):
-        serializer = UserProfileSerializer(request.user)
+        # request.user 는 캐시한 필드만 들어 있으므로 프로필 전체는 DB 에서 한 번에 읽음
+        serializer = UserProfileSerializer(User.objects.get_user_by_id(request.user.id))
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -212,7 +213,8 @@ class UserMeAPIView(APIView):
             if User.objects.filter(nickname=new_nickname).exclude(id=request.user.id).exists():
                 return Response({"error": "닉네임이 이미 사용 중입니다."}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = UserProfileSerializer(request.user, data=request.data)
+        # 캐시에서 읽은 request.user 는 이전 값일 수 있으므로 DB 에서 다시 읽어서 수정
+        serializer = UserProfileSerializer(User.objects.get_user_by_id(request.user.id), data=request.data)
 
         if not serializer.is_valid():
             return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)